@@ -0,0 +1,217 @@
+"""
+    An adaptive limit on the number of Solr queries a worker has in flight at once. The limit is
+    found by additive increase and multiplicative decrease (AIMD), as TCP finds the capacity of a
+    link: while queries are answered about as quickly as the fastest recent ones from the same
+    call site (its baseline), the limit grows by one query per limit's worth of answers; when they
+    slow down to `tolerance` times the baseline, or fail, it is cut by `backoff`. It settles around
+    the point beyond which more concurrent queries only make Solr slower.
+
+      >>> place = limit.try_acquire(priority=0)
+      >>> if place is not None:
+      ...     start = time.monotonic()
+      ...     ... send the query ...
+      ...     limit.release(place, "manifest_server.iiif.bundle._children", time.monotonic() - start, ok=True)
+
+    Baselines are kept per call site (see `helpers/hedging.py`), since a lookup by ID and a page of
+    a hundred surfaces take very different times even when Solr is idle. Each worker sends its own
+    queries one at a time, so the limit is rarely reached; it grows with every answer on time,
+    rather than only while it is reached, or it would never grow at all.
+
+    The queries of requests are sent from the event loop's thread, which can't wait for a place
+    without holding up every other request, so they take one with `try_acquire` or fail straight
+    away. The top places under the limit are kept for queries of higher priority (lower numbers;
+    the lane of the request, see `helpers/admission.py`), so that as the limit falls, hedges are
+    given up first, then queries for expensive requests.
+
+    Hedges, queries left to finish in their threads once another answered (see `demote`), and
+    queries sent from other threads, such as the walks that build the activity stream and ID
+    indexes, are background work. It is counted against the limit, but can't use its floor:
+    however low the limit falls, `minimum` places are always there for the queries of requests.
+    Queries sent from other threads can wait, so `acquire` queues them by priority until a place
+    comes free. A query can always be sent when none are in flight.
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from manifest_server.helpers.metrics import Gauge
+
+CONCURRENCY_LIMIT = Gauge("manifest_server_solr_concurrency_limit", "The adaptive limit on Solr queries in flight")
+IN_FLIGHT = Gauge("manifest_server_solr_in_flight", "Solr queries in flight")
+
+# The baseline drifts up by this fraction with every answer, so that it follows Solr if it
+# becomes slower for good, rather than holding the limit down for ever.
+BASELINE_DRIFT: float = 0.01
+
+
+class Place:
+    """
+    A place under the limit, held by one query while it is in flight.
+    """
+    def __init__(self, background: bool) -> None:
+        self.background: bool = background
+        self.released: bool = False
+
+
+class AdaptiveLimit:
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 16, tolerance: float = 2.0,
+                 backoff: float = 0.5) -> None:
+        self.minimum: int = minimum
+        self.maximum: int = maximum
+        self.tolerance: float = tolerance
+        self.backoff: float = backoff
+        self.limit: float = float(initial)
+        self.in_flight: int = 0
+        self.foreground: int = 0
+        self.baselines: Dict[str, float] = {}
+        self._last_decrease: float = 0.0
+        self._waiters: List[Tuple[int, int]] = []
+        self._order: Iterator[int] = itertools.count()
+        self._cond: threading.Condition = threading.Condition()
+        self._update()
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> "AdaptiveLimit":
+        """
+        :param cfg: The `concurrency` section of the `solr` configuration
+        :return: An adaptive limit
+        """
+        return cls(initial=int(cfg.get('initial', 4)),
+                   minimum=int(cfg.get('min', 1)),
+                   maximum=int(cfg.get('max', 16)),
+                   tolerance=float(cfg.get('tolerance', 2.0)),
+                   backoff=float(cfg.get('backoff', 0.5)))
+
+    def _has_room(self, priority: int, background: bool) -> bool:
+        if not self.in_flight or self.in_flight < int(self.limit) - priority:
+            return True
+
+        # Background work can't use up the floor of the limit.
+        return not background and self.foreground < self.minimum
+
+    def _take(self, background: bool) -> Place:
+        self.in_flight += 1
+
+        if not background:
+            self.foreground += 1
+
+        self._update()
+
+        return Place(background)
+
+    def try_acquire(self, priority: int = 0, background: bool = False) -> Optional[Place]:
+        """
+        Takes a place if one is free now, without waiting.
+
+        :param priority: The priority of the query; this many places at the top of the limit are
+            kept for queries with lower numbers.
+        :param background: True for a query that no request is waiting on, such as a hedge.
+        :return: The place, or None if there wasn't one.
+        """
+        with self._cond:
+            if not self._has_room(priority, background):
+                return None
+
+            return self._take(background)
+
+    def acquire(self, priority: int, timeout: float) -> Optional[Place]:
+        """
+        Waits for a place, behind any queries of the same or higher priority that are already
+        waiting. Only for queries sent from threads other than the event loop's, which are
+        background work.
+
+        :param priority: The priority of the query
+        :param timeout: The longest to wait, in seconds
+        :return: The place, or None if none came free in time.
+        """
+        give_up: float = time.monotonic() + timeout
+
+        with self._cond:
+            entry: Tuple[int, int] = (priority, next(self._order))
+            heapq.heappush(self._waiters, entry)
+
+            try:
+                while self._waiters[0] != entry or not self._has_room(priority, True):
+                    left: float = give_up - time.monotonic()
+
+                    if left <= 0:
+                        return None
+
+                    self._cond.wait(left)
+
+                return self._take(True)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                # The next in line may now be at the front of the queue.
+                self._cond.notify_all()
+
+    def demote(self, place: Place) -> None:
+        """
+        Turns the place of a query that is no longer waited on, such as the slower of a query and
+        its hedge, over to background work.
+
+        :param place: The query's place
+        :return: None
+        """
+        with self._cond:
+            if not place.released and not place.background:
+                place.background = True
+                self.foreground -= 1
+                self._cond.notify_all()
+
+    def _give_up(self, place: Place) -> None:
+        place.released = True
+        self.in_flight -= 1
+
+        if not place.background:
+            self.foreground -= 1
+
+        self._cond.notify_all()
+
+    def cancel(self, place: Place) -> None:
+        """
+        Gives up a place without a query having been sent.
+
+        :param place: The place to give up
+        :return: None
+        """
+        with self._cond:
+            self._give_up(place)
+            self._update()
+
+    def release(self, place: Place, site: Optional[str], elapsed: float, ok: bool) -> None:
+        """
+        Gives up a place, and adjusts the limit by how the query went.
+
+        :param place: The place to give up
+        :param site: The call site the query was sent from, if known
+        :param elapsed: How long the query took, in seconds
+        :param ok: False if the query failed to reach Solr, or timed out.
+        :return: None
+        """
+        with self._cond:
+            self._give_up(place)
+            now: float = time.monotonic()
+            key: str = site or ""
+            baseline: Optional[float] = self.baselines.get(key)
+
+            if ok:
+                baseline = elapsed if baseline is None else min(baseline * (1 + BASELINE_DRIFT), elapsed)
+                self.baselines[key] = baseline
+
+            if not ok or elapsed > baseline * self.tolerance:
+                # Only cut the limit once for each round of queries that were in flight together.
+                if now - self._last_decrease > elapsed:
+                    self.limit = max(self.limit * self.backoff, float(self.minimum))
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.limit + 1 / self.limit, float(self.maximum))
+
+            self._update()
+
+    def _update(self) -> None:
+        CONCURRENCY_LIMIT.set(int(self.limit))
+        IN_FLIGHT.set(self.in_flight)
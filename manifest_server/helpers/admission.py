@@ -0,0 +1,304 @@
+"""
+    Admission control: a limit on how many requests of some kind a worker handles at once, with a
+    bounded queue for the requests that arrive while the limit is reached. This is used to keep a
+    burst of requests for the largest manifests from all being built in one worker at the same
+    time, which can run it out of memory. Other requests do not go through the limit at all.
+
+    A request that finds the queue full, or that waits in it for longer than the timeout, is
+    turned away with `AdmissionRejected`, and the server responds with a 503.
+
+      >>> async with LargeManifestLimit.admit():
+      ...     body = render_manifest(...)
+
+    The number of requests running and waiting, the time spent waiting, and the number turned
+    away, are exported as metrics.
+
+    `RequestLanes` schedules every request in one of two lanes, by the cost of the route. Cheap
+    requests (canvases, annotations and so on, which a viewer asks for as it is used) have a share
+    of the worker's places reserved for them, so they do not wait behind a harvest of collections
+    and manifests.
+
+      >>> async with RequestLanes.admit(CHEAP):
+      ...     ...
+"""
+import time
+import asyncio
+import logging
+from collections import deque
+from contextvars import ContextVar
+from functools import partial
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+from manifest_server.helpers.metrics import Counter, Gauge, Summary
+
+log = logging.getLogger(__name__)
+
+ACTIVE = Gauge("manifest_server_admission_active", "Requests currently admitted past an admission limit")
+QUEUE_DEPTH = Gauge("manifest_server_admission_queue_depth", "Requests waiting at an admission limit")
+WAIT_SECONDS = Summary("manifest_server_admission_wait_seconds", "Time requests waited at an admission limit")
+REJECTED = Counter("manifest_server_admission_rejected_total", "Requests turned away at an admission limit")
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request can't be admitted, because the queue is full or the wait timed out.
+    """
+    def __init__(self, limit: str, reason: str) -> None:
+        super().__init__(f"Request not admitted by the {limit} limit: {reason}")
+        self.limit: str = limit
+        self.reason: str = reason
+
+
+class AdmissionLimit:
+    """
+    Allows up to `max_concurrent` requests at a time, and queues up to `max_queue` more, in the
+    order they arrived. A limit of 0 concurrent requests turns the limit off.
+    """
+    def __init__(self, name: str, max_concurrent: int = 0, max_queue: int = 0, timeout: float = 0.0) -> None:
+        self.name: str = name
+        self.max_concurrent: int = max_concurrent
+        self.max_queue: int = max_queue
+        self.timeout: float = timeout
+        self.active: int = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def configure(self, cfg: Dict) -> None:
+        """
+        :param cfg: The section of the configuration for this limit
+        :return: None
+        """
+        self.max_concurrent = int(cfg.get('max_concurrent', 0))
+        self.max_queue = int(cfg.get('max_queue', 0))
+        self.timeout = float(cfg.get('queue_timeout', 0))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for w in self._waiters if not w.done())
+
+    async def acquire(self) -> None:
+        """
+        Waits for a place under the limit.
+
+        :return: None
+        :raises AdmissionRejected: If the queue is full, or the wait times out.
+        """
+        if not self.enabled:
+            return None
+
+        if self.active < self.max_concurrent and not self.queue_depth:
+            self.active += 1
+            self._update()
+            WAIT_SECONDS.observe(0.0, limit=self.name)
+            return None
+
+        if self.queue_depth >= self.max_queue:
+            REJECTED.inc(limit=self.name, reason="queue_full")
+            raise AdmissionRejected(self.name, "queue_full")
+
+        waiter: asyncio.Future = asyncio.get_event_loop().create_future()
+        self._waiters.append(waiter)
+        self._update()
+        start: float = time.monotonic()
+
+        try:
+            # The place is handed over by `release`, so `active` has already been counted.
+            await asyncio.wait_for(waiter, self.timeout or None)
+        except asyncio.TimeoutError:
+            REJECTED.inc(limit=self.name, reason="timeout")
+            raise AdmissionRejected(self.name, "timeout") from None
+        except asyncio.CancelledError:
+            # If the place was handed over just as the request was cancelled, pass it on.
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            WAIT_SECONDS.observe(time.monotonic() - start, limit=self.name)
+            self._update()
+
+        return None
+
+    def release(self) -> None:
+        """
+        Gives up a place under the limit, handing it to the next waiting request, if there is one.
+
+        :return: None
+        """
+        if not self.enabled:
+            return None
+
+        while self._waiters:
+            waiter: asyncio.Future = self._waiters.popleft()
+
+            if not waiter.done():
+                waiter.set_result(True)
+                self._update()
+                return None
+
+        self.active = max(self.active - 1, 0)
+        self._update()
+
+        return None
+
+    def admit(self) -> "_Admission":
+        """
+        :return: An async context manager that holds a place under the limit while it is entered.
+        """
+        return _Admission(self.acquire, self.release)
+
+    def _update(self) -> None:
+        ACTIVE.set(self.active, limit=self.name)
+        QUEUE_DEPTH.set(self.queue_depth, limit=self.name)
+
+
+CHEAP = "cheap"
+EXPENSIVE = "expensive"
+
+# The lane of the request being handled, so that work it does elsewhere (such as its Solr
+# queries) can be given the same priority; lower numbers go first.
+current_lane: ContextVar[str] = ContextVar("lane", default=EXPENSIVE)
+LANE_PRIORITY: Dict[str, int] = {CHEAP: 0, EXPENSIVE: 1}
+
+
+class PriorityLanes:
+    """
+    Allows up to `max_concurrent` requests at a time between two lanes, of which `reserved` places
+    can only be taken by cheap requests. Requests that can't be admitted straight away queue in
+    their lane, up to `max_queue` in each, and when a place comes free the cheap lane is served
+    first. A limit of 0 concurrent requests turns the lanes off.
+    """
+    def __init__(self, name: str, max_concurrent: int = 0, reserved: int = 0, max_queue: int = 0,
+                 timeout: float = 0.0) -> None:
+        self.name: str = name
+        self.max_concurrent: int = max_concurrent
+        self.reserved: int = reserved
+        self.max_queue: int = max_queue
+        self.timeout: float = timeout
+        self.active: Dict[str, int] = {CHEAP: 0, EXPENSIVE: 0}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {CHEAP: deque(), EXPENSIVE: deque()}
+
+    def configure(self, cfg: Dict) -> None:
+        """
+        :param cfg: The section of the configuration for the lanes
+        :return: None
+        """
+        self.max_concurrent = int(cfg.get('max_concurrent', 0))
+        self.reserved = min(int(cfg.get('reserved_cheap', 0)), self.max_concurrent)
+        self.max_queue = int(cfg.get('max_queue', 0))
+        self.timeout = float(cfg.get('queue_timeout', 0))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrent > 0
+
+    def queue_depth(self, lane: str) -> int:
+        return sum(1 for w in self._waiters[lane] if not w.done())
+
+    def _has_room(self, lane: str) -> bool:
+        if self.active[CHEAP] + self.active[EXPENSIVE] >= self.max_concurrent:
+            return False
+
+        return lane == CHEAP or self.active[EXPENSIVE] < self.max_concurrent - self.reserved
+
+    async def acquire(self, lane: str) -> None:
+        """
+        Waits for a place in a lane.
+
+        :param lane: CHEAP or EXPENSIVE
+        :return: None
+        :raises AdmissionRejected: If the lane's queue is full, or the wait times out.
+        """
+        if not self.enabled:
+            return None
+
+        if self._has_room(lane) and not self.queue_depth(lane):
+            self.active[lane] += 1
+            self._update(lane)
+            WAIT_SECONDS.observe(0.0, limit=self.name, lane=lane)
+            return None
+
+        if self.queue_depth(lane) >= self.max_queue:
+            REJECTED.inc(limit=self.name, lane=lane, reason="queue_full")
+            raise AdmissionRejected(self.name, "queue_full")
+
+        waiter: asyncio.Future = asyncio.get_event_loop().create_future()
+        self._waiters[lane].append(waiter)
+        self._update(lane)
+        start: float = time.monotonic()
+
+        try:
+            # The place is handed over by `release`, so `active` has already been counted.
+            await asyncio.wait_for(waiter, self.timeout or None)
+        except asyncio.TimeoutError:
+            REJECTED.inc(limit=self.name, lane=lane, reason="timeout")
+            raise AdmissionRejected(self.name, "timeout") from None
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release(lane)
+            raise
+        finally:
+            WAIT_SECONDS.observe(time.monotonic() - start, limit=self.name, lane=lane)
+            self._update(lane)
+
+        return None
+
+    def release(self, lane: str) -> None:
+        """
+        Gives up a place in a lane, and hands out the places that are free to the waiting
+        requests, cheap ones first.
+
+        :param lane: CHEAP or EXPENSIVE
+        :return: None
+        """
+        if not self.enabled:
+            return None
+
+        self.active[lane] = max(self.active[lane] - 1, 0)
+
+        for waiting_lane in (CHEAP, EXPENSIVE):
+            waiters: Deque[asyncio.Future] = self._waiters[waiting_lane]
+
+            while waiters and self._has_room(waiting_lane):
+                waiter: asyncio.Future = waiters.popleft()
+
+                if not waiter.done():
+                    self.active[waiting_lane] += 1
+                    waiter.set_result(True)
+
+            self._update(waiting_lane)
+
+        return None
+
+    def admit(self, lane: str) -> "_Admission":
+        """
+        :param lane: CHEAP or EXPENSIVE
+        :return: An async context manager that holds a place in the lane while it is entered.
+        """
+        return _Admission(partial(self.acquire, lane), partial(self.release, lane))
+
+    def _update(self, lane: str) -> None:
+        ACTIVE.set(self.active[lane], limit=self.name, lane=lane)
+        QUEUE_DEPTH.set(self.queue_depth(lane), limit=self.name, lane=lane)
+
+
+class _Admission:
+    def __init__(self, acquire: Callable[[], Awaitable[None]], release: Callable[[], None]) -> None:
+        self._acquire: Callable[[], Awaitable[None]] = acquire
+        self._release: Callable[[], None] = release
+
+    async def __aenter__(self) -> None:
+        await self._acquire()
+
+    async def __aexit__(self, exc_type, exc, tb) -> Optional[bool]:
+        self._release()
+        return None
+
+
+# Manifests with at least `large_surfaces` canvases; see the `admission` configuration.
+LargeManifestLimit: AdmissionLimit = AdmissionLimit("large_manifests")
+
+# Every request, by the cost of its route; see the `scheduler` configuration.
+RequestLanes: PriorityLanes = PriorityLanes("requests")
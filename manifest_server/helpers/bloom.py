@@ -0,0 +1,60 @@
+import math
+import hashlib
+from typing import Tuple
+
+
+class BloomFilter:
+    """
+    A fixed-size probabilistic set. Looking up a key that was added always returns True;
+    looking up a key that was never added returns False, except for a small fraction of
+    false positives (the `error_rate`) once `capacity` keys have been added.
+
+        >>> seen = BloomFilter(capacity=100000, error_rate=0.01)
+        >>> seen.add("748a9d50-5a3a-440e-ab9d-567dd68b6abb")
+        >>> "748a9d50-5a3a-440e-ab9d-567dd68b6abb" in seen
+        True
+
+    The bits are held in a bytearray, so one million keys at a 1% error rate take about 1.2MB.
+    """
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        capacity = max(capacity, 1)
+        nbits: int = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+
+        self.capacity: int = capacity
+        self.error_rate: float = error_rate
+        self.num_bits: int = max(nbits, 8)
+        self.num_hashes: int = max(int(round(self.num_bits / capacity * math.log(2))), 1)
+        self.count: int = 0
+        self._bits: bytearray = bytearray((self.num_bits + 7) // 8)
+
+    def _hashes(self, key: str) -> Tuple[int, int]:
+        digest: bytes = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        # Double hashing: the k bit positions are derived from two 64-bit hashes.
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+    def add(self, key: str) -> None:
+        h1, h2 = self._hashes(key)
+
+        for i in range(self.num_hashes):
+            pos: int = (h1 + i * h2) % self.num_bits
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        h1, h2 = self._hashes(key)
+
+        for i in range(self.num_hashes):
+            pos: int = (h1 + i * h2) % self.num_bits
+
+            if not self._bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+
+        return True
+
+    @property
+    def is_full(self) -> bool:
+        """
+        :return: True once more keys have been added than the filter was sized for.
+        """
+        return self.count >= self.capacity
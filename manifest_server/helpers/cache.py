@@ -0,0 +1,119 @@
+"""
+    In-process caches for records retrieved from Solr.
+
+    Each cache is configured by name in the `cache` section of the configuration file,
+    with a maximum number of entries (`size`) and a maximum age in seconds (`ttl`):
+
+      >>> from manifest_server.helpers.cache import configured_cache
+      >>> bundles = configured_cache("bundle", config)
+      >>> bundles.get(manifest_id)
+
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class ExpiringLRUCache:
+    """
+    A small in-process cache with a maximum number of entries and a maximum age for each
+    entry. When the cache is full, the least recently used entry is evicted. Entries older than
+    the time-to-live are treated as missing by `get`, but are kept until they are evicted or
+    replaced, so that `get_stale` can still return them when there is nothing better.
+
+    The cache is safe to share between threads; it is held per worker process, so each
+    worker will fill its own copy.
+
+        >>> cache = ExpiringLRUCache(maxsize=100, ttl=300)
+        >>> cache.set("key", "value")
+        >>> cache.get("key")
+        'value'
+
+    Note that `None` cannot be distinguished from a miss with `get`, so it should not be
+    stored as a value.
+    """
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize: int = maxsize
+        self.ttl: float = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        :param key: The cache key
+        :return: The cached value, or None if there is no current entry for the key.
+        """
+        with self._lock:
+            entry: Optional[Tuple[float, Any]] = self._entries.get(key)
+
+            if entry is None:
+                return None
+
+            stored, value = entry
+
+            if time.monotonic() - stored > self.ttl:
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """
+        :param key: The cache key
+        :return: The cached value, however old it is, or None if there is no entry for the key.
+        """
+        with self._lock:
+            entry: Optional[Tuple[float, Any]] = self._entries.get(key)
+
+            return entry[1] if entry is not None else None
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return None
+
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return None
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_caches: Dict[str, ExpiringLRUCache] = {}
+_caches_lock: threading.Lock = threading.Lock()
+
+
+def configured_cache(name: str, config: Dict) -> ExpiringLRUCache:
+    """
+    Returns the named cache, creating it from the configuration the first time it is requested.
+    A cache that is missing from the configuration, or that has a size of 0, never stores anything.
+
+    :param name: The name of the cache in the `cache` section of the configuration
+    :param config: A manifest server configuration dict
+    :return: The cache instance shared by all callers in this process
+    """
+    cache: Optional[ExpiringLRUCache] = _caches.get(name)
+
+    if cache is not None:
+        return cache
+
+    with _caches_lock:
+        if name not in _caches:
+            cfg: Dict = config.get('cache', {}).get(name, {})
+            _caches[name] = ExpiringLRUCache(maxsize=int(cfg.get('size', 0)), ttl=float(cfg.get('ttl', 0)))
+
+        return _caches[name]
@@ -0,0 +1,113 @@
+"""
+    A circuit breaker around Solr. When Solr can't be reached, every query would otherwise wait for
+    the connection to fail or time out, and the requests waiting on those queries would tie up the
+    workers. After `failures` queries in a row fail to reach Solr, the breaker opens, and queries
+    fail straight away with `SolrUnavailable` for `cooldown` seconds. After that one query is let
+    through as a probe (the breaker is half-open): if it reaches Solr the breaker closes again, and
+    if it doesn't the breaker opens for another cool-down.
+
+      >>> breaker.before()      # raises SolrUnavailable while the breaker is open
+      >>> ... send the query ...
+      >>> breaker.succeeded()   # or breaker.failed(), or breaker.abandoned()
+
+    While the breaker is open the server answers manifest requests from the bundle cache, even
+    with entries that have expired, and responds to anything else with a 503.
+"""
+import time
+import logging
+import threading
+from typing import Dict
+
+import pysolr
+
+from manifest_server.helpers.metrics import Counter, Gauge
+
+log = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+BREAKER_OPEN = Gauge("manifest_server_solr_breaker_open", "Whether the Solr circuit breaker is open (1) or not (0)")
+BREAKER_REJECTED = Counter("manifest_server_solr_breaker_rejected_total", "Solr queries failed fast by the circuit breaker")
+
+
+class SolrUnavailable(pysolr.SolrError):
+    """
+    Raised instead of sending a query while the circuit breaker is open.
+    """
+    def __init__(self, retry_after: float) -> None:
+        super().__init__("Solr is unavailable")
+        self.retry_after: float = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, failures: int = 5, cooldown: float = 10.0) -> None:
+        self.max_failures: int = failures
+        self.cooldown: float = cooldown
+        self.state: str = CLOSED
+        self.failures: int = 0
+        self._opened_at: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+        BREAKER_OPEN.set(0)
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> "CircuitBreaker":
+        """
+        :param cfg: The `circuit_breaker` section of the `solr` configuration
+        :return: A circuit breaker
+        """
+        return cls(failures=int(cfg.get('failures', 5)), cooldown=float(cfg.get('cooldown', 10)))
+
+    def before(self) -> None:
+        """
+        Called before a query is sent.
+
+        :return: None
+        :raises SolrUnavailable: If the breaker is open, or another query is already probing Solr.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return None
+
+            waited: float = time.monotonic() - self._opened_at
+
+            if self.state == OPEN and waited >= self.cooldown:
+                log.info("Probing Solr after %.0f seconds", waited)
+                self.state = HALF_OPEN
+                return None
+
+        BREAKER_REJECTED.inc()
+        raise SolrUnavailable(retry_after=max(self.cooldown - waited, 1.0))
+
+    def succeeded(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                log.warning("Solr is reachable again; closing the circuit breaker")
+                BREAKER_OPEN.set(0)
+
+            self.state = CLOSED
+            self.failures = 0
+
+    def abandoned(self) -> None:
+        """
+        Called when a query ended without showing whether Solr could be reached, such as when it
+        ran out of its request's time. If it was the probe, the next query probes instead.
+
+        :return: None
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+                self._opened_at = time.monotonic() - self.cooldown
+
+    def failed(self) -> None:
+        with self._lock:
+            self.failures += 1
+
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.max_failures):
+                log.warning("Solr could not be reached %s times in a row; opening the circuit breaker for %s seconds",
+                            self.failures, self.cooldown)
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+                BREAKER_OPEN.set(1)
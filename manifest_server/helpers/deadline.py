@@ -0,0 +1,57 @@
+"""
+    Per-request deadlines. Each route is given a time budget (see the `deadlines` configuration),
+    and the deadline is kept in a context variable for the request's task, so that the code which
+    talks to Solr can find out how much of the budget is left without it being passed down through
+    the serializers.
+
+      >>> token = set_deadline(10.0)
+      >>> remaining()
+      9.99...
+      >>> reset_deadline(token)
+
+    `DeadlineSolr` sends the remaining budget with every query, both as the client-side timeout and
+    as Solr's `timeAllowed` (except on cursor queries). Once the budget has run out, `DeadlineExceeded` is raised rather than
+    sending any more queries, and the server responds with a 503.
+"""
+import time
+from contextvars import ContextVar, Token
+from typing import Optional
+
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when a request has used up its time budget.
+    """
+    pass
+
+
+def set_deadline(seconds: float) -> Token:
+    """
+    :param seconds: The time budget for the current request, from now; 0 for no deadline.
+    :return: A token for `reset_deadline`
+    """
+    return _deadline.set(time.monotonic() + seconds if seconds > 0 else None)
+
+
+def reset_deadline(token: Token) -> None:
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    :return: The seconds left until the current request's deadline, or None if it has no deadline.
+    :raises DeadlineExceeded: If the deadline has passed.
+    """
+    deadline: Optional[float] = _deadline.get()
+
+    if deadline is None:
+        return None
+
+    left: float = deadline - time.monotonic()
+
+    if left <= 0:
+        raise DeadlineExceeded()
+
+    return left
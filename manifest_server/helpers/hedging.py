@@ -0,0 +1,130 @@
+"""
+    Hedged Solr queries. A query that hasn't been answered by the time most queries from the same
+    call site would have been (their 95th percentile response time) is sent again to another
+    replica, and whichever answer comes back first is used. A replica that is merging segments can
+    take seconds over a query that usually takes milliseconds; hedging makes that the exception
+    rather than the manifest's response time.
+
+    Every query the server sends is a read, so a duplicate does no harm beyond the load it adds.
+    That is kept in check by only hedging once a call site has enough samples to know its own
+    95th percentile, and by a cap on the share of queries that may be hedged:
+
+      >>> policy = HedgePolicy(max_ratio=0.05)
+      >>> delay = policy.delay("manifest_server.iiif.bundle._children")
+      >>> if delay is not None and not_answered_after(delay) and policy.allow():
+      ...     send_the_query_again()
+
+    Response times are recorded per call site: the function that called `search`, outside of
+    `helpers/solr.py`.
+"""
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from manifest_server.helpers.metrics import Counter
+
+HEDGED = Counter("manifest_server_solr_hedged_total", "Solr queries sent again to another replica")
+HEDGE_WINS = Counter("manifest_server_solr_hedge_wins_total", "Hedged Solr queries answered first by the hedge")
+
+# The number of recent response times kept for each call site.
+WINDOW_SIZE: int = 200
+# The percentile is worked out again after this many new samples, rather than on every query.
+RECALCULATE_EVERY: int = 20
+
+
+class LatencyWindow:
+    """
+    The most recent response times from one call site, and their 95th percentile.
+    """
+    __slots__ = ('samples', 'p95', '_since')
+
+    def __init__(self) -> None:
+        self.samples: Deque[float] = deque(maxlen=WINDOW_SIZE)
+        self.p95: Optional[float] = None
+        self._since: int = 0
+
+    def record(self, elapsed: float) -> None:
+        self.samples.append(elapsed)
+        self._since += 1
+
+        if self._since >= RECALCULATE_EVERY:
+            ordered: List[float] = sorted(self.samples)
+            self.p95 = ordered[int(len(ordered) * 0.95) - 1]
+            self._since = 0
+
+
+class HedgePolicy:
+    """
+    Decides whether, and after how long, a query may be hedged. Each query earns `max_ratio` of a
+    hedge, up to `burst` hedges, and each hedge that is sent spends one. Queries are sent from
+    several threads, so the credit and the response times are only touched under a lock.
+    """
+    def __init__(self, max_ratio: float = 0.05, min_samples: int = 20, min_delay: float = 0.05,
+                 burst: float = 5.0) -> None:
+        self.max_ratio: float = max_ratio
+        self.min_samples: int = min_samples
+        self.min_delay: float = min_delay
+        self.burst: float = burst
+        self._windows: Dict[str, LatencyWindow] = {}
+        self._credit: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> Optional["HedgePolicy"]:
+        """
+        :param cfg: The `hedging` section of the `solr` configuration
+        :return: A policy, or None if hedging is not enabled.
+        """
+        if not cfg.get('enabled'):
+            return None
+
+        return cls(max_ratio=float(cfg.get('max_ratio', 0.05)),
+                   min_samples=int(cfg.get('min_samples', 20)),
+                   min_delay=float(cfg.get('min_delay', 0.05)))
+
+    def record(self, site: str, elapsed: float) -> None:
+        """
+        Records the response time of a query, from the thread that sent it.
+
+        :param site: The call site the query was sent from
+        :param elapsed: How long the replica took to answer, in seconds
+        :return: None
+        """
+        with self._lock:
+            window: Optional[LatencyWindow] = self._windows.get(site)
+
+            if window is None:
+                window = self._windows[site] = LatencyWindow()
+
+            window.record(elapsed)
+
+    def delay(self, site: str) -> Optional[float]:
+        """
+        Earns the query its share of a hedge, and works out when it should be hedged.
+
+        :param site: The call site a query is being sent from
+        :return: How long to wait for an answer before hedging, or None if the call site does not
+            have enough samples yet.
+        """
+        with self._lock:
+            self._credit = min(self._credit + self.max_ratio, self.burst)
+            window: Optional[LatencyWindow] = self._windows.get(site)
+
+            if window is None or window.p95 is None or len(window.samples) < self.min_samples:
+                return None
+
+            return max(window.p95, self.min_delay)
+
+    def allow(self) -> bool:
+        """
+        :return: True if a hedge may be sent now, in which case it is counted against the cap.
+        """
+        with self._lock:
+            if self._credit < 1:
+                return False
+
+            self._credit -= 1
+
+        HEDGED.inc()
+
+        return True
@@ -0,0 +1,141 @@
+"""
+    An optional in-memory index of every object, surface, image, annotation and annotation page ID
+    in the Solr core, held in a Bloom filter. If an ID is not in the filter it is definitely not in
+    Solr, so a request for it can be answered with a 404 without a query. This protects Solr from
+    crawlers that enumerate UUIDs.
+
+    The index is built when the server starts, by walking the IDs with a cursor. After that, each
+    time the refresh interval passes, only the IDs indexed since the last walk are added. IDs
+    that are deleted from Solr remain in the filter until it is rebuilt, which only costs the
+    Solr query that would have been made anyway.
+
+    The index is only an optimisation, so if it can't be built or updated because of an error
+    from Solr, requests carry on without it (or with the filter there is) and go to Solr.
+
+      >>> if not IdIndex.might_contain([f"{canvas_id}_surface"], config):
+      ...     return None
+
+"""
+import time
+import logging
+import threading
+from typing import Dict, List, Optional
+
+import pysolr
+
+from manifest_server.helpers.bloom import BloomFilter
+from manifest_server.helpers.solr import SolrManager
+from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.helpers.watermark import index_state, IndexState
+
+log = logging.getLogger(__name__)
+
+ID_INDEX_FQ: List = ["type:(object OR surface OR image OR annotation OR annotationpage)"]
+
+# Documents only become visible to searches when they are committed, which may be after later
+# documents have been stamped. Overlapping the incremental walks makes sure none are missed.
+INDEXED_OVERLAP: str = "-5MINUTES"
+
+
+class IdentifierIndex:
+    """
+    Holds the Bloom filter of IDs, and the `indexed` watermark up to which it is complete.
+    The module-level `IdIndex` instance is shared by all requests in a worker.
+    """
+    def __init__(self) -> None:
+        self._filter: Optional[BloomFilter] = None
+        self._since: Optional[str] = None
+        self._checked: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+
+    def might_contain(self, identifiers: List[str], config: Dict) -> bool:
+        """
+        :param identifiers: The Solr IDs that a request could refer to
+        :param config: A manifest server configuration dict
+        :return: False if none of the IDs are in Solr. True if any of them may be, or if the index is not
+            enabled or could not be built.
+        """
+        if not config.get('id_index', {}).get('enabled'):
+            return True
+
+        bloom: Optional[BloomFilter] = self._current(config)
+
+        if bloom is None:
+            return True
+
+        return any(ident in bloom for ident in identifiers)
+
+    def build(self, config: Dict) -> None:
+        """
+        Walks every ID in the index into a new filter. Called when the server starts, and again
+        if the number of IDs outgrows the filter.
+
+        :param config: A manifest server configuration dict
+        :return: None
+        """
+        with self._lock:
+            self._build(config)
+
+    def _current(self, config: Dict) -> Optional[BloomFilter]:
+        refresh_interval: int = int(config['id_index']['refresh_interval'])
+
+        with self._lock:
+            try:
+                if self._filter is None:
+                    self._build(config)
+                elif time.monotonic() - self._checked > refresh_interval:
+                    self._update(config)
+            except pysolr.SolrError as e:
+                # Carry on with the filter we have, if any, until Solr is back.
+                log.warning("Could not build or update the ID index: %s", e)
+
+            return self._filter
+
+    def _build(self, config: Dict) -> None:
+        cfg: Dict = config['id_index']
+        state: IndexState = index_state(ID_INDEX_FQ)
+        hits, latest = state
+
+        # Leave room to grow before the filter has to be rebuilt.
+        capacity: int = max(int(cfg['capacity']), hits * 2)
+        bloom: BloomFilter = BloomFilter(capacity=capacity, error_rate=float(cfg['error_rate']))
+
+        self._walk(bloom, ID_INDEX_FQ, config)
+
+        log.debug("Built the ID index with %s IDs", bloom.count)
+
+        self._filter = bloom
+        self._since = latest
+        self._checked = time.monotonic()
+
+    def _update(self, config: Dict) -> None:
+        if self._since is None or self._filter is None or self._filter.is_full:
+            self._build(config)
+            return None
+
+        _, latest = index_state(ID_INDEX_FQ)
+
+        if latest != self._since:
+            fq: List = ID_INDEX_FQ + [f"indexed:[{self._since}{INDEXED_OVERLAP} TO *]"]
+            added: int = self._walk(self._filter, fq, config)
+
+            log.debug("Added %s recently indexed IDs to the ID index", added)
+            self._since = latest
+
+        self._checked = time.monotonic()
+
+        return None
+
+    def _walk(self, bloom: BloomFilter, fq: List, config: Dict) -> int:
+        manager: SolrManager = SolrManager(SolrConnection)
+        manager.search("*:*", fq=fq, fl=["id"], rows=int(config['id_index']['batchsize']))
+        count: int = 0
+
+        for res in manager.results:
+            bloom.add(res['id'])
+            count += 1
+
+        return count
+
+
+IdIndex: IdentifierIndex = IdentifierIndex()
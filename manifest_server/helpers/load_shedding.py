@@ -0,0 +1,108 @@
+"""
+    Load shedding. Once a worker is saturated, taking on more work only makes every request it has
+    slower, so past a point it is better to turn some away at once. Each worker keeps track of
+    how late its event loop is running (how much longer than asked for a short sleep takes, which
+    grows as the loop is kept busy) and of how many requests it has in flight. When either goes
+    past its threshold, new expensive requests are refused with a 503 straight away, before they
+    do any work.
+
+    Cheap requests are never shed, and neither are expensive requests that can be answered from a
+    cache, so that viewers can carry on while harvesters are turned away.
+
+      >>> if LoadShedder.should_shed(EXPENSIVE):
+      ...     return busy_response()
+      >>> with LoadShedder.tracking():
+      ...     ...
+"""
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from manifest_server.helpers.admission import CHEAP
+from manifest_server.helpers.metrics import Counter, Gauge
+
+log = logging.getLogger(__name__)
+
+LOOP_LAG = Gauge("manifest_server_event_loop_lag_seconds", "Smoothed delay of the event loop behind schedule")
+IN_FLIGHT = Gauge("manifest_server_requests_in_flight", "Requests being handled by the worker")
+SHED = Counter("manifest_server_requests_shed_total", "Requests refused because the worker was overloaded")
+
+# The weight given to each new measurement of the loop's lag.
+LAG_ALPHA: float = 0.5
+
+
+class WorkerLoad:
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.interval: float = 0.1
+        self.max_lag: float = 0.0
+        self.max_in_flight: int = 0
+        self.lag: float = 0.0
+        self.in_flight: int = 0
+        self._monitor: Optional[asyncio.Task] = None
+
+    def configure(self, cfg: Dict) -> None:
+        """
+        :param cfg: The `load_shedding` section of the configuration
+        :return: None
+        """
+        self.enabled = bool(cfg.get('enabled'))
+        self.interval = float(cfg.get('interval', 0.1))
+        self.max_lag = float(cfg.get('max_lag', 0))
+        self.max_in_flight = int(cfg.get('max_in_flight', 0))
+
+    async def _measure(self) -> None:
+        while True:
+            expected: float = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag: float = max(time.monotonic() - expected, 0.0)
+
+            self.lag += LAG_ALPHA * (lag - self.lag)
+            LOOP_LAG.set(round(self.lag, 6))
+
+    def start(self) -> None:
+        """
+        Starts measuring the event loop's lag, if load shedding is enabled.
+
+        :return: None
+        """
+        if self.enabled and self._monitor is None:
+            self._monitor = asyncio.get_event_loop().create_task(self._measure())
+
+    def stop(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+
+    @property
+    def overloaded(self) -> bool:
+        if self.max_lag and self.lag > self.max_lag:
+            return True
+
+        return bool(self.max_in_flight) and self.in_flight >= self.max_in_flight
+
+    def should_shed(self, lane: str) -> bool:
+        """
+        :param lane: The lane of a new request
+        :return: True if the request should be turned away.
+        """
+        return self.enabled and lane != CHEAP and self.overloaded
+
+    @contextmanager
+    def tracking(self) -> Iterator[None]:
+        """
+        Counts a request as in flight while the context is entered.
+        """
+        self.in_flight += 1
+        IN_FLIGHT.set(self.in_flight)
+
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            IN_FLIGHT.set(self.in_flight)
+
+
+LoadShedder: WorkerLoad = WorkerLoad()
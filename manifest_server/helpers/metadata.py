@@ -1,4 +1,5 @@
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+from manifest_server.helpers.cache import configured_cache, ExpiringLRUCache
 from manifest_server.helpers.solr import SolrManager, SolrResult
 from manifest_server.helpers.solr_connection import SolrConnection
 
@@ -109,18 +110,49 @@ WORKS_METADATA_FILTER_FIELDS: List = [
 ] + list(WORKS_METADATA_FIELD_CONFIG.keys())
 
 
-def get_links(obj: SolrResult, version: int) -> List:
+def get_link_docs(object_id: str, config: Optional[Dict] = None) -> List[SolrResult]:
+    """
+    Retrieves the 'link' documents attached to an object. Links change very rarely, and are
+    needed for every manifest, so if a configuration is given they are kept in the 'links' cache.
+
+    :param object_id: The ID of an object
+    :param config: A manifest server configuration dict. If not given, the cache is not used.
+    :return: A list of Solr 'link' documents.
+    """
+    cache: Optional[ExpiringLRUCache] = configured_cache("links", config) if config else None
+    link_docs: Optional[List[SolrResult]] = cache.get(object_id) if cache else None
+
+    if link_docs is not None:
+        return link_docs
+
     conn: SolrManager = SolrManager(SolrConnection)
-    fq: List = ['type:link', f"object_id:{obj.get('id')}"]
+    fq: List = ['type:link', f"object_id:{object_id}"]
 
     conn.search("*:*", fq=fq)
+    link_docs = list(conn.results)
+
+    if cache:
+        cache.set(object_id, link_docs)
+
+    return link_docs
 
-    if conn.hits == 0:
-        return []
+
+def get_links(obj: SolrResult, version: int, link_docs: Optional[List[SolrResult]] = None) -> List:
+    """
+    Formats the 'link' documents attached to an object for inclusion in the metadata block.
+
+    :param obj: A Solr object record
+    :param version: The IIIF version to format the links for (2 or 3)
+    :param link_docs: The object's link documents, if they have already been retrieved.
+        If not given they will be looked up in Solr.
+    :return: A list of formatted links to be added to the metadata block.
+    """
+    if link_docs is None:
+        link_docs = get_link_docs(obj.get('id'))
 
     lnks: List = []
 
-    for r in conn.results:
+    for r in link_docs:
         if version == 2:
             lnk = format_v2_related_links(r)
         else:
@@ -142,6 +174,48 @@ def format_v2_related_links(res: Dict) -> List:
              "value": f"<a href=\"{res.get('target_s')}\">{res.get('label_s')}</a>"}]
 
 
+class MetadataFields:
+    """
+    An index of a field config, so that a metadata block can be built from only the fields a record
+    actually has, rather than by looking up every field in the config. Most records have only a few.
+    Holds the position of each field in the config, which sets the order of the block, and the labels
+    in their v2 and v3 forms. The v3 label wrappers are built once here and shared by every block.
+    """
+    __slots__ = ('positions', 'labels', 'v3_labels')
+
+    def __init__(self, field_config: Dict[str, str]) -> None:
+        self.positions: Dict[str, int] = {field: pos for pos, field in enumerate(field_config)}
+        self.labels: Dict[str, str] = dict(field_config)
+        self.v3_labels: Dict[str, Dict] = {field: {"en": [label]} for field, label in field_config.items()}
+
+    def present(self, obj: SolrResult) -> List[str]:
+        """
+        :param obj: A Solr record
+        :return: The fields in the config that the record has, in the order of the config.
+        """
+        positions: Dict[str, int] = self.positions
+        return sorted((k for k in obj if k in positions), key=positions.__getitem__)
+
+
+# The indexes of the field configs, keyed by the id of the config. The config is kept alongside,
+# so that an id can't be reused by another dictionary.
+_metadata_fields: Dict[int, Tuple[Dict[str, str], MetadataFields]] = {}
+
+
+def metadata_fields(field_config: Dict[str, str]) -> MetadataFields:
+    """
+    :param field_config: A dictionary of solr fields to manifest fields
+    :return: The index of the field config. This is only built the first time a config is used.
+    """
+    entry: Optional[Tuple[Dict[str, str], MetadataFields]] = _metadata_fields.get(id(field_config))
+
+    if entry is None or entry[0] is not field_config:
+        entry = (field_config, MetadataFields(field_config))
+        _metadata_fields[id(field_config)] = entry
+
+    return entry[1]
+
+
 def v2_metadata_block(obj: SolrResult, field_config: Optional[Dict[str, str]] = None) -> Optional[List[Dict]]:
     """
     A helper method for constructing the manifest metadata block.
@@ -154,14 +228,17 @@ def v2_metadata_block(obj: SolrResult, field_config: Optional[Dict[str, str]] =
     if not field_config:
         field_config = FIELD_CONFIG
 
+    fields: MetadataFields = metadata_fields(field_config)
     metadata: List = []
 
-    for field, label in field_config.items():
-        val = obj.get(field, None)
+    for field in fields.present(obj):
+        val = obj[field]
 
         if not val:
             continue
 
+        label: str = fields.labels[field]
+
         if isinstance(val, list):
             fval = [{"label": label, "value": v} for v in val]
         else:
@@ -196,18 +273,21 @@ def v3_metadata_block(obj: SolrResult, field_config: Optional[Dict[str, str]] =
     if not field_config:
         field_config = FIELD_CONFIG
 
+    fields: MetadataFields = metadata_fields(field_config)
     metadata: List = []
 
-    for field, label in field_config.items():
-        val = obj.get(field, None)
+    for field in fields.present(obj):
+        val = obj[field]
 
         if not val:
             continue
 
+        label: Dict = fields.v3_labels[field]
+
         if isinstance(val, list):
-            fval = [{"label": {"en": [label]}, "value": {"en": val}}]
+            fval = [{"label": label, "value": {"en": val}}]
         else:
-            fval = [{"label": {"en": [label]}, "value": {"en": [val]}}]
+            fval = [{"label": label, "value": {"en": [val]}}]
         metadata += fval
 
     return metadata or None
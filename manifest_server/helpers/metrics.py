@@ -0,0 +1,104 @@
+"""
+    A small registry of metrics, served in the Prometheus text format at `/metrics`. The values
+    are per worker process; Prometheus tells the workers apart by the `instance` it scrapes, or
+    they can be summed.
+
+      >>> REJECTED = Counter("manifest_server_admission_rejected_total", "Requests turned away")
+      >>> REJECTED.inc(limit="large_manifests")
+
+"""
+from typing import Dict, List, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_registry: List["Metric"] = []
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+
+    pairs: str = ",".join(f'{k}="{v}"' for k, v in key)
+    return f"{{{pairs}}}"
+
+
+class Metric:
+    metric_type: str = "untyped"
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name: str = name
+        self.description: str = description
+        self._values: Dict[LabelKey, float] = {}
+        _registry.append(self)
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        return [(self.name, key, value) for key, value in self._values.items()]
+
+    def render(self) -> List[str]:
+        lines: List[str] = [f"# HELP {self.name} {self.description}",
+                            f"# TYPE {self.name} {self.metric_type}"]
+        lines += [f"{name}{_format_labels(key)} {value}" for name, key, value in self.samples()]
+
+        return lines
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key: LabelKey = _label_key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[_label_key(labels)] = value
+
+
+class Summary(Metric):
+    """
+    Records the count and the sum of the observed values, from which Prometheus can derive the mean.
+    """
+    metric_type = "summary"
+
+    def __init__(self, name: str, description: str) -> None:
+        super().__init__(name, description)
+        self._counts: Dict[LabelKey, int] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key: LabelKey = _label_key(labels)
+        self._values[key] = self._values.get(key, 0.0) + value
+        self._counts[key] = self._counts.get(key, 0) + 1
+
+    def count(self, **labels: str) -> int:
+        return self._counts.get(_label_key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        samples: List[Tuple[str, LabelKey, float]] = []
+
+        for key, total in self._values.items():
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, float(self._counts[key])))
+
+        return samples
+
+
+def render_metrics() -> str:
+    """
+    :return: Every registered metric, in the Prometheus text exposition format.
+    """
+    lines: List[str] = []
+
+    for metric in _registry:
+        lines += metric.render()
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,105 @@
+"""
+    Remembers the IDs that were requested but not found, so that repeated requests for
+    them (from crawlers, or from broken links) are answered with a 404 without asking Solr.
+
+    If the ID index is enabled (see `id_index`), IDs that are definitely not in Solr are
+    answered with a 404 before the cache is even consulted.
+
+    Responses are cached per resource type, since an ID that is not a canvas may still be a
+    manifest. An ID is only cached the second time it is not found: the first miss is recorded
+    in a Bloom filter (the 'doorkeeper'), so that scanning traffic, where each ID is only tried
+    once, does not fill the cache. Both are cleared whenever the index watermark moves, since
+    the missing resources may then have been added.
+
+      >>> @negative_cached("canvas", id_formats=["{}_surface"])
+      ... def create_v2_canvas(request, canvas_id: str, config: Dict) -> Optional[Dict]:
+      ...     ...
+
+"""
+import logging
+import threading
+from functools import wraps
+from typing import Callable, Dict, Optional, Any, List
+
+from manifest_server.helpers.bloom import BloomFilter
+from manifest_server.helpers.cache import configured_cache, ExpiringLRUCache
+from manifest_server.helpers.id_index import IdIndex
+from manifest_server.helpers.watermark import IndexWatermark, IndexState
+
+log = logging.getLogger(__name__)
+
+_watermark: IndexWatermark = IndexWatermark()
+_seen_state: Optional[IndexState] = None
+_doorkeeper: Optional[BloomFilter] = None
+_lock: threading.Lock = threading.Lock()
+
+
+def _doorkeeper_for(cache: ExpiringLRUCache, config: Dict) -> BloomFilter:
+    """
+    :param cache: The cache of missing IDs
+    :param config: A manifest server configuration dict
+    :return: The doorkeeper filter. Both are cleared first if the index has changed since they were last used.
+    """
+    global _seen_state, _doorkeeper  # pylint: disable-msg=global-statement
+
+    interval: float = float(config['cache']['negative'].get('watermark_interval', 30))
+
+    with _lock:
+        state: IndexState = _watermark.current(interval)
+
+        if _seen_state is not None and state != _seen_state:
+            log.debug("Index watermark moved; clearing the cache of missing IDs")
+            cache.clear()
+            _doorkeeper = None
+
+        _seen_state = state
+
+        # The doorkeeper is sized well beyond the cache, and started afresh once it is full,
+        # so that its false positive rate stays low.
+        if _doorkeeper is None or _doorkeeper.is_full:
+            _doorkeeper = BloomFilter(capacity=cache.maxsize * 10)
+
+        return _doorkeeper
+
+
+def negative_cached(resource_type: str, id_formats: Optional[List[str]] = None) -> Callable:
+    """
+    Decorates a function that creates a response for a requested ID, with the signature
+    `(request, identifier, config)`, and which returns None (or an empty result) if the ID is not found.
+
+    :param resource_type: The kind of resource the function looks up; functions for different
+        IIIF versions that look up the same resource should share a resource type.
+    :param id_formats: Format strings that turn a requested ID into the Solr IDs it may refer to, e.g.
+        '{}_surface' for a canvas, for checking against the ID index. If not given, the ID index is not used.
+    :return: The decorated function
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(request: Any, identifier: Any, config: Dict) -> Optional[Dict]:
+            if id_formats and not IdIndex.might_contain([f.format(identifier) for f in id_formats], config):
+                return None
+
+            cache: ExpiringLRUCache = configured_cache("negative", config)
+
+            if cache.maxsize <= 0:
+                return func(request, identifier, config)
+
+            doorkeeper: BloomFilter = _doorkeeper_for(cache, config)
+            key: str = f"{resource_type}:{identifier}"
+
+            if cache.get(key):
+                return None
+
+            result: Optional[Dict] = func(request, identifier, config)
+
+            if not result:
+                if key in doorkeeper:
+                    cache.set(key, True)
+                else:
+                    doorkeeper.add(key)
+
+            return result
+
+        return wrapper
+
+    return decorator
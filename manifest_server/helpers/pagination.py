@@ -0,0 +1,140 @@
+import re
+from typing import Dict, List, Optional, Pattern, Any
+from urllib.parse import quote
+
+import pysolr
+
+from manifest_server.helpers.identifiers import get_identifier
+from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.helpers.summaries import get_object_summaries
+
+# Solr cursor marks are base64-encoded; the first page is always '*'.
+PAGE_TOKEN_PATTERN: Pattern = re.compile(r"^(\*|[A-Za-z0-9+/]+={0,2})$")
+
+# The unique key is included so that the cursor has a stable sort order.
+COLLECTION_MANIFEST_SORT: str = "institution_label_s asc, shelfmark_sort_ans asc, id asc"
+
+
+def valid_page_token(page_token: Optional[str]) -> bool:
+    """
+    :param page_token: A page token from an incoming request, or None if no page was requested.
+    :return: False if the page token is not a well-formed cursor mark.
+    """
+    return page_token is None or bool(PAGE_TOKEN_PATTERN.match(page_token))
+
+
+def _invalid_cursor_mark(e: pysolr.SolrError) -> bool:
+    """
+    :param e: An error from a Solr query
+    :return: True if Solr refused the query because of its cursor mark.
+    """
+    message: str = str(e)
+    return "(HTTP 400)" in message and "cursorMark" in message
+
+
+class CollectionPage:
+    """
+    A single page of the manifests that belong to a collection. Pages are addressed by a Solr
+    cursor mark (the 'page token'), which is passed along as the `page` query argument on
+    the collection URL, so that the cost of retrieving a page does not depend on how far into
+    the collection it is.
+
+        >>> page = CollectionPage("all", request.args.get("page"), config)
+        >>> if page.is_paged and not page.page_token:
+        ...     print(page.first_page_uri(request))
+
+    A collection is only split into pages if it has more members than the configured page size.
+    Smaller collections list all of their manifests on the collection itself.
+
+    The Solr query is run lazily the first time a result is needed, so creating a page for a collection
+    that turns out to contain sub-collections instead of manifests costs nothing. It only retrieves the
+    IDs of the manifests on the page; their labels and thumbnails come from the object summaries
+    (see `summaries`), which are usually cached.
+    """
+    def __init__(self, collection_id: str, page_token: Optional[str], config: Dict) -> None:
+        self.collection_id: str = collection_id
+        self.page_token: Optional[str] = page_token
+        self._config: Dict = config
+        self._rows: int = int(config['collections']['pagesize'])
+        self._res: Optional[pysolr.Results] = None
+
+    @property
+    def results(self) -> pysolr.Results:
+        if self._res is None:
+            # The 'All' collection is for every object in the collection, so we
+            # don't need to restrict it by collection.
+            if self.collection_id == 'all':
+                fq: List = ["type:object"]
+            else:
+                fq = ["type:object", f"all_collections_id_sm:{self.collection_id}"]
+
+            self._res = SolrConnection.search("*:*", fq=fq, fl=["id"], sort=COLLECTION_MANIFEST_SORT,
+                                              rows=self._rows, cursorMark=self.page_token or "*")
+
+        return self._res
+
+    @property
+    def exists(self) -> bool:
+        """
+        A page token can be well-formed without being a cursor mark that Solr issued, in which
+        case Solr refuses the query.
+
+        :return: False if Solr did not accept the page token as a cursor mark.
+        """
+        if self.page_token is None:
+            return True
+
+        try:
+            self.results
+        except pysolr.SolrError as e:
+            if not _invalid_cursor_mark(e):
+                raise
+            return False
+
+        return True
+
+    @property
+    def hits(self) -> int:
+        return self.results.hits
+
+    @property
+    def docs(self) -> List[Dict]:
+        """
+        :return: The summaries of the objects on this page, in page order.
+        """
+        ids: List[str] = [doc['id'] for doc in self.results.docs]
+        summaries: Dict[str, Dict] = get_object_summaries(ids, self._config)
+
+        return [summaries[i] for i in ids if i in summaries]
+
+    @property
+    def is_paged(self) -> bool:
+        """
+        :return: True if the collection has more manifests than will fit on a single page.
+        """
+        return self.hits > self._rows
+
+    @property
+    def next_token(self) -> Optional[str]:
+        """
+        Solr returns the same cursor mark that was requested once the end of the results
+        has been reached.
+
+        :return: The page token for the following page, or None if this is the last page.
+        """
+        next_mark: Optional[str] = self.results.nextCursorMark
+
+        if not next_mark or next_mark == (self.page_token or "*"):
+            return None
+
+        return next_mark
+
+    def collection_uri(self, request: Any) -> str:
+        tmpl: str = self._config['templates']['collection_id_tmpl']
+        return get_identifier(request, self.collection_id, tmpl)
+
+    def page_uri(self, request: Any, page_token: str) -> str:
+        return f"{self.collection_uri(request)}?page={quote(page_token, safe='')}"
+
+    def first_page_uri(self, request: Any) -> str:
+        return self.page_uri(request, "*")
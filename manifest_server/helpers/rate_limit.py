@@ -0,0 +1,213 @@
+"""
+    Per-client rate limiting with token buckets. Each client has a bucket of `burst` tokens, which
+    refills at `rate` tokens a second; each request takes the cost of its route from the bucket,
+    and a request that finds too few tokens is refused with a 429, and told how long to wait.
+    Harvesters that ask for the full collection or the activity stream in a tight loop soon run
+    out, while a viewer loading a manifest and its images does not.
+
+    Clients are told apart by their IP address, taken from `X-Forwarded-For` when the server is
+    behind a proxy. Clients whose User-Agent puts them in a configured class (crawlers, scripts)
+    get that class's rate instead, in buckets of their own.
+
+      >>> retry_after = RateLimiter.check(request, "collection")
+      >>> if retry_after is not None:
+      ...     return response.text("Too many requests", status=429, headers={"Retry-After": ...})
+
+    The buckets are shared by all the workers on a machine, in a small table in a memory-mapped
+    file (under /dev/shm by default, so it never touches a disk), locked with `flock`. The table
+    has a fixed number of slots; a new client takes the slot of the least recently seen client
+    near its own, whose bucket would long since have refilled.
+"""
+import os
+import time
+import mmap
+import fcntl
+import struct
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from manifest_server.helpers.metrics import Counter
+
+log = logging.getLogger(__name__)
+
+THROTTLED = Counter("manifest_server_rate_limited_total", "Requests refused by the per-client rate limit")
+
+HEADER: struct.Struct = struct.Struct("<4sIQ")
+SLOT: struct.Struct = struct.Struct("<Qdd")
+MAGIC: bytes = b"MSRL"
+VERSION: int = 1
+# The number of neighbouring slots a client's bucket may be kept in.
+PROBES: int = 8
+
+
+def _key_hash(key: str) -> int:
+    # The built-in hash is salted per process, so it can't be used to find a slot another worker wrote.
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+class SharedTokenBuckets:
+    """
+    A fixed-size table of token buckets in a memory-mapped file, shared between processes.
+    """
+    def __init__(self, path: str, slots: int) -> None:
+        self.path: str = path
+        self.slots: int = slots
+        size: int = HEADER.size + SLOT.size * slots
+
+        self._fd: int = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        with self._locked():
+            if os.fstat(self._fd).st_size != size:
+                os.ftruncate(self._fd, size)
+
+            self._map: mmap.mmap = mmap.mmap(self._fd, size)
+
+            if HEADER.unpack_from(self._map, 0) != (MAGIC, VERSION, slots):
+                self._map[:] = bytes(size)
+                HEADER.pack_into(self._map, 0, MAGIC, VERSION, slots)
+
+    def _locked(self) -> "_FileLock":
+        return _FileLock(self._fd)
+
+    def take(self, key: str, cost: float, rate: float, burst: float) -> Optional[float]:
+        """
+        Takes tokens from a client's bucket.
+
+        :param key: The client's key
+        :param cost: The number of tokens the request costs
+        :param rate: The number of tokens added to the bucket each second
+        :param burst: The size of the bucket
+        :return: None if the request may go ahead, or else the number of seconds until the
+            bucket will hold enough tokens for it.
+        """
+        h: int = _key_hash(key)
+        first: int = h % self.slots
+        now: float = time.monotonic()
+
+        with self._locked():
+            offset: int = 0
+            tokens: float = burst
+            updated: float = now
+            oldest: Optional[Tuple[float, int]] = None
+
+            for i in range(PROBES):
+                slot_offset: int = HEADER.size + SLOT.size * ((first + i) % self.slots)
+                slot_hash, slot_tokens, slot_updated = SLOT.unpack_from(self._map, slot_offset)
+
+                if slot_hash == h:
+                    offset, tokens, updated = slot_offset, slot_tokens, slot_updated
+                    break
+
+                # An empty slot is the oldest of all.
+                age: float = slot_updated if slot_hash else float("-inf")
+
+                if oldest is None or age < oldest[0]:
+                    oldest = (age, slot_offset)
+            else:
+                offset = oldest[1]  # type: ignore
+
+            tokens = min(burst, tokens + max(now - updated, 0.0) * rate)
+            retry_after: Optional[float] = None
+
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                retry_after = (cost - tokens) / rate
+
+            SLOT.pack_into(self._map, offset, h, tokens, now)
+
+        return retry_after
+
+
+class _FileLock:
+    def __init__(self, fd: int) -> None:
+        self._fd: int = fd
+
+    def __enter__(self) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class ClientRateLimiter:
+    """
+    Works out who a request is from and what it costs, and checks it against their bucket.
+    """
+    def __init__(self) -> None:
+        self._buckets: Optional[SharedTokenBuckets] = None
+        self.rate: float = 0.0
+        self.burst: float = 0.0
+        self.proxies: int = 0
+        self.costs: Dict[str, float] = {}
+        self.user_agents: List[Tuple[str, List[str], float, float]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self._buckets is not None
+
+    def configure(self, cfg: Dict) -> None:
+        """
+        :param cfg: The `rate_limit` section of the configuration
+        :return: None
+        """
+        if not cfg.get('enabled'):
+            return None
+
+        self.rate = float(cfg['rate'])
+        self.burst = float(cfg['burst'])
+        self.proxies = int(cfg.get('proxies', 0))
+        self.costs = {k: float(v) for k, v in (cfg.get('costs') or {}).items()}
+        self.user_agents = [(name, [m.lower() for m in c['match']], float(c['rate']), float(c['burst']))
+                            for name, c in (cfg.get('user_agents') or {}).items()]
+        self._buckets = SharedTokenBuckets(cfg.get('state_file', "/dev/shm/manifest_server_rate_limit"),
+                                           int(cfg.get('slots', 65536)))
+
+        return None
+
+    def client_ip(self, request: Any) -> str:
+        """
+        :param request: A Sanic request object
+        :return: The client's IP address. With `proxies` proxies in front of the server, that is
+            the address the outermost of them saw, which is that many from the end of `X-Forwarded-For`.
+        """
+        forwarded: Optional[str] = request.headers.get('X-Forwarded-For')
+
+        if self.proxies and forwarded:
+            hops: List[str] = [h.strip() for h in forwarded.split(",") if h.strip()]
+
+            if hops:
+                return hops[max(len(hops) - self.proxies, 0)]
+
+        return request.ip
+
+    def check(self, request: Any, route: str) -> Optional[float]:
+        """
+        :param request: A Sanic request object
+        :param route: The name of the route's handler, for its cost
+        :return: None if the request may go ahead, or the number of seconds the client should wait.
+        """
+        if self._buckets is None:
+            return None
+
+        user_agent: str = request.headers.get('User-Agent', "").lower()
+        client_class, rate, burst = "default", self.rate, self.burst
+
+        for name, matches, class_rate, class_burst in self.user_agents:
+            if any(m in user_agent for m in matches):
+                client_class, rate, burst = name, class_rate, class_burst
+                break
+
+        # A request can't cost more than a full bucket, or it would never be allowed.
+        cost: float = min(self.costs.get(route, self.costs.get('default', 1.0)), burst)
+        retry_after: Optional[float] = self._buckets.take(f"{client_class}:{self.client_ip(request)}",
+                                                          cost, rate, burst)
+
+        if retry_after is not None:
+            THROTTLED.inc(route=route, client_class=client_class)
+
+        return retry_after
+
+
+RateLimiter: ClientRateLimiter = ClientRateLimiter()
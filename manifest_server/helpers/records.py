@@ -0,0 +1,101 @@
+"""
+    Compact, read-only record types for the documents that a manifest holds in large numbers: its
+    surfaces, their images, and its works. A large manifest has thousands of these, and they are
+    kept in the bundle cache, so holding each as a dict of every field Solr returned is costly.
+
+    The fields the serializers use on every record are held in slots. Any other fields (the
+    metadata fields, which only a few records have) are kept in a small dict alongside, or not at
+    all. The records are Mappings, so the serializers can read them just as they read Solr
+    dicts, with `obj.get(...)` and `obj[...]`.
+
+      >>> surface = SurfaceRecord(solr_doc)
+      >>> surface.label_s, surface.get('label_s')
+      ('fol. 1r', 'fol. 1r')
+
+"""
+from collections.abc import Mapping
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional
+
+
+class Record(Mapping):
+    """
+    The base for the record types. Subclasses list their fields in `__slots__`.
+    """
+    __slots__ = ('_extra',)
+    _fields: FrozenSet[str] = frozenset()
+
+    def __init__(self, doc: Dict) -> None:
+        extra: Optional[Dict] = None
+
+        for key, value in doc.items():
+            if key in self._fields:
+                setattr(self, key, value)
+            elif extra is None:
+                extra = {key: value}
+            else:
+                extra[key] = value
+
+        self._extra: Optional[Dict] = extra
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._fields:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+
+        if self._extra is not None:
+            return self._extra[key]
+
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._fields:
+            return getattr(self, key, default)
+
+        if self._extra is not None:
+            return self._extra.get(key, default)
+
+        return default
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._fields:
+            return hasattr(self, key)  # type: ignore
+
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.__slots__:
+            if hasattr(self, key):
+                yield key
+
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({dict(self)!r})"
+
+
+class ImageRecord(Record):
+    __slots__ = ('id', 'type', 'surface_id', 'width_i', 'height_i')
+    _fields = frozenset(__slots__)
+
+
+class SurfaceRecord(Record):
+    __slots__ = ('id', 'type', 'object_id', 'label_s', 'sort_i', '_childDocuments_')
+    _fields = frozenset(__slots__)
+
+    def __init__(self, doc: Dict) -> None:
+        super().__init__(doc)
+        children: Optional[List[Dict]] = doc.get('_childDocuments_')
+
+        if children is not None:
+            self._childDocuments_: List[ImageRecord] = [ImageRecord(c) for c in children]
+
+
+class WorkRecord(Record):
+    __slots__ = ('id', 'type', 'object_id', 'work_id', 'parent_work_id', 'work_title_s', 'surfaces_sm')
+    _fields = frozenset(__slots__)
@@ -1,6 +1,11 @@
-from typing import Dict, List, Union
+import re
+import inspect
+from typing import Dict, Iterable, List, Pattern, Set, Type, Union
 import serpy
 
+# Matches the fields a serializer method reads from its record, e.g. `obj.get('label_s')` or `obj["id"]`.
+RECORD_FIELD_ACCESS: Pattern = re.compile(r"\bobj(?:\.get\(|\[)\s*['\"]([A-Za-z]\w*)['\"]")
+
 
 class ContextDictSerializer(serpy.DictSerializer):
     """
@@ -8,7 +13,12 @@ class ContextDictSerializer(serpy.DictSerializer):
     which can be used to pass extra data into the serializer.
 
     When serializing also filters out any fields with the value of `None`.
+
+    Fields that are read from the record other than by the serializer itself (e.g., in a metadata
+    block) should be listed in `extra_solr_fields`, so that `solr_fields` can find them.
     """
+    extra_solr_fields: Iterable[str] = ()
+
     def __init__(self, *args, **kwargs) -> None:
         super(ContextDictSerializer, self).__init__(*args, **kwargs)
         if 'context' in kwargs:
@@ -31,3 +41,38 @@ class ContextDictSerializer(serpy.DictSerializer):
             return [self.__remove_none(d) for d in v]
 
         return self.__remove_none(v)
+
+
+def solr_fields(*serializers: Type[serpy.Serializer]) -> List[str]:
+    """
+    Derives a Solr field list (`fl`) for the records rendered by one or more serializers, so that
+    queries only return the stored fields that will actually be used. The fields are collected from:
+
+      - the `attr` (or name) of plain serpy fields;
+      - `obj.get('...')` and `obj['...']` in the source of the serializer's methods;
+      - the serializer's `extra_solr_fields`.
+
+    Pseudo-fields, such as `_childDocuments_`, are not included, and `id` always is. Nested
+    serializers that are given the same record must be passed in as well.
+
+    :param serializers: The serializer classes
+    :return: A sorted list of field names
+    """
+    fields: Set[str] = {"id"}
+
+    for serializer in serializers:
+        fields.update(getattr(serializer, 'extra_solr_fields', ()))
+
+        for name, field in serializer._field_map.items():  # pylint: disable-msg=protected-access
+            if field.as_getter(name, serializer) is None:
+                fields.add(field.attr or name)
+
+        for cls in serializer.__mro__:
+            if cls is object or cls.__module__.startswith("serpy"):
+                continue
+
+            for member in vars(cls).values():
+                if inspect.isfunction(member):
+                    fields.update(RECORD_FIELD_ACCESS.findall(inspect.getsource(member)))
+
+    return sorted(fields)
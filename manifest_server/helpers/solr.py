@@ -1,12 +1,424 @@
+import sys
+import json
+import asyncio
+import time
 import logging
-from typing import Optional, Dict, Iterator, NewType
+import importlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Optional, Dict, Iterator, List, NewType, Set
 
 import pysolr
+import requests
+
+from manifest_server.helpers.deadline import DeadlineExceeded, remaining
+from manifest_server.helpers.solr_nodes import SolrNode, SolrNodes
+from manifest_server.helpers.hedging import HedgePolicy, HEDGE_WINS
+from manifest_server.helpers.circuit_breaker import CircuitBreaker, SolrUnavailable
+from manifest_server.helpers.adaptive_limit import AdaptiveLimit, Place
+from manifest_server.helpers.admission import LANE_PRIORITY, current_lane
 
 log = logging.getLogger(__name__)
 
 SolrResult = NewType('SolrResult', Dict)
 
+# The JSON libraries that can decode Solr responses, fastest first. orjson is optional; ujson is
+# installed with Sanic.
+JSON_DECODERS: List[str] = ["orjson", "ujson", "json"]
+
+# Solr's real-time get handler, which looks documents up directly by their unique key.
+REALTIME_GET_HANDLER: str = "get"
+
+# Hedges come after the queries of every lane for a place under the concurrency limit.
+HEDGE_PRIORITY: int = max(LANE_PRIORITY.values()) + 1
+
+
+class SolrDecoder:
+    """
+    Stands in for the `json.JSONDecoder` that pysolr decodes every response with, so that a faster JSON
+    library can be used instead. Only the `decode` method is needed.
+
+        >>> pysolr.Solr(solr_url, decoder=SolrDecoder.from_config("auto"))
+    """
+    def __init__(self, name: str, loads: Callable[[str], Any]) -> None:
+        self.name: str = name
+        self._loads: Callable[[str], Any] = loads
+
+    def decode(self, s: str) -> Any:
+        return self._loads(s)
+
+    @classmethod
+    def from_config(cls, name: Optional[str]) -> "SolrDecoder":
+        """
+        :param name: The JSON library to use, or 'auto' (or None) to use the fastest one installed.
+        :return: A decoder. Falls back to the standard library if the library asked for is not installed.
+        """
+        candidates: List[str] = JSON_DECODERS if name in (None, "auto") else [name, "json"]  # type: ignore
+
+        for candidate in candidates:
+            try:
+                module: Any = importlib.import_module(candidate)
+            except ImportError:
+                if candidate == name:
+                    log.warning("The %s JSON library is not installed; decoding Solr responses with json", name)
+                continue
+
+            return cls(candidate, module.loads)
+
+        return cls("json", json.loads)
+
+
+class DeadlineSolr(pysolr.Solr):
+    """
+    A pysolr connection that keeps to the current request's deadline; see `helpers/deadline.py`.
+    Each query is sent with the remaining budget as Solr's `timeAllowed`, and waits no longer than
+    that for a response. A query that Solr cuts short returns partial results, which would make
+    for an incomplete manifest, so that is treated as running out of time too.
+
+    Solr refuses cursor queries that also have a `timeAllowed`, so those are only bounded by how
+    long the response is waited for.
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        self._call: threading.local = threading.local()
+        super().__init__(*args, **kwargs)
+
+    # pysolr reads the URL and the timeout from the connection when it sends a request. Either can
+    # be overridden for a single request, in the thread that sends it; see `_send_as`.
+    @property
+    def url(self) -> str:
+        return getattr(self._call, 'url', None) or self._url
+
+    @url.setter
+    def url(self, value: str) -> None:
+        self._url = value
+
+    @property
+    def timeout(self) -> float:
+        return getattr(self._call, 'timeout', None) or self._timeout
+
+    @timeout.setter
+    def timeout(self, value: float) -> None:
+        self._timeout = value
+
+    def search(self, q: str, search_handler: Optional[str] = None, **kwargs) -> pysolr.Results:
+        budget: Optional[float] = remaining()
+
+        if budget is not None and 'cursorMark' not in kwargs:
+            kwargs['timeAllowed'] = max(int(budget * 1000), 1)
+
+        res: pysolr.Results = super().search(q, search_handler=search_handler, **kwargs)
+
+        if res.raw_response.get('responseHeader', {}).get('partialResults'):
+            raise DeadlineExceeded()
+
+        return res
+
+    def _send_request(self, method: str, path: str = '', body: Any = None, headers: Optional[Dict] = None,
+                      files: Any = None) -> str:
+        budget: Optional[float] = remaining()
+        timeout: float = self._timeout if budget is None else min(budget, self._timeout)
+
+        try:
+            return self._dispatch(timeout, method, path, body, headers, files)
+        except pysolr.SolrError as e:
+            # A timeout caused by the deadline is reported as such.
+            if self._cut_short(e, timeout):
+                raise DeadlineExceeded() from e
+            remaining()
+            raise
+
+    def _cut_short(self, e: pysolr.SolrError, timeout: float) -> bool:
+        """
+        :param e: The error a query failed with
+        :param timeout: The timeout the query was sent with
+        :return: True if the query timed out only because it was given less than the connection's full
+            timeout, which says nothing about whether Solr is well.
+        """
+        return timeout < self._timeout and isinstance(e.__context__, requests.Timeout)
+
+    def _dispatch(self, timeout: float, method: str, path: str, body: Any, headers: Optional[Dict],
+                  files: Any) -> str:
+        return self._send_as(self._url, timeout, method, path, body, headers, files)
+
+    def _send_as(self, url: str, timeout: float, method: str, path: str, body: Any, headers: Optional[Dict],
+                 files: Any) -> str:
+        """
+        Sends a request to the given URL, with the given timeout, in place of the connection's.
+
+        :return: The body of Solr's response
+        """
+        self._call.url = url
+        self._call.timeout = timeout
+
+        try:
+            return super()._send_request(method, path, body, headers, files)
+        finally:
+            self._call.url = None
+            self._call.timeout = None
+
+
+def _on_event_loop() -> bool:
+    """
+    :return: True if this is the thread the event loop is running in.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+
+    return True
+
+
+def _call_site() -> str:
+    """
+    :return: The function that called into this module, as "module.function".
+    """
+    frame: Any = sys._getframe(1)  # pylint: disable-msg=protected-access
+
+    while frame is not None and frame.f_globals.get('__name__') == __name__:
+        frame = frame.f_back
+
+    if frame is None:
+        return "unknown"
+
+    return f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}"
+
+
+class BalancedSolr(DeadlineSolr):
+    """
+    A pysolr connection that sends each query to one of a set of Solr replicas; see
+    `helpers/solr_nodes.py`. Queries that can't reach a node, or time out, count against it,
+    unless they were given less than the full timeout. Errors that Solr itself responds with do
+    not, since another node would give the same answer.
+
+    If a hedging policy is given, slow searches are sent again to a second replica; see
+    `helpers/hedging.py`. The queries are then sent from a small pool of threads, so that the
+    first can be waited on while the second is sent. The slower of the two can't be cancelled
+    once it has been sent, so its answer is left to the thread and discarded.
+
+    If a circuit breaker is given, it is told whether each query reached Solr (any of the
+    replicas), and queries are not sent while it is open; see `helpers/circuit_breaker.py`.
+    A query that times out because its request's deadline left it less than the full timeout
+    doesn't count either way.
+
+    If a concurrency limit is given, every query, including hedges and slower queries that have
+    been left to finish in their threads, holds a place under it while it is in flight; see
+    `helpers/adaptive_limit.py`. A query sent from the event loop's thread that finds no place
+    free fails with `SolrUnavailable` rather than holding up the loop; one sent from another
+    thread waits for a place until its timeout. A hedge that finds none is not sent.
+    """
+    def __init__(self, nodes: SolrNodes, hedging: Optional[HedgePolicy] = None, hedging_threads: int = 4,
+                 breaker: Optional[CircuitBreaker] = None, concurrency: Optional[AdaptiveLimit] = None,
+                 **kwargs) -> None:
+        super().__init__(nodes.nodes[0].url, **kwargs)
+        self.nodes: SolrNodes = nodes
+        self.breaker: Optional[CircuitBreaker] = breaker
+        self.concurrency: Optional[AdaptiveLimit] = concurrency
+        self.hedging: Optional[HedgePolicy] = hedging if len(nodes.nodes) > 1 else None
+        self._hedging_threads: int = hedging_threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def search(self, q: str, search_handler: Optional[str] = None, **kwargs) -> pysolr.Results:
+        # Only searches are hedged; they are all reads. The concurrency limit keeps a baseline
+        # response time for each call site.
+        self._call.site = _call_site() if self.hedging or self.concurrency else None
+
+        try:
+            return super().search(q, search_handler=search_handler, **kwargs)
+        finally:
+            self._call.site = None
+
+    def _dispatch(self, timeout: float, method: str, path: str, body: Any, headers: Optional[Dict],
+                  files: Any) -> str:
+        place: Optional[Place] = self._acquire(timeout) if self.concurrency is not None else None
+
+        if self.breaker is None:
+            return self._send_balanced(place, timeout, method, path, body, headers, files)
+
+        try:
+            self.breaker.before()
+        except SolrUnavailable:
+            if place is not None:
+                self.concurrency.cancel(place)  # type: ignore
+            raise
+
+        reached: Optional[bool] = True
+
+        try:
+            return self._send_balanced(place, timeout, method, path, body, headers, files)
+        except pysolr.SolrError as e:
+            if self._cut_short(e, timeout):
+                reached = None
+            else:
+                reached = not isinstance(e.__context__, requests.RequestException)
+            raise
+        finally:
+            if reached is None:
+                self.breaker.abandoned()
+            elif reached:
+                self.breaker.succeeded()
+            else:
+                self.breaker.failed()
+
+    def _acquire(self, timeout: float) -> Place:
+        """
+        Takes a place under the concurrency limit for a query, waiting for one if the query is not
+        sent from the event loop's thread.
+
+        :param timeout: The timeout the query will be sent with, which is also the longest to wait.
+        :return: The place
+        :raises SolrUnavailable: If there was no place.
+        """
+        priority: int = LANE_PRIORITY[current_lane.get()]
+
+        if _on_event_loop():
+            place: Optional[Place] = self.concurrency.try_acquire(priority)  # type: ignore
+        else:
+            place = self.concurrency.acquire(priority, timeout)  # type: ignore
+
+        if place is None:
+            raise SolrUnavailable(retry_after=1.0)
+
+        return place
+
+    def _send_balanced(self, place: Optional[Place], timeout: float, method: str, path: str, body: Any,
+                       headers: Optional[Dict], files: Any) -> str:
+        site: Optional[str] = getattr(self._call, 'site', None)
+        node: SolrNode = self.nodes.choose()
+        delay: Optional[float] = self.hedging.delay(site) if self.hedging and site else None
+
+        if delay is None or delay >= timeout:
+            return self._send_to(node, place, site, timeout, method, path, body, headers, files)
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._hedging_threads,
+                                                thread_name_prefix="solr-hedging")
+
+        first: Future = self._executor.submit(self._send_to, node, place, site, timeout, method, path, body,
+                                              headers, files)
+        done, _ = wait([first], timeout=delay)
+        other: Optional[SolrNode] = None if done else self.nodes.alternative(node)
+        hedge_place: Optional[Place] = None
+
+        if other is None:
+            return first.result()
+
+        if self.concurrency is not None:
+            hedge_place = self.concurrency.try_acquire(HEDGE_PRIORITY, background=True)
+
+            if hedge_place is None:
+                return first.result()
+
+        if not self.hedging.allow():  # type: ignore
+            if hedge_place is not None:
+                self.concurrency.cancel(hedge_place)  # type: ignore
+            return first.result()
+
+        hedge: Future = self._executor.submit(self._send_to, other, hedge_place, site, timeout - delay, method,
+                                              path, body, headers, files)
+        pending: Set[Future] = {first, hedge}
+
+        # The first answer wins; if it was an error, the other query may yet succeed.
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        HEDGE_WINS.inc()
+                        # The first query is left to finish in its thread, as background work.
+                        if place is not None and first in pending:
+                            self.concurrency.demote(place)  # type: ignore
+                    return future.result()
+
+        return first.result()
+
+    def _send_to(self, node: SolrNode, place: Optional[Place], site: Optional[str], timeout: float, method: str,
+                 path: str, body: Any, headers: Optional[Dict], files: Any) -> str:
+        """
+        Sends a request to one node, and records how it went.
+
+        :return: The body of Solr's response
+        """
+        start: float = time.monotonic()
+        ok: bool = True
+
+        try:
+            res: str = self._send_as(node.url, timeout, method, path, body, headers, files)
+        except pysolr.SolrError as e:
+            # A timeout only counts against the node if it was given the full timeout.
+            if isinstance(e.__context__, requests.RequestException) and not self._cut_short(e, timeout):
+                self.nodes.failed(node)
+                ok = False
+            raise
+        finally:
+            # The place under the concurrency limit was taken before the query was sent.
+            if place is not None:
+                self.concurrency.release(place, site, time.monotonic() - start, ok)  # type: ignore
+
+        elapsed: float = time.monotonic() - start
+        self.nodes.succeeded(node, elapsed)
+
+        if self.hedging and site:
+            self.hedging.record(site, elapsed)
+
+        return res
+
+
+def get_documents(solr_conn: pysolr.Solr, ids: List[str], doc_type: Optional[str] = None,
+                  fl: Optional[List] = None) -> List[SolrResult]:
+    """
+    Fetches documents by their IDs with the real-time get handler, rather than the search handler. This
+    skips query parsing and the filter cache, which a lookup by ID does not need. Document transformers,
+    such as `[child]`, may still be given in the field list.
+
+        >>> docs = get_documents(SolrConnection, [f"{canvas_id}_surface"], doc_type="surface",
+        ...                      fl=["*,[child parentFilter=type:surface childFilter=type:image]"])
+
+    The get handler does not take filter queries, so the type of each document is checked here instead.
+
+    :param solr_conn: A pysolr connection
+    :param ids: The IDs of the documents to fetch
+    :param doc_type: If given, documents that are not of this type are left out.
+    :param fl: The fields to return. The `id` field, and the `type` field if it is needed to check the type, are added.
+    :return: The documents that were found, in the order of their IDs.
+    """
+    if not ids:
+        return []
+
+    kwargs: Dict = {"ids": ",".join(ids)}
+
+    if fl:
+        fields: List = list(fl)
+        required: List[str] = ["id", "type"] if doc_type else ["id"]
+
+        if not any(f.startswith("*") for f in fields):
+            fields.extend(f for f in required if f not in fields)
+
+        kwargs["fl"] = fields
+
+    res: pysolr.Results = solr_conn.search("*:*", search_handler=REALTIME_GET_HANDLER, **kwargs)
+    found: Dict[str, SolrResult] = {doc['id']: doc for doc in res.docs
+                                    if doc_type is None or doc.get('type') == doc_type}
+
+    return [found[i] for i in ids if i in found]
+
+
+def get_document(solr_conn: pysolr.Solr, doc_id: str, doc_type: Optional[str] = None,
+                 fl: Optional[List] = None) -> Optional[SolrResult]:
+    """
+    Fetches a single document by its ID; see `get_documents`.
+
+    :param solr_conn: A pysolr connection
+    :param doc_id: The ID of the document to fetch
+    :param doc_type: If given, the document must be of this type.
+    :param fl: The fields to return.
+    :return: The document, or None if there is no document of that type with that ID.
+    """
+    docs: List[SolrResult] = get_documents(solr_conn, [doc_id], doc_type=doc_type, fl=fl)
+
+    return docs[0] if docs else None
+
 
 class SolrManager:
     """
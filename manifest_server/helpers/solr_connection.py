@@ -2,24 +2,42 @@
     A Singleton for a global Solr connection. Methods that wish
     to make use of a global Solr connection can import this module
     and it will give them an instance of a pysolr connection that
-    they can then use to perform searches.
+    they can then use to perform searches. If more than one Solr
+    server is configured, the queries are spread across them.
 
       >>> from manifest_server.helpers.solr_connection import SolrConnection
       >>> res = SolrConnection.search("MS Bodl 266")
 
 """
-from typing import Dict
+from typing import Dict, Optional
 import yaml
 import logging
 
 import pysolr
 
+from manifest_server.helpers.solr import BalancedSolr, SolrDecoder
+from manifest_server.helpers.solr_nodes import SolrNodes
+from manifest_server.helpers.hedging import HedgePolicy
+from manifest_server.helpers.circuit_breaker import CircuitBreaker
+from manifest_server.helpers.adaptive_limit import AdaptiveLimit
 
 log = logging.getLogger(__name__)
 
 config: Dict = yaml.safe_load(open('configuration.yml', 'r'))
 
-solr_url = config['solr']['server']
-SolrConnection: pysolr.Solr = pysolr.Solr(solr_url, search_handler='iiif')
+solr_nodes: SolrNodes = SolrNodes.from_config(config['solr'])
+decoder: SolrDecoder = SolrDecoder.from_config(config['solr'].get('decoder'))
+hedging_cfg: Dict = config['solr'].get('hedging') or {}
+hedging: Optional[HedgePolicy] = HedgePolicy.from_config(hedging_cfg)
+breaker: CircuitBreaker = CircuitBreaker.from_config(config['solr'].get('circuit_breaker') or {})
+concurrency: Optional[AdaptiveLimit] = None
 
-log.debug('Solr connection set to %s', solr_url)
+if config['solr'].get('concurrency'):
+    concurrency = AdaptiveLimit.from_config(config['solr']['concurrency'])
+
+SolrConnection: pysolr.Solr = BalancedSolr(solr_nodes, hedging=hedging, hedging_threads=int(hedging_cfg.get('threads', 4)),
+                                           breaker=breaker, concurrency=concurrency,
+                                           search_handler='iiif', decoder=decoder)
+
+log.debug('Solr connection set to %s, decoding responses with %s',
+          ", ".join(n.url for n in solr_nodes.nodes), decoder.name)
@@ -0,0 +1,176 @@
+"""
+    Spreads Solr queries across a set of replicas. `solr.server` in the configuration may be a
+    list of URLs rather than a single one, in which case each query is sent to one of them,
+    chosen at random in proportion to how quickly it has been answering (the inverse of a moving
+    average of its response times). Each worker sends its queries one at a time, so the number of
+    outstanding requests doesn't tell the nodes apart; their latency does.
+
+    A node is ejected after `failures` queries in a row fail to reach it, and is checked in the
+    background every `interval` seconds with Solr's ping handler. Nodes that fail the check are
+    ejected, and ejected nodes that pass it are brought back. If every node has been ejected,
+    queries are spread across all of them anyway.
+
+      >>> nodes = SolrNodes(["http://solr1:8983/solr/core", "http://solr2:8983/solr/core"])
+      >>> node = nodes.choose()
+
+    The connection that uses these is `BalancedSolr`, in `helpers/solr.py`.
+"""
+import asyncio
+import logging
+import random
+from typing import Dict, List, Optional
+
+import requests
+
+from manifest_server.helpers.metrics import Gauge
+
+log = logging.getLogger(__name__)
+
+NODE_HEALTHY = Gauge("manifest_server_solr_node_healthy", "Whether a Solr node is taking queries (1) or ejected (0)")
+NODE_LATENCY = Gauge("manifest_server_solr_node_latency_seconds", "Moving average of a Solr node's response time")
+
+# The weight given to each new response time in the moving average.
+LATENCY_ALPHA: float = 0.2
+# The latency assumed for a node before it has answered any queries.
+INITIAL_LATENCY: float = 0.05
+
+
+class SolrNode:
+    __slots__ = ('url', 'latency', 'failures', 'healthy')
+
+    def __init__(self, url: str) -> None:
+        self.url: str = url.rstrip("/")
+        self.latency: float = INITIAL_LATENCY
+        self.failures: int = 0
+        self.healthy: bool = True
+
+    def __repr__(self) -> str:
+        return f"SolrNode({self.url!r}, latency={self.latency:.3f}, healthy={self.healthy})"
+
+
+class SolrNodes:
+    def __init__(self, urls: List[str], max_failures: int = 3, interval: float = 10.0, timeout: float = 2.0) -> None:
+        self.nodes: List[SolrNode] = [SolrNode(u) for u in urls]
+        self.max_failures: int = max_failures
+        self.interval: float = interval
+        self.timeout: float = timeout
+        self._checks: Optional[asyncio.Task] = None
+
+        for node in self.nodes:
+            self._update(node)
+
+    @classmethod
+    def from_config(cls, cfg: Dict) -> "SolrNodes":
+        """
+        :param cfg: The `solr` section of the configuration
+        :return: The nodes listed in `server`, with the settings in `health_check`
+        """
+        servers = cfg['server']
+        urls: List[str] = [servers] if isinstance(servers, str) else list(servers)
+        checks: Dict = cfg.get('health_check') or {}
+
+        return cls(urls,
+                   max_failures=int(checks.get('failures', 3)),
+                   interval=float(checks.get('interval', 10)),
+                   timeout=float(checks.get('timeout', 2)))
+
+    def choose(self) -> SolrNode:
+        """
+        :return: A node to send a query to, weighted towards the faster ones.
+        """
+        candidates: List[SolrNode] = [n for n in self.nodes if n.healthy] or self.nodes
+
+        if len(candidates) == 1:
+            return candidates[0]
+
+        return random.choices(candidates, weights=[1 / n.latency for n in candidates])[0]
+
+    def alternative(self, node: SolrNode) -> Optional[SolrNode]:
+        """
+        :param node: A node that a query has already been sent to
+        :return: Another healthy node to send it to, or None if there isn't one.
+        """
+        candidates: List[SolrNode] = [n for n in self.nodes if n.healthy and n is not node]
+
+        if not candidates:
+            return None
+
+        return random.choices(candidates, weights=[1 / n.latency for n in candidates])[0]
+
+    def succeeded(self, node: SolrNode, elapsed: float) -> None:
+        node.latency += LATENCY_ALPHA * (max(elapsed, 0.001) - node.latency)
+        node.failures = 0
+        self._update(node)
+
+    def failed(self, node: SolrNode) -> None:
+        node.failures += 1
+
+        if node.healthy and node.failures >= self.max_failures:
+            log.warning("Ejecting Solr node %s after %s failed queries", node.url, node.failures)
+            node.healthy = False
+
+        self._update(node)
+
+    def ping(self, node: SolrNode) -> bool:
+        """
+        :param node: A node to check
+        :return: True if the node's ping handler says it is OK.
+        """
+        try:
+            res: requests.Response = requests.get(f"{node.url}/admin/ping", params={"wt": "json"},
+                                                  timeout=self.timeout)
+            return res.status_code == 200 and res.json().get('status') == "OK"
+        except (requests.RequestException, ValueError):
+            return False
+
+    async def check(self) -> None:
+        """
+        Pings every node, ejecting the ones that fail and bringing back the ones that pass. The
+        pings are sent from the loop's default thread pool, so they don't hold up requests.
+
+        :return: None
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+        results: List[bool] = await asyncio.gather(*(loop.run_in_executor(None, self.ping, n) for n in self.nodes))
+
+        for node, ok in zip(self.nodes, results):
+            if ok and not node.healthy:
+                log.warning("Solr node %s is back", node.url)
+            elif not ok and node.healthy:
+                log.warning("Ejecting Solr node %s after a failed health check", node.url)
+
+            node.healthy = ok
+            node.failures = 0 if ok else node.failures
+            self._update(node)
+
+        return None
+
+    async def run_health_checks(self) -> None:
+        """
+        Checks the nodes every `interval` seconds, until cancelled.
+
+        :return: None
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    def start(self) -> None:
+        """
+        Starts the background health checks, if there is more than one node to choose from.
+
+        :return: None
+        """
+        if len(self.nodes) > 1 and self._checks is None:
+            self._checks = asyncio.get_event_loop().create_task(self.run_health_checks())
+
+    def stop(self) -> None:
+        if self._checks is not None:
+            self._checks.cancel()
+            self._checks = None
+
+    @staticmethod
+    def _update(node: SolrNode) -> None:
+        NODE_HEALTHY.set(1 if node.healthy else 0, node=node.url)
+        NODE_LATENCY.set(round(node.latency, 6), node=node.url)
+
@@ -0,0 +1,80 @@
+"""
+    Short summaries of object records: the shelfmark, thumbnail and collections for an object ID.
+    These are needed whenever a resource points back to the manifest it belongs to (e.g., the
+    `partOf` of a canvas or annotation page that is requested directly), and for every manifest
+    in a collection listing. Viewers that step through the canvases of a book one at a time ask
+    for the same summary many times, so they are kept in the 'summaries' cache.
+
+      >>> summary = get_object_summary(canvas_record['object_id'], config)
+      >>> summary.get('full_shelfmark_s')
+      'MS. Bodl. 264'
+
+"""
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+from manifest_server.helpers.cache import configured_cache, ExpiringLRUCache
+from manifest_server.helpers.solr import get_documents
+from manifest_server.helpers.solr_connection import SolrConnection
+
+SUMMARY_FIELDS: List = ["id", "full_shelfmark_s", "thumbnail_id", "all_collections_id_sm"]
+
+# Keeps the list of IDs in each request for uncached summaries to a reasonable length.
+LOOKUP_BATCH_SIZE: int = 500
+
+
+def get_object_summary(object_id: str, config: Dict) -> Optional[Dict]:
+    """
+    :param object_id: The ID of an object
+    :param config: A manifest server configuration dict
+    :return: A dictionary of the summary fields, or None if there is no such object.
+    """
+    return get_object_summaries([object_id], config).get(object_id)
+
+
+def cache_object_summary(doc: Dict, config: Dict) -> None:
+    """
+    Adds the summary of an object record that was retrieved for some other purpose to the cache.
+
+    :param doc: A Solr object record, which must include the summary fields
+    :param config: A manifest server configuration dict
+    :return: None
+    """
+    summary: Dict = {k: doc[k] for k in SUMMARY_FIELDS if k in doc}
+    configured_cache("summaries", config).set(doc['id'], summary)
+
+
+def get_object_summaries(object_ids: List[str], config: Dict) -> Dict[str, Dict]:
+    """
+    Looks up the summaries for a list of objects. Any that are not in the cache are retrieved
+    from Solr together, and then cached.
+
+    :param object_ids: A list of object IDs
+    :param config: A manifest server configuration dict
+    :return: A dictionary of object ID to its summary. Objects that do not exist are left out.
+    """
+    cache: ExpiringLRUCache = configured_cache("summaries", config)
+    summaries: Dict[str, Dict] = {}
+    missing: List[str] = []
+
+    for object_id in object_ids:
+        summary: Optional[Dict] = cache.get(object_id)
+
+        if summary is None:
+            missing.append(object_id)
+        else:
+            summaries[object_id] = summary
+
+    ids: Iterator[str] = iter(missing)
+
+    while True:
+        batch: List[str] = list(islice(ids, LOOKUP_BATCH_SIZE))
+
+        if not batch:
+            break
+
+        for doc in get_documents(SolrConnection, batch, doc_type="object", fl=SUMMARY_FIELDS):
+            cache.set(doc['id'], doc)
+            summaries[doc['id']] = doc
+
+    return summaries
@@ -0,0 +1,63 @@
+"""
+    Every document is stamped with an `indexed` timestamp when it is written to Solr
+    (see the auto-timestamp update processor in solrconfig.xml). The most recent of these,
+    together with the number of documents, tells us cheaply whether anything has changed
+    since we last looked, and so whether anything derived from the index needs to be rebuilt.
+"""
+import time
+import threading
+from typing import List, Optional, Tuple
+
+import pysolr
+
+from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.helpers.circuit_breaker import SolrUnavailable
+
+# The number of matching documents, and the most recent `indexed` timestamp among them.
+IndexState = Tuple[int, Optional[str]]
+
+
+def index_state(fq: Optional[List] = None) -> IndexState:
+    """
+    :param fq: An optional list of filter queries to restrict the documents that are considered
+    :return: The number of documents and the most recent `indexed` timestamp.
+    """
+    res: pysolr.Results = SolrConnection.search("*:*", fq=fq or [], fl=["indexed"], sort="indexed desc", rows=1)
+
+    if not res.docs:
+        return res.hits, None
+
+    return res.hits, res.docs[0].get('indexed')
+
+
+class IndexWatermark:
+    """
+    Remembers the index state for a set of filter queries, and only asks Solr for it
+    again once it is older than the interval given.
+
+        >>> watermark = IndexWatermark(["type:object"])
+        >>> if watermark.current(60) != last_seen:
+        ...     rebuild()
+    """
+    def __init__(self, fq: Optional[List] = None) -> None:
+        self._fq: Optional[List] = fq
+        self._state: Optional[IndexState] = None
+        self._checked: float = 0.0
+        self._lock: threading.Lock = threading.Lock()
+
+    def current(self, interval: float) -> IndexState:
+        """
+        :param interval: The number of seconds for which a previously retrieved state is used.
+        :return: The index state, as described in `index_state`.
+        """
+        with self._lock:
+            if self._state is None or time.monotonic() - self._checked > interval:
+                try:
+                    self._state = index_state(self._fq)
+                    self._checked = time.monotonic()
+                except SolrUnavailable:
+                    # Carry on with the last state we saw until Solr is back.
+                    if self._state is None:
+                        raise
+
+            return self._state
@@ -1,7 +1,6 @@
 from typing import List, Dict, Optional
 
 import serpy
-import pysolr
 
 from manifest_server.helpers.serializers import ContextDictSerializer
 from manifest_server.helpers.fields import StaticField
@@ -11,22 +10,21 @@ from manifest_server.helpers.identifiers import (
     IIIF_ASTREAMS_ACTOR
 )
 from manifest_server.helpers.solr_connection import SolrConnection
-from manifest_server.helpers.solr import SolrResult
+from manifest_server.helpers.solr import SolrResult, get_document
+from manifest_server.helpers.negative_cache import negative_cached
 
 
+@negative_cached("activity", id_formats=["{}"])
 def create_activity(request, manifest_id: str, config: Dict) -> Optional[Dict]:
-    fq: List = ["type:object",
-                f"id:{manifest_id}"]
     fl: List = ["id", "accessioned_dt", "full_shelfmark_s"]
-    rows: int = 1
-    results: pysolr.Results = SolrConnection.search("*:*", fq=fq, fl=fl, rows=rows)
+    record: Optional[SolrResult] = get_document(SolrConnection, manifest_id, doc_type="object", fl=fl)
 
-    if results.hits == 0:
+    if record is None:
         return None
 
-    return Activity(results.docs[0], context={'request': request,
-                                              'config': config,
-                                              'direct_request': True}).data
+    return Activity(record, context={'request': request,
+                                     'config': config,
+                                     'direct_request': True}).data
 
 
 class Activity(ContextDictSerializer):
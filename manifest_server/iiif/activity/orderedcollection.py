@@ -1,13 +1,11 @@
-from typing import List, Dict, Optional
-import math
+from typing import Dict, Optional
 
 import serpy
-import pysolr
 
 from manifest_server.helpers.serializers import ContextDictSerializer
 from manifest_server.helpers.fields import StaticField
 from manifest_server.helpers.identifiers import IIIF_ASTREAMS_CONTEXT, get_identifier
-from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.iiif.activity.stream_index import ActivityStreamPages
 
 
 def create_ordered_collection(request, req_id: str, config: Dict) -> Optional[Dict]:  # pylint: disable-msg=unused-argument
@@ -16,23 +14,21 @@ def create_ordered_collection(request, req_id: str, config: Dict) -> Optional[Di
     containing only pointers to the first and last pages, and the total number
     of results.
 
+    Both numbers come from the in-memory ActivityStream page index, so this does not
+    normally need to query Solr.
+
     :param request: A Sanic request object
     :param req_id: UNUSED. Added for API compatibility with other AS response functions
     :param config: A manifest server configuration dict
     :return: A dictionary for serialization as a JSON-LD response.
     """
-    fq: List = ["type:object",
-                "!all_collections_id_sm:talbot"]
-    fl: List = ["id", "accessioned_dt", "full_shelfmark_s"]
-    # We only need the number of hits for this query, so we don't have to retrieve any documents,
-    # only the total that would be returned
-    rows: int = 0
-    results: pysolr.Results = SolrConnection.search("*:*", fq=fq, fl=fl, rows=rows)
-
-    if results.hits == 0:
+    total: int = ActivityStreamPages.total(config)
+
+    if total == 0:
         return None
 
-    return OrderedCollection({'results': results}, context={
+    return OrderedCollection({'total': total,
+                              'last_page': ActivityStreamPages.last_page(config)}, context={
         "request": request,
         "config": config,
         "direct_request": True
@@ -41,11 +37,10 @@ def create_ordered_collection(request, req_id: str, config: Dict) -> Optional[Di
 
 class OrderedCollection(ContextDictSerializer):
     """
-    Unlike other serializers in the manifest server, this one takes a dictionary that
-    has a single key, 'results', which in turn wraps a pysolr.Results instance. We query
-    that instance in this serializer to work out the numbers for the ordered collection,
-    but we don't actually ever need the results. (See `create_ordered_collection` above
-    for the Solr query that is serialized.)
+    Unlike other serializers in the manifest server, this one does not take a Solr
+    result. It takes a dictionary with two keys, 'total' and 'last_page', holding
+    the number of items in the stream and the number of its last page. (See
+    `create_ordered_collection` above for where these come from.)
     """
     ctx = StaticField(
         label="@context",
@@ -74,7 +69,7 @@ class OrderedCollection(ContextDictSerializer):
         return get_identifier(req, 'all-changes', streams_tmpl)
 
     def get_total_items(self, obj: Dict) -> int:
-        return obj.get('results').hits
+        return obj.get('total')
 
     def get_first(self, obj: Dict) -> Dict:  # pylint: disable-msg=unused-argument
         req = self.context.get('request')
@@ -90,10 +85,7 @@ class OrderedCollection(ContextDictSerializer):
         req = self.context.get('request')
         cfg = self.context.get('config')
 
-        pagesize: int = int(cfg['solr']['pagesize'])
-        hits: int = int(obj.get('results').hits)
-        page_no: int = math.floor(hits / pagesize)
-        page_id: str = f"page-{page_no}"
+        page_id: str = f"page-{obj.get('last_page')}"
         page_tmpl: str = cfg['templates']['activitystream_id_tmpl']
 
         return {
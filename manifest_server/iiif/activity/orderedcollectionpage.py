@@ -1,5 +1,4 @@
 from typing import List, Dict, Optional
-import math
 
 import serpy
 import pysolr
@@ -8,17 +7,29 @@ from manifest_server.helpers.fields import StaticField
 from manifest_server.helpers.identifiers import IIIF_ASTREAMS_CONTEXT, get_identifier
 from manifest_server.helpers.solr_connection import SolrConnection
 from manifest_server.iiif.activity.activity import Activity
+from manifest_server.iiif.activity.stream_index import ActivityStreamPages, ACTIVITY_FQ, ACTIVITY_SORT
 
 
 def create_ordered_collection_page(request, page_id: int, config: Dict) -> Optional[Dict]:
-    fq: List = ["type:object",
-                "!all_collections_id_sm:talbot"]
-    sort: str = "accessioned_dt asc, shelfmark_sort_ans asc, id asc"
+    """
+    Retrieves a page of the ActivityStream. Pages are looked up by the cursor mark at which they
+    start (see `stream_index`), so that later pages cost no more to retrieve than the first.
+
+    :param request: A Sanic request object
+    :param page_id: The number of the page to retrieve
+    :param config: A manifest server configuration dict
+    :return: A dictionary for serialization as a JSON-LD response, or None if there is no such page.
+    """
+    cursor: Optional[str] = ActivityStreamPages.page_cursor(page_id, config)
+
+    if cursor is None:
+        return None
+
     fl: List = ["id", "accessioned_dt", "full_shelfmark_s"]
     rows: int = config['solr']['pagesize']
-    start: int = page_id * int(rows)
 
-    results: pysolr.Results = SolrConnection.search("*:*", fq=fq, fl=fl, sort=sort, rows=rows, start=start)
+    results: pysolr.Results = SolrConnection.search("*:*", fq=ACTIVITY_FQ, fl=fl, sort=ACTIVITY_SORT,
+                                                    rows=rows, cursorMark=cursor)
 
     if results.hits == 0:
         return None
@@ -26,6 +37,7 @@ def create_ordered_collection_page(request, page_id: int, config: Dict) -> Optio
     return OrderedCollectionPage({'results': results}, context={'request': request,
                                                                 'config': config,
                                                                 'page_id': page_id,
+                                                                'last_page': ActivityStreamPages.last_page(config),
                                                                 'direct_request': True}).data
 
 
@@ -111,11 +123,8 @@ class OrderedCollectionPage(ContextDictSerializer):
         req = self.context.get('request')
         cfg = self.context.get('config')
 
-        hits: int = obj.get('results').hits
-        pagesize: int = int(cfg['solr']['pagesize'])
-
-        next_page = self.context.get("page_id") + 1
-        last_page = math.floor(hits / pagesize)
+        next_page: int = self.context.get("page_id") + 1
+        last_page: int = self.context.get("last_page")
 
         # If we're on the last page, don't show the next key
         if next_page > last_page:
@@ -0,0 +1,160 @@
+"""
+    Keeps an index of where each page of the ActivityStream starts, so that any
+    page can be retrieved with a Solr cursor mark instead of a deep `start` offset.
+
+    The index is a list of cursor marks, one per page: the cursor mark at position N
+    is the one that will return the first item of 'page-N'. It is built by walking the
+    whole stream once, retrieving only the document IDs, and is then kept in memory.
+
+    The total number of items and the number of the last page are kept with it, so that
+    the root OrderedCollection, and the navigation links on each page, can be served
+    without asking Solr. Once the configured refresh interval has passed, a single
+    one-row query checks whether the number of activity records or the most recent
+    `indexed` timestamp among them has moved; the index is only rebuilt if it has.
+
+    Walking the stream can take longer than a request's deadline, so the walk is not held to
+    the deadline of the request that starts it; see `helpers/deadline.py`. The index is built
+    when the server starts, so that the first requests don't have to wait for it. When it has
+    to be rebuilt, the new index is walked in a background thread, and the old one is served
+    until the new one is ready.
+"""
+import math
+import logging
+import threading
+from typing import List, Dict, Optional, Tuple
+
+import pysolr
+
+from manifest_server.helpers.deadline import set_deadline, reset_deadline
+from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.helpers.watermark import IndexWatermark, IndexState
+
+log = logging.getLogger(__name__)
+
+ACTIVITY_FQ: List = ["type:object",
+                     "!all_collections_id_sm:talbot"]
+# The unique key must be part of the sort for Solr to use cursor marks.
+ACTIVITY_SORT: str = "accessioned_dt asc, shelfmark_sort_ans asc, id asc"
+
+
+class ActivityStreamIndex:
+    """
+    Maps ActivityStream page numbers to the Solr cursor marks that begin them.
+
+        >>> cursor = ActivityStreamPages.page_cursor(12, config)
+        >>> SolrConnection.search("*:*", fq=ACTIVITY_FQ, sort=ACTIVITY_SORT, rows=pagesize, cursorMark=cursor)
+    """
+    def __init__(self) -> None:
+        self._cursors: List[str] = []
+        self._total: int = 0
+        self._state: Optional[IndexState] = None
+        self._watermark: IndexWatermark = IndexWatermark(ACTIVITY_FQ)
+        self._lock: threading.Lock = threading.Lock()
+        self._refreshing: bool = False
+
+    def total(self, config: Dict) -> int:
+        """
+        :param config: A manifest server configuration dict
+        :return: The number of items in the ActivityStream
+        """
+        self._current(config)
+        return self._total
+
+    def last_page(self, config: Dict) -> int:
+        """
+        :param config: A manifest server configuration dict
+        :return: The number of the last page of the ActivityStream
+        """
+        return len(self._current(config)) - 1
+
+    def page_cursor(self, page_id: int, config: Dict) -> Optional[str]:
+        """
+        :param page_id: The requested page number
+        :param config: A manifest server configuration dict
+        :return: The cursor mark for the start of the page, or None if there is no such page.
+        """
+        if page_id < 0:
+            return None
+
+        cursors: List[str] = self._current(config)
+
+        if page_id >= len(cursors):
+            return None
+
+        return cursors[page_id]
+
+    def build(self, config: Dict) -> None:
+        """
+        Walks the whole stream into a new index. Called when the server starts.
+
+        :param config: A manifest server configuration dict
+        :return: None
+        """
+        with self._lock:
+            self._state = self._watermark.current(int(config['activity']['refresh_interval']))
+            self._build(config)
+
+    def _current(self, config: Dict) -> List[str]:
+        refresh_interval: int = int(config['activity']['refresh_interval'])
+
+        with self._lock:
+            state: IndexState = self._watermark.current(refresh_interval)
+
+            if not self._cursors:
+                # There is no index to serve yet, so this request has to wait for one.
+                self._build(config)
+                self._state = state
+            elif state != self._state and not self._refreshing:
+                self._refreshing = True
+                threading.Thread(target=self._refresh, args=(config, state), name="activity-index",
+                                 daemon=True).start()
+
+            return self._cursors
+
+    def _refresh(self, config: Dict, state: IndexState) -> None:
+        # A new thread starts without the deadline of the request that started it.
+        try:
+            cursors, total = self._walk(config)
+
+            with self._lock:
+                self._cursors, self._total, self._state = cursors, total, state
+        except pysolr.SolrError as e:
+            # The old index is served until the next request tries again.
+            log.warning("Could not rebuild the ActivityStream page index: %s", e)
+        finally:
+            self._refreshing = False
+
+    def _build(self, config: Dict) -> None:
+        # The walk is shared by every request that follows, so it is not cut short by this one's deadline.
+        token = set_deadline(0)
+
+        try:
+            self._cursors, self._total = self._walk(config)
+        finally:
+            reset_deadline(token)
+
+    def _walk(self, config: Dict) -> Tuple[List[str], int]:
+        rows: int = int(config['solr']['pagesize'])
+        cursors: List[str] = []
+        cursor: str = "*"
+
+        while True:
+            cursors.append(cursor)
+            res: pysolr.Results = SolrConnection.search("*:*", fq=ACTIVITY_FQ, fl=["id"], sort=ACTIVITY_SORT,
+                                                        rows=rows, cursorMark=cursor)
+
+            # Page numbering follows the OrderedCollection's 'last' page, which is the
+            # number of hits divided by the page size, rounded down.
+            last_page: int = math.floor(res.hits / rows)
+
+            if len(cursors) > last_page or not res.nextCursorMark:
+                break
+
+            cursor = res.nextCursorMark
+
+        log.debug("Built the ActivityStream page index with %s pages for %s items", len(cursors), res.hits)
+
+        return cursors, res.hits
+
+
+ActivityStreamPages: ActivityStreamIndex = ActivityStreamIndex()
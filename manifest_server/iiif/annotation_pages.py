@@ -0,0 +1,61 @@
+"""
+    Retrieves an annotation page, together with everything needed to serialize it, in a single
+    Solr query: the page record itself (a surface, for pages of image annotations, or an annotation
+    page), its text annotations with their bodies, and the object it belongs to.
+
+    The query matches the page by its ID, the annotations by their `annotationpage_id`, and the
+    object with a join from the page's `object_id`. The results are then separated by type. The
+    object record is added to the object summaries cache, where the `partOf` label is looked up.
+"""
+import logging
+from typing import Dict, List, Optional
+
+from manifest_server.helpers.solr import SolrManager, SolrResult
+from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.helpers.summaries import cache_object_summary
+from manifest_server.iiif.field_lists import annotation_page_fl
+
+log = logging.getLogger(__name__)
+
+
+class AnnotationPageRecords:
+    __slots__ = ('page', 'annotations')
+
+    def __init__(self, page: SolrResult, annotations: List[SolrResult]) -> None:
+        self.page: SolrResult = page
+        self.annotations: List[SolrResult] = annotations
+
+
+def fetch_annotation_page(page_ids: List[str], config: Dict) -> Optional[AnnotationPageRecords]:
+    """
+    :param page_ids: The Solr IDs that the requested page may have, in order of preference;
+        e.g., both '<id>_surface' and '<id>' for a IIIF v3 annotation page.
+    :param config: A manifest server configuration dict
+    :return: The records for the page, or None if there is no such page.
+    """
+    page_q: str = " OR ".join(f'id:"{i}"' for i in page_ids)
+    annotations_q: str = " OR ".join(f'annotationpage_id:"{i}"' for i in page_ids)
+
+    fq: List = [f"{page_q} OR (type:annotation AND ({annotations_q})) "
+                "OR {!join from=object_id to=id v=$page_q}"]
+
+    manager: SolrManager = SolrManager(SolrConnection)
+    manager.search("*:*", fq=fq, fl=annotation_page_fl(), rows=100, page_q=page_q)
+
+    pages: Dict[str, SolrResult] = {}
+    annotations: List[SolrResult] = []
+
+    for res in manager.results:
+        if res['id'] in page_ids:
+            pages[res['id']] = res
+        elif res.get('type') == 'annotation':
+            annotations.append(res)
+        elif res.get('type') == 'object':
+            cache_object_summary(res, config)
+
+    page: Optional[SolrResult] = next((pages[i] for i in page_ids if i in pages), None)
+
+    if page is None:
+        return None
+
+    return AnnotationPageRecords(page, [a for a in annotations if a.get('annotationpage_id') == page['id']])
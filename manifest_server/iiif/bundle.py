@@ -0,0 +1,164 @@
+"""
+    A version-neutral set of the Solr records needed to build a manifest: the object
+    itself, its surfaces (with their images), its works, its links, and the IDs of its
+    annotation pages. The v2 and v3 serializers render from the same bundle, so it is only
+    retrieved once per object, whichever version is asked for first, and then kept in the
+    'bundle' cache.
+
+      >>> bundle = get_object_bundle(manifest_id, config)
+      >>> Manifest(bundle.object, context={"request": request, "config": config, **bundle.context()})
+
+"""
+import logging
+from typing import Dict, List, Optional, Type
+
+from manifest_server.helpers.cache import configured_cache, ExpiringLRUCache
+from manifest_server.helpers.circuit_breaker import SolrUnavailable
+from manifest_server.helpers.metadata import WORKS_METADATA_FILTER_FIELDS, get_link_docs
+from manifest_server.helpers.records import Record, SurfaceRecord, WorkRecord
+from manifest_server.helpers.solr import SolrManager, SolrResult, get_document
+from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.iiif.field_lists import object_fl, surface_fl
+
+log = logging.getLogger(__name__)
+
+
+class ObjectBundle:
+    """
+    The records for a single object. The serializers treat these as read-only, since a
+    cached bundle is shared between requests. The surfaces and works, of which there may
+    be thousands, are held as compact records (see `helpers.records`).
+    """
+    __slots__ = ('object', 'surfaces', 'works', 'links', 'has_annotations', 'annotation_pages')
+
+    def __init__(self, obj: SolrResult, surfaces: List[SurfaceRecord], works: List[WorkRecord],
+                 links: List[SolrResult], has_annotations: bool,
+                 annotation_pages: Optional[Dict[str, List[str]]] = None) -> None:
+        """
+        :param annotation_pages: A dictionary of surface ID to the IDs of its annotation pages. If
+            this is not given, the canvases will look up their own annotation pages when `has_annotations` is True.
+        """
+        self.object: SolrResult = obj
+        self.surfaces: List[SurfaceRecord] = surfaces
+        self.works: List[WorkRecord] = works
+        self.links: List[SolrResult] = links
+        self.has_annotations: bool = has_annotations
+        self.annotation_pages: Optional[Dict[str, List[str]]] = annotation_pages
+
+    def context(self) -> Dict:
+        """
+        :return: The child records, with the keys that the manifest serializers look for
+            in their context.
+        """
+        return {
+            "surfaces": self.surfaces,
+            "works": self.works,
+            "links": self.links,
+            "has_annotations": self.has_annotations,
+            "annotation_pages": self.annotation_pages
+        }
+
+
+def get_object_bundle(object_id: str, config: Dict) -> Optional[ObjectBundle]:
+    """
+    :param object_id: The ID of an object
+    :param config: A manifest server configuration dict
+    :return: The bundle of records for the object, or None if there is no such object.
+    """
+    cache: ExpiringLRUCache = configured_cache("bundle", config)
+    bundle: Optional[ObjectBundle] = cache.get(object_id)
+
+    if bundle is not None:
+        return bundle
+
+    try:
+        bundle = fetch_object_bundle(object_id, config)
+    except SolrUnavailable:
+        # While Solr can't be reached, an expired bundle is better than none.
+        bundle = cache.get_stale(object_id)
+
+        if bundle is None:
+            raise
+
+        log.debug("Solr is unavailable; using the expired bundle for %s", object_id)
+        return bundle
+
+    if bundle is not None:
+        cache.set(object_id, bundle)
+
+    return bundle
+
+
+def is_bundle_cached(object_id: str, config: Dict) -> bool:
+    """
+    :param object_id: The ID of an object
+    :param config: A manifest server configuration dict
+    :return: True if the bundle for the object is in the cache, so a manifest can be built without Solr.
+    """
+    return configured_cache("bundle", config).get(object_id) is not None
+
+
+def surface_count(object_id: str, config: Dict) -> int:
+    """
+    Counts an object's surfaces without fetching them, to tell whether its manifest will be large.
+
+    :param object_id: The ID of an object
+    :param config: A manifest server configuration dict
+    :return: The number of surfaces, from the cached bundle if there is one, or else from a
+        query that only asks for the number of hits. 0 if there is no such object.
+    """
+    cache: ExpiringLRUCache = configured_cache("bundle", config)
+    bundle: Optional[ObjectBundle] = cache.get(object_id)
+
+    if bundle is None:
+        try:
+            return SolrConnection.search("*:*", fq=["type:surface", f"object_id:{object_id}"], rows=0).hits
+        except SolrUnavailable:
+            # The manifest can still be built from an expired bundle; see `get_object_bundle`.
+            bundle = cache.get_stale(object_id)
+
+            if bundle is None:
+                raise
+
+    return len(bundle.surfaces)
+
+
+def fetch_object_bundle(object_id: str, config: Dict) -> Optional[ObjectBundle]:
+    """
+    Retrieves the records for an object from Solr, bypassing the bundle cache. The links
+    are taken from their own, longer-lived, cache.
+
+    :param object_id: The ID of an object
+    :param config: A manifest server configuration dict
+    :return: The bundle of records for the object, or None if there is no such object.
+    """
+    record: Optional[SolrResult] = get_document(SolrConnection, object_id, doc_type="object", fl=object_fl())
+
+    if record is None:
+        return None
+
+    surfaces: List[SurfaceRecord] = _children(object_id, "type:surface", SurfaceRecord, sort="sort_i asc",
+                                              fl=surface_fl())
+    works: List[WorkRecord] = _children(object_id, "type:work", WorkRecord, sort="work_id asc",
+                                        fl=WORKS_METADATA_FILTER_FIELDS)
+    links: List[SolrResult] = get_link_docs(object_id, config)
+
+    # We don't need the annotation pages themselves, only which surfaces they belong to.
+    annotation_pages: Dict[str, List[str]] = {}
+
+    for page in _children(object_id, "type:annotationpage", fl=["id", "surface_id"]):
+        annotation_pages.setdefault(page.get('surface_id'), []).append(page['id'])
+
+    log.debug("Retrieved the bundle for %s with %s surfaces and %s works", object_id, len(surfaces), len(works))
+
+    return ObjectBundle(record, surfaces, works, links, bool(annotation_pages), annotation_pages)
+
+
+def _children(object_id: str, type_fq: str, record_type: Optional[Type[Record]] = None, **kwargs) -> List:
+    manager: SolrManager = SolrManager(SolrConnection)
+    manager.search("*:*", fq=[type_fq, f"object_id:{object_id}"], rows=100, **kwargs)
+
+    if record_type is None:
+        return list(manager.results)
+
+    return [record_type(res) for res in manager.results]
@@ -0,0 +1,189 @@
+"""
+    Streams every manifest in the Solr core as a sequence of serialized
+    manifest dictionaries, for bulk re-indexing of downstream systems.
+
+    A single SolrManager cursor walks the `type:object` records. Objects are
+    taken from the cursor in batches, and the child records for each batch
+    (surfaces, works, links and annotation pages) are fetched with one query per
+    record type, instead of one set of queries per manifest. Only one batch is
+    held in memory at a time.
+
+    The manifests are yielded a batch at a time, so that the server can fetch
+    and serialize each batch in a thread, away from the event loop.
+"""
+import logging
+import re
+import datetime
+from itertools import islice
+from typing import Dict, List, Iterator, Optional, Any, Type
+
+from manifest_server.helpers.solr import SolrManager, SolrResult
+from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.helpers.metadata import WORKS_METADATA_FILTER_FIELDS
+from manifest_server.helpers.records import Record, SurfaceRecord, WorkRecord
+from manifest_server.iiif.bundle import ObjectBundle
+from manifest_server.iiif.field_lists import object_fl, surface_fl
+from manifest_server.iiif.v2 import Manifest as V2Manifest
+from manifest_server.iiif.v3 import Manifest as V3Manifest
+
+log = logging.getLogger(__name__)
+
+COLLECTION_ID_PATTERN = re.compile(r"^[\w\-]+$")
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}:\d{2}(\.\d+)?Z)?$")
+
+# Maps the request arguments for filtering on dates to the Solr date fields.
+DATE_FILTER_FIELDS: Dict[str, str] = {
+    "accessioned": "accessioned_dt",
+    "indexed": "indexed"
+}
+
+
+def export_filters(args: Any) -> Optional[List]:
+    """
+    Turns the arguments of an export request into a list of Solr filter queries. Objects can be
+    restricted to a collection (`collection=<id>`), and to a range of accession or indexing dates
+    (`accessioned_from`, `accessioned_to`, `indexed_from`, `indexed_to`). Dates are given as
+    `YYYY-MM-DD` or as a full `YYYY-MM-DDThh:mm:ssZ` timestamp; ranges are inclusive, a date on its
+    own includes the whole of that day, and either end may be left open.
+
+    :param args: The query arguments of a Sanic request object
+    :return: A list of filter queries, or None if any of the arguments were invalid.
+    """
+    fq: List = []
+    collection_id: Optional[str] = args.get('collection')
+
+    if collection_id:
+        if not COLLECTION_ID_PATTERN.match(collection_id):
+            return None
+        fq.append(f'all_collections_id_sm:"{collection_id.lower()}"')
+
+    for arg, field in DATE_FILTER_FIELDS.items():
+        date_range: List = []
+
+        for bound in ("from", "to"):
+            val: Optional[str] = args.get(f"{arg}_{bound}")
+
+            if not val:
+                date_range.append("*")
+                continue
+
+            if not _valid_date(val):
+                return None
+
+            if "T" in val:
+                date_range.append(val)
+            else:
+                # A date on its own covers the whole of that day.
+                date_range.append(f"{val}T00:00:00Z" if bound == "from" else f"{val}T23:59:59.999Z")
+
+        if date_range != ["*", "*"]:
+            fq.append(f"{field}:[{date_range[0]} TO {date_range[1]}]")
+
+    return fq
+
+
+def _valid_date(val: str) -> bool:
+    """
+    :param val: A date or timestamp from an export request
+    :return: True if it has the right form, and is a date (and time) that exists.
+    """
+    if not DATE_PATTERN.match(val):
+        return False
+
+    try:
+        datetime.date.fromisoformat(val[:10])
+
+        if "T" in val:
+            datetime.datetime.strptime(val[11:19], "%H:%M:%S")
+    except ValueError:
+        return False
+
+    return True
+
+
+def export_manifests(request: Any, config: Dict, iiif_version: int,
+                     fq: Optional[List] = None) -> Iterator[List[Dict]]:
+    """
+    Yields the serialized manifests for every object matching the filter queries, one batch
+    of objects at a time.
+
+    :param request: A Sanic request object
+    :param config: A manifest server configuration dict
+    :param iiif_version: The IIIF Presentation API version to serialize to (2 or 3)
+    :param fq: An optional list of extra filter queries to restrict the exported objects
+    :return: A generator of lists of manifest dictionaries
+    """
+    batch_size: int = int(config['export']['batchsize'])
+    rows: int = int(config['solr']['pagesize'])
+    serializer = V3Manifest if iiif_version == 3 else V2Manifest
+
+    manager: SolrManager = SolrManager(SolrConnection)
+    object_fq: List = ["type:object"] + (fq or [])
+    manager.search("*:*", fq=object_fq, fl=object_fl(), rows=rows)
+
+    log.debug("Exporting %s objects as IIIF v%s", manager.hits, iiif_version)
+
+    objects: Iterator[SolrResult] = manager.results
+
+    while True:
+        batch: List[SolrResult] = list(islice(objects, batch_size))
+
+        if not batch:
+            break
+
+        object_ids: List[str] = [obj['id'] for obj in batch]
+        surfaces: Dict[str, List] = _children_by_object(object_ids, "type:surface", SurfaceRecord,
+                                                        sort="object_id asc, sort_i asc", fl=surface_fl())
+        works: Dict[str, List] = _children_by_object(object_ids, "type:work", WorkRecord,
+                                                     sort="object_id asc, work_id asc", fl=WORKS_METADATA_FILTER_FIELDS)
+        links: Dict[str, List] = _children_by_object(object_ids, "type:link")
+        pages: Dict[str, List] = _children_by_object(object_ids, "type:annotationpage",
+                                                     fl=["id", "surface_id", "object_id"])
+        manifests: List[Dict] = []
+
+        for obj in batch:
+            obj_id: str = obj['id']
+            annotation_pages: Dict[str, List[str]] = {}
+
+            for page in pages.get(obj_id, []):
+                annotation_pages.setdefault(page.get('surface_id'), []).append(page['id'])
+
+            bundle: ObjectBundle = ObjectBundle(obj, surfaces.get(obj_id, []), works.get(obj_id, []),
+                                                links.get(obj_id, []), bool(annotation_pages), annotation_pages)
+
+            manifests.append(serializer(obj, context={"request": request,
+                                                      "config": config,
+                                                      **bundle.context()}).data)
+
+        yield manifests
+
+
+def _object_id_filter(object_ids: List[str]) -> str:
+    ids: str = " OR ".join(f'"{i}"' for i in object_ids)
+    return f"object_id:({ids})"
+
+
+def _children_by_object(object_ids: List[str], type_fq: str, record_type: Optional[Type[Record]] = None,
+                        **kwargs) -> Dict[str, List]:
+    """
+    Retrieves all the records of a given type that belong to any of the objects in a batch, and
+    groups them by their object ID. Records keep the order given by the `sort` keyword argument,
+    so the records for each object will be in the same order as if they were queried individually.
+
+    :param object_ids: A list of object IDs
+    :param type_fq: A filter query on the record type, e.g. 'type:surface'
+    :param record_type: A compact record type to hold the records in, instead of the Solr dicts
+    :param kwargs: Extra keyword arguments to pass to SolrManager.search (fl, sort)
+    :return: A dictionary of object ID to a list of Solr records
+    """
+    manager: SolrManager = SolrManager(SolrConnection)
+    fq: List = [type_fq, _object_id_filter(object_ids)]
+    manager.search("*:*", fq=fq, rows=100, **kwargs)
+
+    grouped: Dict[str, List] = {}
+
+    for res in manager.results:
+        grouped.setdefault(res['object_id'], []).append(record_type(res) if record_type else res)
+
+    return grouped
+
@@ -0,0 +1,95 @@
+"""
+    Solr field lists (`fl`) for the records that are fetched in order to be serialized. Rather than
+    asking for every stored field, including long text and copy fields that are never emitted, each
+    list is derived from the serializers that render the records (see `solr_fields`), so that it
+    keeps up with them as they change. The lists are only worked out once.
+
+    The serializers are imported when a list is first needed, rather than at the top of the module,
+    since the modules that define them also use these lists.
+
+      >>> manager.search("*:*", fq=["type:surface", f"object_id:{obj_id}"], fl=surface_fl())
+
+"""
+from functools import lru_cache
+from typing import List
+
+from manifest_server.helpers.serializers import solr_fields
+
+
+@lru_cache(maxsize=None)
+def object_fl() -> List[str]:
+    """
+    :return: The fields needed from an object record to render it as a v2 or v3 manifest.
+    """
+    from manifest_server.iiif.v2.manifests.manifest import Manifest as V2Manifest
+    from manifest_server.iiif.v2.manifests.sequence import Sequence
+    from manifest_server.iiif.v3.manifests.manifest import Manifest as V3Manifest
+
+    return solr_fields(V2Manifest, Sequence, V3Manifest)
+
+
+@lru_cache(maxsize=None)
+def surface_fl() -> List[str]:
+    """
+    :return: The fields needed from a surface record, and from its image records through the
+        child transformer, to render it as a v2 or v3 canvas.
+    """
+    from manifest_server.iiif.v2.manifests.canvas import Canvas as V2Canvas
+    from manifest_server.iiif.v2.manifests.annotation import ImageAnnotation as V2ImageAnnotation
+    from manifest_server.iiif.v2.manifests.image import Image as V2Image
+    from manifest_server.iiif.v3.manifests.canvas import Canvas as V3Canvas
+    from manifest_server.iiif.v3.manifests.annotation_page import ImageAnnotationPage
+    from manifest_server.iiif.v3.manifests.annotation import ImageAnnotation as V3ImageAnnotation
+    from manifest_server.iiif.v3.manifests.image import Image as V3Image
+
+    surface_fields: List[str] = solr_fields(V2Canvas, V3Canvas, ImageAnnotationPage)
+    image_fields: List[str] = solr_fields(V2ImageAnnotation, V2Image, V3ImageAnnotation, V3Image)
+
+    # The child transformer is given its own field list; otherwise it would use the surface fields.
+    child: str = f"[child parentFilter=type:surface childFilter=type:image fl={','.join(image_fields)}]"
+
+    return surface_fields + [child]
+
+
+@lru_cache(maxsize=None)
+def collection_fl() -> List[str]:
+    """
+    :return: The fields needed from a collection record to render it as a v2 or v3 collection.
+    """
+    from manifest_server.iiif.v2.collections.collection import Collection as V2Collection
+    from manifest_server.iiif.v3.collections.collection import Collection as V3Collection
+
+    return solr_fields(V2Collection, V3Collection)
+
+
+# The fields of annotation bodies, which the serializers read from the child documents of an annotation.
+ANNOTATION_BODY_FIELDS: List[str] = ["direction_s", "language_s", "text_s"]
+
+
+@lru_cache(maxsize=None)
+def annotation_page_fl() -> List[str]:
+    """
+    :return: The fields needed from the records that are retrieved together for an annotation
+        page (see `annotation_pages`): the page itself, its annotations and their bodies, or the
+        images of a surface, and the summary of its object.
+    """
+    from manifest_server.helpers.summaries import SUMMARY_FIELDS
+    from manifest_server.iiif.v2.manifests.annotation_list import AnnotationList
+    from manifest_server.iiif.v2.manifests.annotation import TextAnnotation as V2TextAnnotation
+    from manifest_server.iiif.v3.manifests.annotation_page import ImageAnnotationPage, TextAnnotationPage
+    from manifest_server.iiif.v3.manifests.annotation import (
+        ImageAnnotation as V3ImageAnnotation,
+        TextAnnotation as V3TextAnnotation
+    )
+    from manifest_server.iiif.v3.manifests.image import Image as V3Image
+
+    # The type and page of each record are needed to sort the results.
+    fields: List[str] = sorted(set(solr_fields(AnnotationList, V2TextAnnotation, ImageAnnotationPage, TextAnnotationPage,
+                                               V3TextAnnotation) + SUMMARY_FIELDS + ["type", "annotationpage_id"]))
+    child_fields: List[str] = sorted(set(solr_fields(V3ImageAnnotation, V3Image) + ANNOTATION_BODY_FIELDS))
+
+    # Every kind of top-level record that the query may return must be in the parent filter.
+    child: str = ('[child parentFilter="type:surface OR type:annotationpage OR type:annotation OR type:object"'
+                  f' childFilter="type:image OR type:annotation_body" fl={",".join(child_fields)}]')
+
+    return fields + [child]
@@ -0,0 +1,144 @@
+"""
+    Renders manifests straight to encoded JSON, optionally in a pool of worker processes.
+
+    Serializing a manifest with thousands of canvases holds the GIL, and so the worker's event loop,
+    for hundreds of milliseconds, and every other request the worker is handling waits behind it.
+    When the pool is enabled, manifests with at least `min_surfaces` canvases are serialized and
+    encoded in a separate process, and only the encoded bytes come back. Smaller manifests, and
+    every other kind of resource, are still rendered inline.
+
+    The records are retrieved in the server's process as usual (and kept in its caches); only the
+    bundle of records is sent to the pool. The Sanic request can't be sent to another process, so
+    the parts of it that are needed to build identifiers are copied into a `DetachedRequest`.
+
+      >>> bundle = find_manifest_bundle(request, manifest_id, config)
+      >>> body: bytes = await RenderPool.render_manifest(request, bundle, iiif_version, config, indent)
+
+"""
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+import ujson
+
+from manifest_server.helpers.negative_cache import negative_cached
+from manifest_server.iiif.bundle import ObjectBundle, get_object_bundle
+from manifest_server.iiif.v2 import Manifest as V2Manifest
+from manifest_server.iiif.v3 import Manifest as V3Manifest
+
+log = logging.getLogger(__name__)
+
+# The request headers that are read when building identifiers.
+FORWARDED_HEADERS = ('X-Forwarded-Proto', 'X-Forwarded-Host')
+
+
+class DetachedRequest:
+    """
+    A copy of the parts of a request that the serializers use, which can be sent to another process.
+    """
+    __slots__ = ('headers', 'scheme', 'host', 'args')
+
+    def __init__(self, headers: Dict, scheme: str, host: str, args: Dict) -> None:
+        self.headers: Dict = headers
+        self.scheme: str = scheme
+        self.host: str = host
+        self.args: Dict = args
+
+    @classmethod
+    def from_request(cls, request: Any) -> "DetachedRequest":
+        headers: Dict = {h: request.headers[h] for h in FORWARDED_HEADERS if h in request.headers}
+        return cls(headers, request.scheme, request.host, dict(request.args))
+
+
+@negative_cached("manifest", id_formats=["{}"])
+def find_manifest_bundle(request: Any, manifest_id: str, config: Dict) -> Optional[ObjectBundle]:  # pylint: disable-msg=unused-argument
+    """
+    Looks up the records for a manifest. This shares the cache of missing manifests with
+    `create_v2_manifest` and `create_v3_manifest`.
+
+    :param request: A Sanic request object
+    :param manifest_id: The ID of an object
+    :param config: A manifest server configuration dict
+    :return: The bundle of records for the object, or None if there is no such object.
+    """
+    return get_object_bundle(manifest_id, config)
+
+
+def render_manifest(request: Any, bundle: ObjectBundle, iiif_version: int, config: Dict, indent: int) -> bytes:
+    """
+    Serializes a manifest and encodes it as JSON. This is what runs in the worker processes.
+
+    :param request: A Sanic request object, or a DetachedRequest
+    :param bundle: The bundle of records for the object
+    :param iiif_version: The IIIF Presentation API version to serialize to (2 or 3)
+    :param config: A manifest server configuration dict
+    :param indent: The indent level for the JSON
+    :return: The encoded manifest
+    """
+    serializer = V3Manifest if iiif_version == 3 else V2Manifest
+    manifest: Dict = serializer(bundle.object, context={"request": request,
+                                                       "config": config,
+                                                       **bundle.context()}).data
+
+    return ujson.dumps(manifest, escape_forward_slashes=False, indent=indent).encode("utf-8")
+
+
+class ManifestRenderPool:
+    """
+    Holds the pool of processes for rendering large manifests. The module-level `RenderPool`
+    is started, if it is enabled, when each server worker starts.
+    """
+    def __init__(self) -> None:
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._min_surfaces: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._executor is not None
+
+    def start(self, config: Dict) -> None:
+        """
+        :param config: A manifest server configuration dict
+        :return: None
+        """
+        cfg: Dict = config.get('render_pool', {})
+
+        if not cfg.get('enabled'):
+            return None
+
+        self._min_surfaces = int(cfg['min_surfaces'])
+        self._executor = ProcessPoolExecutor(max_workers=int(cfg['processes']))
+
+        log.debug("Rendering manifests with %s or more canvases in %s processes",
+                  self._min_surfaces, cfg['processes'])
+
+        return None
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def render_manifest(self, request: Any, bundle: ObjectBundle, iiif_version: int,
+                              config: Dict, indent: int) -> bytes:
+        """
+        Renders a manifest in the pool if it is large enough, and otherwise inline.
+
+        :param request: A Sanic request object
+        :param bundle: The bundle of records for the object
+        :param iiif_version: The IIIF Presentation API version to serialize to (2 or 3)
+        :param config: A manifest server configuration dict
+        :param indent: The indent level for the JSON
+        :return: The encoded manifest
+        """
+        if self._executor is None or len(bundle.surfaces) < self._min_surfaces:
+            return render_manifest(request, bundle, iiif_version, config, indent)
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_event_loop()
+
+        return await loop.run_in_executor(self._executor, render_manifest, DetachedRequest.from_request(request),
+                                          bundle, iiif_version, config, indent)
+
+
+RenderPool: ManifestRenderPool = ManifestRenderPool()
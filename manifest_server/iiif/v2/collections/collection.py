@@ -6,6 +6,8 @@ from manifest_server.helpers.fields import StaticField
 from manifest_server.helpers.solr import SolrManager, SolrResult
 from manifest_server.helpers.solr_connection import SolrConnection
 from manifest_server.helpers.identifiers import get_identifier, IIIF_V2_CONTEXT
+from manifest_server.helpers.pagination import CollectionPage, valid_page_token
+from manifest_server.iiif.field_lists import collection_fl
 
 
 def create_v2_collection(request: Any, collection_id: str, config: Dict) -> Optional[Dict]:
@@ -20,23 +22,37 @@ def create_v2_collection(request: Any, collection_id: str, config: Dict) -> Opti
 
     Unlike in IIIF v3, a v2 Collection separates out the items into 'manifests' and 'collections'.
 
+    Collections with more manifests than the configured page size are paged. The collection itself then
+    only gives the total and a link to the first page; each page is requested with a `page` argument
+    and links to the next one.
+
     :param request: A sanic request object
     :param collection_id: A collection id to retrieve.
     :param config: The configuration dict
     :return: A Dict representing a IIIF-serialized Collection.
     """
+    page_token: Optional[str] = request.args.get('page')
+
+    if not valid_page_token(page_token):
+        return None
 
     fq: List = ["type:collection", f'collection_id:"{collection_id.lower()}"']
     rows: int = 1
 
-    record: pysolr.Results = SolrConnection.search("*:*", fq=fq, rows=rows)
+    record: pysolr.Results = SolrConnection.search("*:*", fq=fq, fl=collection_fl(), rows=rows)
 
     if record.hits == 0:
         return None
 
     object_record = record.docs[0]
+    page: CollectionPage = CollectionPage(object_record.get('collection_id'), page_token, config)
+
+    if not page.exists:
+        return None
+
     collection: Collection = Collection(object_record, context={"request": request,
-                                                                "config": config})
+                                                                "config": config,
+                                                                "page": page})
 
     return collection.data
 
@@ -139,18 +155,67 @@ class Collection(ContextDictSerializer):
     description = serpy.StrField(
         attr="description_s"
     )
+    within = serpy.MethodField()
+    total = serpy.MethodField()
+    first = serpy.MethodField()
+    next = serpy.MethodField()
     manifests = serpy.MethodField()
     collections = serpy.MethodField()
 
     def get_cid(self, obj: SolrResult) -> str:
         req = self.context.get('request')
-        cfg = self.context.get('config')
-        tmpl: str = cfg['templates']['collection_id_tmpl']
-        cid: str = obj.get('collection_id')
+        page: CollectionPage = self.context.get('page')
 
-        return get_identifier(req, cid, tmpl)
+        if page.page_token:
+            return page.page_uri(req, page.page_token)
+
+        return page.collection_uri(req)
+
+    def get_within(self, obj: SolrResult) -> Optional[str]:  # pylint: disable-msg=unused-argument
+        """
+        A page of a collection points back to the collection it is part of.
+        """
+        page: CollectionPage = self.context.get('page')
+
+        if not page.page_token:
+            return None
+
+        return page.collection_uri(self.context.get('request'))
+
+    def get_total(self, obj: SolrResult) -> Optional[int]:  # pylint: disable-msg=unused-argument
+        page: CollectionPage = self.context.get('page')
+
+        if page.page_token or not page.is_paged:
+            return None
+
+        return page.hits
+
+    def get_first(self, obj: SolrResult) -> Optional[str]:  # pylint: disable-msg=unused-argument
+        page: CollectionPage = self.context.get('page')
+
+        if page.page_token or not page.is_paged:
+            return None
+
+        return page.first_page_uri(self.context.get('request'))
+
+    def get_next(self, obj: SolrResult) -> Optional[str]:  # pylint: disable-msg=unused-argument
+        page: CollectionPage = self.context.get('page')
+
+        if not page.page_token:
+            return None
+
+        next_token: Optional[str] = page.next_token
+
+        if not next_token:
+            return None
+
+        return page.page_uri(self.context.get('request'), next_token)
 
     def get_collections(self, obj: SolrResult) -> Optional[List]:
+        # Pages only ever contain manifests.
+        if self.context.get('page').page_token:
+            return None
+
         coll_id: str = obj.get('collection_id')
         req = self.context.get('request')
         cfg = self.context.get('config')
@@ -169,29 +234,17 @@ class Collection(ContextDictSerializer):
         return CollectionCollection(manager.results, many=True, context={'request': req,
                                                                          'config': cfg}).data
 
-    def get_manifests(self, obj: SolrResult) -> Optional[List]:
-        coll_id: str = obj.get('collection_id')
-
+    def get_manifests(self, obj: SolrResult) -> Optional[List]:  # pylint: disable-msg=unused-argument
         req = self.context.get('request')
         cfg = self.context.get('config')
+        page: CollectionPage = self.context.get('page')
 
-        manager: SolrManager = SolrManager(SolrConnection)
-
-        # The 'All' collection is for every object in the collection, so we
-        # don't need to restrict it by collection.
-        if coll_id == 'all':
-            fq = ["type:object"]
-        else:
-            fq = ["type:object", f"all_collections_id_sm:{coll_id}"]
-
-        sort: str = "institution_label_s asc, shelfmark_sort_ans asc"
-        rows: int = 100
-        fl = ["id", "title_s", "full_shelfmark_s", "thumbnail_id"]
-
-        manager.search("*:*", fq=fq, sort=sort, fl=fl, rows=rows)
+        if page.hits == 0:
+            return None
 
-        if manager.hits == 0:
+        # A paged collection only links to its first page.
+        if page.is_paged and not page.page_token:
             return None
 
-        return CollectionManifest(manager.results, many=True, context={'request': req,
-                                                                       'config': cfg}).data
+        return CollectionManifest(page.docs, many=True, context={'request': req,
+                                                                 'config': cfg}).data
@@ -9,7 +9,8 @@ from manifest_server.helpers.fields import StaticField
 from manifest_server.helpers.identifiers import get_identifier, IIIF_V2_CONTEXT
 from manifest_server.helpers.serializers import ContextDictSerializer
 from manifest_server.helpers.solr_connection import SolrConnection
-from manifest_server.helpers.solr import SolrResult
+from manifest_server.helpers.solr import SolrResult, get_document
+from manifest_server.helpers.negative_cache import negative_cached
 from manifest_server.iiif.v2.manifests.image import Image
 
 IMAGE_ID_SUB: Pattern = re.compile(r"_image$")
@@ -26,30 +27,29 @@ LANGUAGE_TO_HEADER_MAP: Dict[str, str] = {
 }
 
 
+@negative_cached("annotation", id_formats=["{}_image", "{}"])
 def create_v2_annotation(request, annotation_id: str, config: Dict) -> Optional[Dict]:
     # check for image annotations first
-    fq: List[str] = ["type:image", f"id:{annotation_id}_image"]
     fl: List[str] = ["id", "surface_id", "width_i", "height_i", "object_id"]
-    image_record = SolrConnection.search("*:*", fq=fq, fl=fl, rows=1)
+    image_record: Optional[SolrResult] = get_document(SolrConnection, f"{annotation_id}_image", doc_type="image", fl=fl)
 
-    if image_record.hits != 0:
-        image_annotation = ImageAnnotation(image_record.docs[0], context={"request": request,
-                                                                          "config": config,
-                                                                          "direct_request": True})
+    if image_record is not None:
+        image_annotation = ImageAnnotation(image_record, context={"request": request,
+                                                                  "config": config,
+                                                                  "direct_request": True})
         return image_annotation.data
 
     # check if there's a non-image annotation matching the id
     # safest to put these in separate solr calls because of the child documents
-    fq = ["type:annotation", f"id:{annotation_id}"]
     fl = ["*", "[child parentFilter=type:annotation childFilter=type:annotation_body]"]
-    anno_record = SolrConnection.search("*:*", fq=fq, fl=fl, rows=1)
+    anno_record: Optional[SolrResult] = get_document(SolrConnection, annotation_id, doc_type="annotation", fl=fl)
 
-    if anno_record.hits == 0:
+    if anno_record is None:
         return None
 
-    annotation = TextAnnotation(anno_record.docs[0], context={"request": request,
-                                                              "config": config,
-                                                              "direct_request": True})
+    annotation = TextAnnotation(anno_record, context={"request": request,
+                                                      "config": config,
+                                                      "direct_request": True})
     return annotation.data
 
 
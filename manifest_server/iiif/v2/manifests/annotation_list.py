@@ -7,11 +7,14 @@ from manifest_server.helpers.identifiers import get_identifier, IIIF_V2_CONTEXT
 from manifest_server.helpers.serializers import ContextDictSerializer
 from manifest_server.helpers.solr import SolrManager, SolrResult
 from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.helpers.negative_cache import negative_cached
+from manifest_server.iiif.annotation_pages import AnnotationPageRecords, fetch_annotation_page
 from manifest_server.iiif.v2.manifests.annotation import TextAnnotation
 
 SURFACE_ID_SUB: Pattern = re.compile(r"_surface")
 
 
+@negative_cached("annotationlist", id_formats=["{}"])
 def create_v2_annotation_list(request: Any, annotation_page_id: str, config: Dict) -> Optional[Dict]:
     """
     :param request: A sanic request object
@@ -19,15 +22,14 @@ def create_v2_annotation_list(request: Any, annotation_page_id: str, config: Dic
     :param config: The configuration dict
     :return: A Dict representing a IIIF-serialized Annotation List.
     """
-    fq: List = [f'id:"{annotation_page_id}"']
-    fl = ["id,label_s"]
-    record = SolrConnection.search(q="*:*", fq=fq, fl=fl, rows=1)
+    records: Optional[AnnotationPageRecords] = fetch_annotation_page([annotation_page_id], config)
 
-    if record.hits == 0:
+    if records is None:
         return None
 
-    annotation_list: AnnotationList = AnnotationList(record.docs[0], context={"request": request,
-                                                                              "config": config})
+    annotation_list: AnnotationList = AnnotationList(records.page, context={"request": request,
+                                                                            "config": config,
+                                                                            "annotations": records.annotations})
     return annotation_list.data
 
 
@@ -65,13 +67,18 @@ class AnnotationList(ContextDictSerializer):
         req = self.context.get('request')
         cfg = self.context.get('config')
 
-        manager: SolrManager = SolrManager(SolrConnection)
-        fq: List = ["type:annotation", f'annotationpage_id:"{obj["id"]}"']
-        fl: List = ["*", "[child parentFilter=type:annotation childFilter=type:annotation_body]"]
-        manager.search("*:*", fq=fq, fl=fl, rows=100)
+        annotations: Optional[List[SolrResult]] = self.context.get('annotations')
 
-        if manager.hits == 0:
+        # The annotations will normally have been retrieved with the annotation list.
+        if annotations is None:
+            manager: SolrManager = SolrManager(SolrConnection)
+            fq: List = ["type:annotation", f'annotationpage_id:"{obj["id"]}"']
+            fl: List = ["*", "[child parentFilter=type:annotation childFilter=type:annotation_body]"]
+            manager.search("*:*", fq=fq, fl=fl, rows=100)
+            annotations = list(manager.results)
+
+        if not annotations:
             return []
 
-        return TextAnnotation(list(manager.results), context={'request': req,
-                                                              'config': cfg}, many=True).data
+        return TextAnnotation(annotations, context={'request': req,
+                                                    'config': cfg}, many=True).data
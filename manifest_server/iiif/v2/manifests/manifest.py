@@ -2,15 +2,16 @@ import logging
 import re
 from typing import List, Dict, Optional
 
-import pysolr
 import serpy
 
 from manifest_server.helpers.fields import StaticField
 from manifest_server.helpers.identifiers import get_identifier, IIIF_V2_CONTEXT
-from manifest_server.helpers.metadata import v2_metadata_block, get_links
+from manifest_server.helpers.metadata import v2_metadata_block, get_links, get_link_docs, FIELD_CONFIG
 from manifest_server.helpers.serializers import ContextDictSerializer
 from manifest_server.helpers.solr_connection import SolrConnection
 from manifest_server.helpers.solr import SolrResult
+from manifest_server.helpers.negative_cache import negative_cached
+from manifest_server.iiif.bundle import ObjectBundle, get_object_bundle
 from manifest_server.iiif.v2.manifests.sequence import Sequence
 from manifest_server.iiif.v2.manifests.structure import create_v2_structures
 
@@ -20,16 +21,17 @@ IMAGE_ID_SUB = re.compile(r"_image")
 SURFACE_ID_SUB = re.compile(r"_surface")
 
 
+@negative_cached("manifest", id_formats=["{}"])
 def create_v2_manifest(request, manifest_id: str, config: Dict) -> Optional[Dict]:
-    record: pysolr.Results = SolrConnection.search("*:*", fq=["type:object", f"id:{manifest_id}"], rows=1)
+    bundle: Optional[ObjectBundle] = get_object_bundle(manifest_id, config)
 
-    if record.hits == 0:
+    if bundle is None:
         return None
 
-    object_record = record.docs[0]
-    manifest: Manifest = Manifest(object_record, context={"request": request,
+    manifest: Manifest = Manifest(bundle.object, context={"request": request,
                                                           "config": config,
-                                                          "solr_conn": SolrConnection})
+                                                          "solr_conn": SolrConnection,
+                                                          **bundle.context()})
 
     return manifest.data
 
@@ -73,6 +75,9 @@ class Manifest(ContextDictSerializer):
     sequences = serpy.MethodField()
     structures = serpy.MethodField()
 
+    # Read by the metadata block
+    extra_solr_fields = list(FIELD_CONFIG.keys())
+
     def get_mid(self, obj: SolrResult) -> str:
         req = self.context.get('request')
         conf = self.context.get('config')
@@ -96,7 +101,12 @@ class Manifest(ContextDictSerializer):
             "value": val
         }]
 
-        metadata += get_links(obj, 2)
+        link_docs: Optional[List[SolrResult]] = self.context.get('links')
+
+        if link_docs is None:
+            link_docs = get_link_docs(obj.get('id'), cfg)
+
+        metadata += get_links(obj, 2, link_docs)
         metadata += v2_metadata_block(obj)
 
         return metadata
@@ -191,13 +201,23 @@ class Manifest(ContextDictSerializer):
         return thumb_service
 
     def get_sequences(self, obj: SolrResult) -> List[Optional[Sequence]]:
-        return [Sequence(obj, context={'request': self.context.get('request'),
-                                       'config': self.context.get('config')}).data]
+        # Surfaces and the annotation check may have been retrieved in advance
+        # (e.g., for exports); pass them along if they were.
+        ctx: Dict = {'request': self.context.get('request'),
+                     'config': self.context.get('config')}
+
+        if 'surfaces' in self.context:
+            ctx['surfaces'] = self.context['surfaces']
+            ctx['has_annotations'] = self.context.get('has_annotations')
+            ctx['annotation_pages'] = self.context.get('annotation_pages')
+
+        return [Sequence(obj, context=ctx).data]
 
     def get_structures(self, obj: SolrResult) -> Optional[List[Dict]]:
         return create_v2_structures(self.context.get('request'),
                                     obj.get('id'),
-                                    self.context.get('config'))
+                                    self.context.get('config'),
+                                    works=self.context.get('works'))
 
     def get_nav_date(self, obj: SolrResult) -> Optional[str]:
         year: Optional[int] = obj.get('start_date_i') or obj.get('end_date_i')
@@ -1,7 +1,6 @@
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
-import pysolr
 import serpy
 
 from manifest_server.helpers.fields import StaticField
@@ -9,21 +8,27 @@ from manifest_server.helpers.identifiers import get_identifier, IIIF_V2_CONTEXT
 from manifest_server.helpers.serializers import ContextDictSerializer
 from manifest_server.helpers.solr import SolrManager, SolrResult
 from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.helpers.negative_cache import negative_cached
 from manifest_server.iiif.v2 import Canvas
+from manifest_server.iiif.bundle import ObjectBundle, get_object_bundle
+from manifest_server.iiif.field_lists import surface_fl
 
 log = logging.getLogger(__name__)
 
 
+@negative_cached("manifest", id_formats=["{}"])
 def create_v2_sequence(request, sequence_id: str, config: Dict) -> Optional[Dict]:
-    record: pysolr.Results = SolrConnection.search("*:*", fq=["type:object", f"id:{sequence_id}"], rows=1)
+    bundle: Optional[ObjectBundle] = get_object_bundle(sequence_id, config)
 
-    if record.hits == 0:
+    if bundle is None:
         return None
 
-    object_record = record.docs[0]
-    sequence: Sequence = Sequence(object_record, context={"request": request,
+    sequence: Sequence = Sequence(bundle.object, context={"request": request,
                                                           "config": config,
-                                                          "direct_request": True})
+                                                          "direct_request": True,
+                                                          "surfaces": bundle.surfaces,
+                                                          "has_annotations": bundle.has_annotations,
+                                                          "annotation_pages": bundle.annotation_pages})
 
     return sequence.data
 
@@ -61,6 +66,19 @@ class Sequence(ContextDictSerializer):
         cfg = self.context.get('config')
         obj_id = obj.get('id')
 
+        # The surfaces may have been retrieved in advance, in which case the
+        # check for annotations will have been done at the same time.
+        if 'surfaces' in self.context:
+            surfaces: List = self.context['surfaces']
+
+            if not surfaces:
+                return None
+
+            return Canvas(surfaces, context={'request': req,
+                                             'config': cfg,
+                                             'has_annotations': self.context.get('has_annotations'),
+                                             'annotation_pages': self.context.get('annotation_pages')}, many=True).data
+
         # Check if the canvases have annotations. We don't actually
         # need to retrieve them, just get the number of hits.
         has_annotations_res = SolrConnection.search(
@@ -73,7 +91,7 @@ class Sequence(ContextDictSerializer):
         manager: SolrManager = SolrManager(SolrConnection)
         fq = ["type:surface", f"object_id:{obj_id}"]
         sort = "sort_i asc"
-        fl = ["*,[child parentFilter=type:surface childFilter=type:image]"]
+        fl = surface_fl()
         rows: int = 100
         manager.search("*:*", fq=fq, fl=fl, sort=sort, rows=rows)
 
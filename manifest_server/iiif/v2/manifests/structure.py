@@ -14,10 +14,12 @@ from manifest_server.helpers.metadata import (
     WORKS_METADATA_FILTER_FIELDS,
     WORKS_METADATA_FIELD_CONFIG
 )
+from manifest_server.helpers.negative_cache import negative_cached
 
 SURFACE_ID_SUB: Pattern = re.compile(r"_surface$")
 
 
+@negative_cached("range")
 def create_v2_range(request, range_id: str, config: Dict) -> Optional[Dict]:
     """
     Handles a lookup for a specific range. Due to the nature of how the
@@ -55,7 +57,8 @@ def create_v2_range(request, range_id: str, config: Dict) -> Optional[Dict]:
     return s
 
 
-def create_v2_structures(request, obj_id: str, config: Dict, direct_request: bool = False) -> Optional[List[Dict]]:
+def create_v2_structures(request, obj_id: str, config: Dict, direct_request: bool = False,
+                         works: Optional[List[SolrResult]] = None) -> Optional[List[Dict]]:
     """
     Creates the full structure hierarchy for a given object ID.
 
@@ -63,23 +66,27 @@ def create_v2_structures(request, obj_id: str, config: Dict, direct_request: boo
     :param obj_id: An object ID to use to lookup the works
     :param config: A configuration dictionary
     :param direct_request: True if the range is being requested directly; otherwise false if embedded in a manifest.
+    :param works: The work records for the object, if they have already been retrieved, sorted by work ID.
     :return: A Dictionary suitable for embedding in a manifest, or for being filtered to provide a certain response
         in the `create_v2_range` method above.
     """
-    manager: SolrManager = SolrManager(SolrConnection)
-    fq: List = ["type:work", f"object_id:{obj_id}"]
-    # Restrict the returned fields to only those that are needed.
-    fl: List = WORKS_METADATA_FILTER_FIELDS
-    # make a list of the keys in works_metadata_field_config to extend the field list
-    rows: int = 100
-    sort: str = "work_id asc"
-    manager.search("*:*", fq=fq, fl=fl, sort=sort, rows=rows)
-
-    if manager.hits == 0:
+    if works is None:
+        manager: SolrManager = SolrManager(SolrConnection)
+        fq: List = ["type:work", f"object_id:{obj_id}"]
+        # Restrict the returned fields to only those that are needed.
+        fl: List = WORKS_METADATA_FILTER_FIELDS
+        # make a list of the keys in works_metadata_field_config to extend the field list
+        rows: int = 100
+        sort: str = "work_id asc"
+        manager.search("*:*", fq=fq, fl=fl, sort=sort, rows=rows)
+
+        # we will need to iterate through this list a few times, so we evaluate it to a list
+        works = list(manager.results)
+
+    if not works:
         return None
 
-    # we will need to iterate through this list a few times, so we evaluate it to a list
-    results: List = list(manager.results)
+    results: List = works
 
     hierarchy: Dict = compute_v2_hierarchy(results, obj_id, request, config)
 
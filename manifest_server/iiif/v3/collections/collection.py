@@ -5,9 +5,11 @@ import serpy
 
 from manifest_server.helpers.fields import StaticField
 from manifest_server.helpers.identifiers import get_identifier, IIIF_V3_CONTEXT
+from manifest_server.helpers.pagination import CollectionPage, valid_page_token
 from manifest_server.helpers.serializers import ContextDictSerializer
 from manifest_server.helpers.solr import SolrManager, SolrResult
 from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.iiif.field_lists import collection_fl
 
 
 def create_v3_collection(request: Any, collection_id: str, config: Dict) -> Optional[Dict]:
@@ -20,20 +22,35 @@ def create_v3_collection(request: Any, collection_id: str, config: Dict) -> Opti
     A special case is the 'top' collection, which will retrieve a list of all other collections
     (except 'top' and 'all'). The 'all' collection is a list of every manifest object we have in the Solr core.
 
+    Collections with more manifests than the configured page size are paged. Each page is a Collection
+    that is `partOf` the whole collection, and whose last item is the Collection for the next page.
+    The collection itself only has the first page as its item.
+
     :param request: A sanic request object
     :param collection_id: A collection id to retrieve.
     :param config: The configuration dictionary
     :return: A Dict representing a IIIF-serialized Collection.
     """
+    page_token: Optional[str] = request.args.get('page')
+
+    if not valid_page_token(page_token):
+        return None
+
     fq: List = ["type:collection", f'collection_id:"{collection_id.lower()}"']
-    record: pysolr.Results = SolrConnection.search("*:*", fq=fq, rows=1)
+    record: pysolr.Results = SolrConnection.search("*:*", fq=fq, fl=collection_fl(), rows=1)
 
     if record.hits == 0:
         return None
 
     object_record = record.docs[0]
+    page: CollectionPage = CollectionPage(object_record.get('collection_id'), page_token, config)
+
+    if not page.exists:
+        return None
+
     collection: Collection = Collection(object_record, context={"request": request,
-                                                                "config": config})
+                                                                "config": config,
+                                                                "page": page})
 
     return collection.data
 
@@ -64,6 +81,19 @@ class CollectionCollection(ContextDictSerializer):
         return {'en': [f"{name}"]}
 
 
+# The fields of an object summary that are listed for each manifest in a v3 collection. The summaries
+# also carry a thumbnail, for v2 collections, but v3 collections have never listed one.
+MANIFEST_ENTRY_FIELDS: List[str] = ["id", "full_shelfmark_s"]
+
+
+def manifest_entries(page: CollectionPage) -> List[Dict]:
+    """
+    :param page: A page of a collection's manifests
+    :return: The fields of the object summaries on the page that the manifest entries are made from.
+    """
+    return [{k: doc[k] for k in MANIFEST_ENTRY_FIELDS if k in doc} for doc in page.docs]
+
+
 class CollectionManifest(ContextDictSerializer):
     """
         A Manifest entry in the items list.
@@ -134,15 +164,33 @@ class Collection(ContextDictSerializer):
 
     label = serpy.MethodField()
     summary = serpy.MethodField()
+    part_of = serpy.MethodField(
+        label="partOf"
+    )
     items = serpy.MethodField()
 
     def get_cid(self, obj: SolrResult) -> str:
         req = self.context.get('request')
-        cfg = self.context.get('config')
-        tmpl: str = cfg['templates']['collection_id_tmpl']
-        cid: str = obj.get('collection_id')
+        page: CollectionPage = self.context.get('page')
+
+        if page.page_token:
+            return page.page_uri(req, page.page_token)
+
+        return page.collection_uri(req)
+
+    def get_part_of(self, obj: SolrResult) -> Optional[List]:  # pylint: disable-msg=unused-argument
+        """
+        A page of a collection points back to the collection it is part of.
+        """
+        page: CollectionPage = self.context.get('page')
 
-        return get_identifier(req, cid, tmpl)
+        if not page.page_token:
+            return None
+
+        return [{
+            "id": page.collection_uri(self.context.get('request')),
+            "type": "Collection"
+        }]
 
     def get_label(self, obj: SolrResult) -> Dict:
         return {"en": [f"{obj.get('name_s')}"]}
@@ -161,11 +209,24 @@ class Collection(ContextDictSerializer):
         which case the parent_collection_id field will match the requested path) OR a set of Manifests (in
         which case the first query will return 0 results, and then we re-query for the list of objects.)
 
+        Paged collections only list the first page. A page lists its manifests, followed by the next page.
+
         :param obj: A dict representing the Solr record for that collection.
         :return: A list of objects for the `items` array in the Collection.
         """
         req = self.context.get('request')
         cfg = self.context.get('config')
+        page: CollectionPage = self.context.get('page')
+
+        if page.page_token:
+            items: List = CollectionManifest(manifest_entries(page), many=True,
+                                             context={'request': req, 'config': cfg}).data
+            next_token: Optional[str] = page.next_token
+
+            if next_token:
+                items.append(self._page_item(obj, page.page_uri(req, next_token)))
+
+            return items
 
         manager: SolrManager = SolrManager(SolrConnection)
         coll_id: str = obj.get('collection_id')
@@ -183,11 +244,15 @@ class Collection(ContextDictSerializer):
                                                                              'config': cfg}).data
 
         # oh well; retrieve the manifest objects.
-        fq = ["type:object", f"all_collections_id_sm:{coll_id}"]
-        fl = ["id", "title_s", "full_shelfmark_s", "type"]
-        sort = "institution_label_s asc, shelfmark_sort_ans asc"
-
-        manager.search("*:*", fq=fq, fl=fl, rows=rows, sort=sort)
-
-        return CollectionManifest(manager.results, many=True, context={'request': req,
-                                                                       'config': cfg}).data
+        if page.is_paged:
+            return [self._page_item(obj, page.first_page_uri(req))]
+
+        return CollectionManifest(manifest_entries(page), many=True,
+                                  context={'request': req, 'config': cfg}).data
+
+    def _page_item(self, obj: SolrResult, page_uri: str) -> Dict:
+        return {
+            "id": page_uri,
+            "type": "Collection",
+            "label": self.get_label(obj)
+        }
@@ -9,23 +9,32 @@ from manifest_server.helpers.identifiers import get_identifier, IIIF_V3_CONTEXT
 from manifest_server.helpers.serializers import ContextDictSerializer
 from manifest_server.helpers.solr import SolrManager, SolrResult
 from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.helpers.summaries import get_object_summary
+from manifest_server.helpers.negative_cache import negative_cached
+from manifest_server.iiif.annotation_pages import AnnotationPageRecords, fetch_annotation_page
 from manifest_server.iiif.v3.manifests.annotation import ImageAnnotation, TextAnnotation
 
 SURFACE_ID_SUB: Pattern = re.compile(r"_surface")
 
 
+@negative_cached("annotationpage", id_formats=["{}_surface", "{}"])
 def create_v3_annotation_page(request, annotation_page_id: str, config: Dict) -> Optional[Dict]:
-
-    fq = [f'id:"{annotation_page_id}_surface" OR id:{annotation_page_id}']
-    fl = ['*,[child parentFilter="type:surface OR type:annotationpage" childFilter="type:image"]']
-    sort = "sort_i asc"
-
-    record = SolrConnection.search("*:*", fq=fq, fl=fl, sort=sort, rows=1)
-
-    if record.hits == 0:
+    """
+    An annotation page is either the page of image annotations for a surface, or a page of text
+    annotations. The page, its annotations and its object are retrieved together (see `annotation_pages`).
+
+    :param request: A Sanic request object
+    :param annotation_page_id: The ID of a surface (without the '_surface' suffix) or an annotation page
+    :param config: A manifest server configuration dict
+    :return: A V3 AnnotationPage object, or None if there is no such page.
+    """
+    records: Optional[AnnotationPageRecords] = fetch_annotation_page([f"{annotation_page_id}_surface",
+                                                                      annotation_page_id], config)
+
+    if records is None:
         return None
 
-    annopage_record: Dict = record.docs[0]
+    annopage_record: Dict = records.page
     annopage: BaseAnnotationPage
 
     if annopage_record['type'] == "surface":
@@ -35,7 +44,8 @@ def create_v3_annotation_page(request, annotation_page_id: str, config: Dict) ->
     else:
         annopage = TextAnnotationPage(annopage_record, context={"request": request,
                                                                 "config": config,
-                                                                "direct_request": True})
+                                                                "direct_request": True,
+                                                                "annotations": records.annotations})
     return annopage.data
 
 
@@ -105,16 +115,11 @@ class BaseAnnotationPage(ContextDictSerializer):
         wid: str = get_identifier(req, obj.get('object_id'), manifest_tmpl)
 
         # get object shelfmark for the label
-        fq = [f'id:"{obj.get("object_id")}"', 'type:object']
-        fl = ['full_shelfmark_s']
+        object_record: Optional[Dict] = get_object_summary(obj.get("object_id"), cfg)
 
-        res = SolrConnection.search(q='*:*', fq=fq, fl=fl, rows=1)
-
-        if res.hits == 0:
+        if not object_record:
             return None
 
-        object_record = res.docs[0]
-
         return [{
             "id": wid,
             "type": "Manifest",
@@ -135,13 +140,18 @@ class TextAnnotationPage(BaseAnnotationPage):
     )
 
     def get_items(self, obj: SolrResult) -> List[Dict]:
-        manager: SolrManager = SolrManager(SolrConnection)
-        fq: List = ["type:annotation", f'annotationpage_id:"{obj["id"]}"']
-        fl: List = ["*", "[child parentFilter=type:annotation childFilter=type:annotation_body]"]
-        manager.search("*:*", fq=fq, fl=fl, rows=100)
+        annotations: Optional[List[SolrResult]] = self.context.get('annotations')
+
+        # The annotations will normally have been retrieved with the page.
+        if annotations is None:
+            manager: SolrManager = SolrManager(SolrConnection)
+            fq: List = ["type:annotation", f'annotationpage_id:"{obj["id"]}"']
+            fl: List = ["*", "[child parentFilter=type:annotation childFilter=type:annotation_body]"]
+            manager.search("*:*", fq=fq, fl=fl, rows=100)
+            annotations = list(manager.results)
 
-        if manager.hits == 0:
+        if not annotations:
             return []
 
-        return TextAnnotation(list(manager.results), context={"request": self.context.get('request'),
-                                                              "config": self.context.get('config')}, many=True).data
+        return TextAnnotation(annotations, context={"request": self.context.get('request'),
+                                                    "config": self.context.get('config')}, many=True).data
@@ -8,8 +8,11 @@ from manifest_server.helpers.fields import StaticField
 from manifest_server.helpers.metadata import v3_metadata_block, CANVAS_FIELD_CONFIG
 from manifest_server.helpers.identifiers import get_identifier, IIIF_V3_CONTEXT
 from manifest_server.helpers.serializers import ContextDictSerializer
-from manifest_server.helpers.solr import SolrManager, SolrResult
+from manifest_server.helpers.solr import SolrManager, SolrResult, get_document
 from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.helpers.summaries import get_object_summary
+from manifest_server.helpers.negative_cache import negative_cached
+from manifest_server.iiif.field_lists import surface_fl
 from manifest_server.iiif.v3.manifests.annotation_page import ImageAnnotationPage
 
 log = logging.getLogger(__name__)
@@ -17,6 +20,7 @@ log = logging.getLogger(__name__)
 SURFACE_ID_SUB: Pattern = re.compile(r"_surface")
 
 
+@negative_cached("canvas", id_formats=["{}_surface"])
 def create_v3_canvas(request, canvas_id: str, config: Dict) -> Optional[Dict]:
     """
     Creates a new canvas in response to a request. Used for directly requesting canvases.
@@ -26,15 +30,12 @@ def create_v3_canvas(request, canvas_id: str, config: Dict) -> Optional[Dict]:
     :param config: A server configuration dictionary
     :return: A V3 Canvas object
     """
-    fq = ["type:surface", f"id:{canvas_id}_surface"]
-    fl = ["*,[child parentFilter=type:surface childFilter=type:image]"]
-    sort = "sort_i asc"
-    record = SolrConnection.search("*:*", fq=fq, fl=fl, sort=sort, rows=1)
+    canvas_record: Optional[SolrResult] = get_document(SolrConnection, f"{canvas_id}_surface",
+                                                       doc_type="surface", fl=surface_fl())
 
-    if record.hits == 0:
+    if canvas_record is None:
         return None
 
-    canvas_record: Dict = record.docs[0]
     canvas: Canvas = Canvas(canvas_record, context={"request": request,
                                                     "config": config,
                                                     "direct_request": True})
@@ -70,6 +71,9 @@ class Canvas(ContextDictSerializer):
 
     metadata = serpy.MethodField()
 
+    # Read by the metadata block
+    extra_solr_fields = list(CANVAS_FIELD_CONFIG.keys())
+
     def get_label(self, obj: SolrResult) -> Dict:
         return {"en": [f"{obj.get('label_s')}"]}
 
@@ -135,15 +139,11 @@ class Canvas(ContextDictSerializer):
         wid: str = get_identifier(req, obj.get('object_id'), manifest_tmpl)
 
         # get object shelfmark for the label
-        fq = [f'id:"{obj.get("object_id")}"', 'type:object']
-        fl = ['full_shelfmark_s']
-        res = SolrConnection.search(q='*:*', fq=fq, fl=fl, rows=1)
+        object_record: Optional[Dict] = get_object_summary(obj.get("object_id"), cfg)
 
-        if res.hits == 0:
+        if not object_record:
             return None
 
-        object_record = res.docs[0]
-
         return [{
             "id": wid,
             "type": "Manifest",
@@ -173,17 +173,25 @@ class Canvas(ContextDictSerializer):
         req = self.context.get('request')
         cfg = self.context.get('config')
 
-        fq = ["type:annotationpage", f'surface_id:"{sid}"']
-        fl = ["id"]
-        manager: SolrManager = SolrManager(SolrConnection)
-        manager.search(q='*:*', fq=fq, fl=fl)
+        # The IDs of the annotation pages for every canvas may have been retrieved
+        # with the rest of the manifest; if not, look them up for this canvas.
+        annotation_pages: Optional[Dict[str, List[str]]] = self.context.get("annotation_pages")
+
+        if annotation_pages is not None:
+            page_ids: List[str] = annotation_pages.get(sid, [])
+        else:
+            fq = ["type:annotationpage", f'surface_id:"{sid}"']
+            fl = ["id"]
+            manager: SolrManager = SolrManager(SolrConnection)
+            manager.search(q='*:*', fq=fq, fl=fl)
+            page_ids = [res['id'] for res in manager.results]
 
-        if manager.hits == 0:
+        if not page_ids:
             return None
 
         annotation_list_tmpl: str = cfg['templates']['annopage_id_tmpl']
 
-        annotation_ids = [{"id": get_identifier(req, annotation_page['id'], annotation_list_tmpl),
+        annotation_ids = [{"id": get_identifier(req, page_id, annotation_list_tmpl),
                            "type": "AnnotationPage"}
-                          for annotation_page in manager.results]
+                          for page_id in page_ids]
         return annotation_ids
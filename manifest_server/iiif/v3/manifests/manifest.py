@@ -1,32 +1,33 @@
 import logging
 from typing import Optional, Dict, List
 
-import pysolr
 import serpy
 
 from manifest_server.helpers.fields import StaticField
 from manifest_server.helpers.identifiers import get_identifier, IIIF_V3_CONTEXT
-from manifest_server.helpers.metadata import v3_metadata_block, get_links
+from manifest_server.helpers.metadata import v3_metadata_block, get_links, get_link_docs, FIELD_CONFIG
 from manifest_server.helpers.serializers import ContextDictSerializer
 from manifest_server.helpers.solr import SolrManager, SolrResult
 from manifest_server.helpers.solr_connection import SolrConnection
+from manifest_server.helpers.negative_cache import negative_cached
+from manifest_server.iiif.bundle import ObjectBundle, get_object_bundle
+from manifest_server.iiif.field_lists import surface_fl
 from manifest_server.iiif.v3.manifests.canvas import Canvas
 from manifest_server.iiif.v3.manifests.structure import create_v3_structures
 
 log = logging.getLogger(__name__)
 
 
+@negative_cached("manifest", id_formats=["{}"])
 def create_v3_manifest(request, manifest_id: str, config: Dict) -> Optional[Dict]:
-    fq: List = ["type:object", f"id:{manifest_id}"]
-    record: pysolr.Results = SolrConnection.search("*:*", fq=fq, rows=1)
+    bundle: Optional[ObjectBundle] = get_object_bundle(manifest_id, config)
 
-    if record.hits == 0:
+    if bundle is None:
         return None
 
-    object_record = record.docs[0]
-
-    manifest: Manifest = Manifest(object_record, context={"request": request,
-                                                          "config": config})
+    manifest: Manifest = Manifest(bundle.object, context={"request": request,
+                                                          "config": config,
+                                                          **bundle.context()})
 
     return manifest.data
 
@@ -94,6 +95,9 @@ class Manifest(ContextDictSerializer):
         required=False
     )
 
+    # Read by the metadata block
+    extra_solr_fields = list(FIELD_CONFIG.keys())
+
     def get_mid(self, obj: SolrResult) -> str:
         req = self.context.get('request')
         conf = self.context.get('config')
@@ -142,10 +146,11 @@ class Manifest(ContextDictSerializer):
         tmpl: str = cfg['templates']['digital_bodleian_permalink_tmpl']
         uuid: str = obj.get("id")
 
-        conn: SolrManager = SolrManager(SolrConnection)
-        fq: List = ['type:link', f"object_id:{uuid}"]
+        link_docs: Optional[List[SolrResult]] = self.context.get('links')
 
-        conn.search("*:*", fq=fq)
+        # The same links are used in the metadata block, so they are looked up through the cache.
+        if link_docs is None:
+            link_docs = get_link_docs(uuid, cfg)
 
         links: List = [{
             'id': get_identifier(req, uuid, tmpl),
@@ -155,15 +160,14 @@ class Manifest(ContextDictSerializer):
             "language": ["en"]
         }]
 
-        if conn.hits > 0:
-            for r in conn.results:
-                links.append({
-                    'id': r.get('target_s'),
-                    'type': "Text",
-                    "label": {"en": [r.get('label_s')]},
-                    "format": "text/html",
-                    "language": ["en"]
-                })
+        for r in link_docs:
+            links.append({
+                'id': r.get('target_s'),
+                'type': "Text",
+                "label": {"en": [r.get('label_s')]},
+                "format": "text/html",
+                "language": ["en"]
+            })
 
         return links
 
@@ -257,7 +261,12 @@ class Manifest(ContextDictSerializer):
 
     def get_metadata(self, obj: SolrResult) -> Optional[List[Dict]]:
         # description_sm is already included in the summary
-        metadata: List = get_links(obj, 3)
+        link_docs: Optional[List[SolrResult]] = self.context.get('links')
+
+        if link_docs is None:
+            link_docs = get_link_docs(obj.get('id'), self.context.get('config'))
+
+        metadata: List = get_links(obj, 3, link_docs)
         metadata += v3_metadata_block(obj)
 
         return metadata
@@ -267,6 +276,20 @@ class Manifest(ContextDictSerializer):
         cfg = self.context.get('config')
         obj_id: str = obj.get('id')
 
+        # The surfaces may have been retrieved in advance, in which case the
+        # check for annotations will have been done at the same time.
+        if 'surfaces' in self.context:
+            surfaces: List = self.context['surfaces']
+
+            if not surfaces:
+                return None
+
+            return Canvas(surfaces, context={"request": req,
+                                             "config": cfg,
+                                             "has_annotations": self.context.get('has_annotations'),
+                                             "annotation_pages": self.context.get('annotation_pages')},
+                          many=True).data
+
         # Check if the canvases have annotations. We don't actually
         # need to retrieve them, just get the number of hits.
         has_annotations_res = SolrConnection.search(
@@ -279,7 +302,7 @@ class Manifest(ContextDictSerializer):
         manager: SolrManager = SolrManager(SolrConnection)
         fq: List = ["type:surface", f"object_id:{obj_id}"]
         sort: str = "sort_i asc"
-        fl: List = ["*,[child parentFilter=type:surface childFilter=type:image]"]
+        fl: List = surface_fl()
         rows: int = 100
         manager.search("*:*", fq=fq, fl=fl, sort=sort, rows=rows)
 
@@ -293,7 +316,8 @@ class Manifest(ContextDictSerializer):
     def get_structures(self, obj: SolrResult) -> Optional[List[Dict]]:
         return create_v3_structures(self.context.get("request"),
                                     obj.get("id"),
-                                    self.context.get("config"))
+                                    self.context.get("config"),
+                                    works=self.context.get("works"))
 
     def get_nav_date(self, obj: SolrResult) -> Optional[str]:
         year: Optional[int] = obj.get('start_date_i') or obj.get('end_date_i')
@@ -15,6 +15,7 @@ from manifest_server.helpers.metadata import (
     WORKS_METADATA_FILTER_FIELDS,
     WORKS_METADATA_FIELD_CONFIG
 )
+from manifest_server.helpers.negative_cache import negative_cached
 
 SURFACE_ID_SUB: Pattern = re.compile(r"_surface$")
 
@@ -44,6 +45,7 @@ def __find_in_tree(lst: List, ident: str) -> Dict:
     return res
 
 
+@negative_cached("range")
 def create_v3_range(request, range_id: str, config: Dict) -> Optional[Dict]:
     """
     Handles a lookup for a particular range ID. Works by constructing the whole
@@ -73,19 +75,25 @@ def create_v3_range(request, range_id: str, config: Dict) -> Optional[Dict]:
     return res
 
 
-def create_v3_structures(request, obj_id: str, config, direct_request: bool = False) -> Optional[List]:
-    manager: SolrManager = SolrManager(SolrConnection)
-    fq: List = ["type:work", f"object_id:{obj_id}"]
-    # Restrict the returned fields to only those that are needed.
-    fl: List = WORKS_METADATA_FILTER_FIELDS
-    rows: int = 100
-    sort: str = "work_id asc"
-    manager.search("*:*", fq=fq, sort=sort, fl=fl, rows=rows)
+def create_v3_structures(request, obj_id: str, config, direct_request: bool = False,
+                         works: Optional[List[SolrResult]] = None) -> Optional[List]:
+    if works is None:
+        manager: SolrManager = SolrManager(SolrConnection)
+        fq: List = ["type:work", f"object_id:{obj_id}"]
+        # Restrict the returned fields to only those that are needed.
+        fl: List = WORKS_METADATA_FILTER_FIELDS
+        rows: int = 100
+        sort: str = "work_id asc"
+        manager.search("*:*", fq=fq, sort=sort, fl=fl, rows=rows)
 
-    if manager.hits == 0:
+        works = list(manager.results)
+
+    if not works:
         return None
 
-    results = list(manager.results)
+    # treeize drains the list it is given, and adds the children to each work,
+    # so work on copies; the work records may be shared with other requests.
+    results: List = [dict(w) for w in works]
     output: List = []
 
     # A recursive function that takes the results and creates a tree
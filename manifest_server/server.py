@@ -1,14 +1,17 @@
+import math
 import logging
-from typing import Dict, Callable, Optional, Union, Any
+import functools
+from typing import Dict, Iterator, List, Callable, Optional, Union, Any
 
 import yaml
+import pysolr
 import asyncio
+import ujson
 import uvloop
 from sanic import Sanic, response, request
 
 
 from manifest_server.iiif.v2 import (
-    create_v2_manifest,
     create_v2_canvas,
     create_v2_sequence,
     create_v2_annotation_list,
@@ -17,7 +20,6 @@ from manifest_server.iiif.v2 import (
     create_v2_range
 )
 from manifest_server.iiif.v3 import (
-    create_v3_manifest,
     create_v3_canvas,
     create_v3_annotation_page,
     create_v3_annotation,
@@ -31,7 +33,26 @@ from manifest_server.iiif.activity import (
     create_activity
 )
 
+from manifest_server.iiif.activity.stream_index import ActivityStreamPages
 from manifest_server.iiif.root import create_root
+from manifest_server.iiif.export import export_manifests, export_filters
+from manifest_server.iiif.bundle import ObjectBundle, is_bundle_cached, surface_count
+from manifest_server.iiif.render import RenderPool, find_manifest_bundle
+from manifest_server.helpers.id_index import IdIndex
+from manifest_server.helpers.admission import (
+    LargeManifestLimit,
+    RequestLanes,
+    AdmissionRejected,
+    CHEAP,
+    EXPENSIVE,
+    current_lane
+)
+from manifest_server.helpers.metrics import render_metrics
+from manifest_server.helpers.solr_connection import solr_nodes
+from manifest_server.helpers.circuit_breaker import SolrUnavailable
+from manifest_server.helpers.rate_limit import RateLimiter
+from manifest_server.helpers.load_shedding import LoadShedder, SHED
+from manifest_server.helpers.deadline import DeadlineExceeded, set_deadline, reset_deadline
 
 config: Dict = yaml.safe_load(open('configuration.yml', 'r'))
 
@@ -55,12 +76,58 @@ logging.basicConfig(format="[%(asctime)s] [%(levelname)8s] %(message)s (%(filena
 log = logging.getLogger(__name__)
 
 
+# Manifests with at least this many canvases count as large, and are subject to the admission limit.
+LARGE_MANIFEST_SURFACES: int = int(config.get('admission', {}).get('large_surfaces', 0))
+ADMISSION_RETRY_AFTER: int = int(config.get('admission', {}).get('retry_after', 5))
+LargeManifestLimit.configure(config.get('admission', {}))
+RequestLanes.configure(config.get('scheduler', {}))
+RateLimiter.configure(config.get('rate_limit', {}))
+LoadShedder.configure(config.get('load_shedding', {}))
+
+# The time budget for each route, in seconds, keyed by the name of its handler; 0 for no deadline.
+DEADLINES: Dict = config.get('deadlines', {})
+DEFAULT_DEADLINE: float = float(DEADLINES.get('default', 0))
+ROUTE_DEADLINES: Dict[str, float] = {k: float(v) for k, v in (DEADLINES.get('routes') or {}).items()}
+
 IIIF_CONTEXT_STR: str = "http://iiif.io/api/presentation/{iiif_version}/context.json"
 IIIF_DISCOVERY_STR: str = "http://iiif.io/api/discovery/0/context.json"
 
 DataCallable = Callable[[request.Request, Optional[Any], Dict], Optional[Dict]]
 
 
+def _iiif_version(req: request.Request) -> int:
+    """
+    :param req: The incoming request object.
+    :return: The IIIF Presentation API version asked for in the 'Accept' header; 2 unless 3 is asked for.
+    """
+    iiif_accept: str = req.headers.get('Accept')
+
+    if iiif_accept and "presentation/3" in iiif_accept:
+        return 3
+
+    return 2
+
+
+def _iiif_headers(req: request.Request, iiif_version: int) -> Dict:
+    """
+    :param req: The incoming request object.
+    :param iiif_version: The IIIF version of the response
+    :return: The headers for a IIIF response, with the content type negotiated from the 'Accept' header.
+    """
+    iiif_accept: str = req.headers.get('Accept')
+    iiif_context: str = IIIF_CONTEXT_STR.format(iiif_version=iiif_version)
+
+    headers: Dict = dict()
+
+    if iiif_accept and 'ld+json' not in iiif_accept:
+        headers['Content-Type'] = 'application/json'
+    else:
+        # If the response is plain JSON, flag it so that we can add the link header later.
+        headers['Content-Type'] = f'application/ld+json;profile="{iiif_context}"'
+
+    return headers
+
+
 def _parse_request(req: request.Request, obj_id: Optional[str], v2_data_func: Optional[DataCallable],
                    v3_data_func: Optional[DataCallable]) -> response.HTTPResponse:
     """
@@ -75,14 +142,7 @@ def _parse_request(req: request.Request, obj_id: Optional[str], v2_data_func: Op
     :return: A Sanic HTTPResponse object with either 404 (Not Found, text body), 406 (Not Acceptable, text body)
              or 200 (success, json body) statuses.
     """
-    # read v2/v3 header X-IIIF-Version
-    iiif_accept: str = req.headers.get('Accept')
-
-    # Default to IIIF v2
-    iiif_version: int = 2
-
-    if iiif_accept and "presentation/3" in iiif_accept:
-        iiif_version = 3
+    iiif_version: int = _iiif_version(req)
 
     if iiif_version == 2 and v2_data_func is None:
         # If the client asks for a v3 object using a v2 request.
@@ -113,15 +173,7 @@ def _parse_request(req: request.Request, obj_id: Optional[str], v2_data_func: Op
             status=404
         )
 
-    iiif_context: str = IIIF_CONTEXT_STR.format(iiif_version=iiif_version)
-
-    headers: Dict = dict()
-
-    if iiif_accept and 'ld+json' not in iiif_accept:
-        headers['Content-Type'] = 'application/json'
-    else:
-        # If the response is plain JSON, flag it so that we can add the link header later.
-        headers['Content-Type'] = f'application/ld+json;profile="{iiif_context}"'
+    headers: Dict = _iiif_headers(req, iiif_version)
 
     # NB: Escape forward slashes is an ambiguous part of the JSON spec. Disabling them makes the manifests more
     # readable. If problems arise with clients, we may need to revisit this parameter.
@@ -167,13 +219,181 @@ def _parse_activity_stream_request(req: request.Request, req_id: Union[str, int,
                          indent=JSON_INDENT)
 
 
+def _busy_response(retry_after: Optional[float] = None) -> response.HTTPResponse:
+    """
+    :param retry_after: The number of seconds after which the client may try again, if known.
+    :return: A 503 (Service Unavailable) response, for a request that could not be admitted or completed.
+    """
+    return response.text(
+        "The server is busy; please try again shortly.",
+        status=503,
+        headers={"Retry-After": str(int(retry_after or ADMISSION_RETRY_AFTER))}
+    )
+
+
+def _throttled(req: request.Request, route: str) -> Optional[response.HTTPResponse]:
+    """
+    :param req: A request object
+    :param route: The name of the route's handler
+    :return: A 429 (Too Many Requests) response if the client has gone over its rate limit, or None.
+    """
+    retry_after: Optional[float] = RateLimiter.check(req, route)
+
+    if retry_after is None:
+        return None
+
+    return response.text(
+        "Too many requests; please slow down.",
+        status=429,
+        headers={"Retry-After": str(math.ceil(retry_after))}
+    )
+
+
+def _lane(lane: str, cached: Optional[Callable[..., bool]] = None,
+          large: Optional[Callable[..., bool]] = None) -> Callable:
+    """
+    Schedules a route in a lane of the request scheduler; see `PriorityLanes`. Routes that
+    a viewer calls as it is used are CHEAP, and the rest are EXPENSIVE.
+
+    Large requests first wait for a place under the `LargeManifestLimit`, so that the ones
+    that are queued hold neither a place in the lane nor the records they need.
+
+    The route's deadline starts when the request arrives, so time spent waiting for a place
+    counts against it; see `helpers/deadline.py`. Clients over their rate limit are turned
+    away before that; see `helpers/rate_limit.py`. So are EXPENSIVE requests while the worker
+    is overloaded, unless they can be answered from a cache; see `helpers/load_shedding.py`.
+
+    :param lane: CHEAP or EXPENSIVE
+    :param cached: Called with the route's arguments; returns True if the response can be built
+        from what is cached.
+    :param large: Called with the route's arguments; returns True if the request is large.
+    :return: A decorator for a route handler
+    """
+    def decorator(handler: Callable) -> Callable:
+        budget: float = ROUTE_DEADLINES.get(handler.__name__, DEFAULT_DEADLINE)
+
+        @functools.wraps(handler)
+        async def scheduled(req, *args, **kwargs) -> response.HTTPResponse:
+            throttled: Optional[response.HTTPResponse] = _throttled(req, handler.__name__)
+
+            if throttled is not None:
+                return throttled
+
+            if LoadShedder.should_shed(lane) and not (cached is not None and cached(*args, **kwargs)):
+                SHED.inc(route=handler.__name__)
+                return _busy_response()
+
+            token = set_deadline(budget)
+            current_lane.set(lane)
+
+            try:
+                with LoadShedder.tracking():
+                    if large is not None and large(*args, **kwargs):
+                        async with LargeManifestLimit.admit():
+                            async with RequestLanes.admit(lane):
+                                return await handler(req, *args, **kwargs)
+
+                    async with RequestLanes.admit(lane):
+                        return await handler(req, *args, **kwargs)
+            except (AdmissionRejected, DeadlineExceeded):
+                return _busy_response()
+            except SolrUnavailable as e:
+                return _busy_response(e.retry_after)
+            finally:
+                reset_deadline(token)
+
+        return scheduled
+    return decorator
+
+
+@app.listener('before_server_start')
+async def build_id_index(app_, loop) -> None:  # pylint: disable-msg=unused-argument
+    """
+    Builds the ID index, if it is enabled, before the server takes any requests; otherwise
+    the first request to need it would have to wait for it to be built. If Solr can't be
+    reached, the index is built by the first request that needs it instead.
+    """
+    if config.get('id_index', {}).get('enabled'):
+        log.info("Building the ID index")
+
+        try:
+            IdIndex.build(config)
+        except pysolr.SolrError as e:
+            log.warning("Could not build the ID index: %s", e)
+
+
+@app.listener('before_server_start')
+async def build_activity_index(app_, loop) -> None:  # pylint: disable-msg=unused-argument
+    """
+    Builds the index of ActivityStream pages before the server takes any requests, since
+    walking the stream can take longer than a request's deadline. If Solr can't be reached, the
+    index is built by the first request that needs it instead.
+    """
+    log.info("Building the ActivityStream page index")
+
+    try:
+        ActivityStreamPages.build(config)
+    except pysolr.SolrError as e:
+        log.warning("Could not build the ActivityStream page index: %s", e)
+
+
+@app.listener('before_server_start')
+async def start_render_pool(app_, loop) -> None:  # pylint: disable-msg=unused-argument
+    """
+    Starts the pool of processes for rendering large manifests, if it is enabled. Each server
+    worker has its own pool.
+    """
+    RenderPool.start(config)
+
+
+@app.listener('after_server_stop')
+async def stop_render_pool(app_, loop) -> None:  # pylint: disable-msg=unused-argument
+    RenderPool.stop()
+
+
+@app.listener('before_server_start')
+async def start_load_monitor(app_, loop) -> None:  # pylint: disable-msg=unused-argument
+    """
+    Starts measuring the lag of the worker's event loop, if load shedding is enabled.
+    """
+    LoadShedder.start()
+
+
+@app.listener('after_server_stop')
+async def stop_load_monitor(app_, loop) -> None:  # pylint: disable-msg=unused-argument
+    LoadShedder.stop()
+
+
+@app.listener('before_server_start')
+async def start_solr_health_checks(app_, loop) -> None:  # pylint: disable-msg=unused-argument
+    """
+    Starts checking the Solr nodes in the background, if more than one is configured.
+    """
+    solr_nodes.start()
+
+
+@app.listener('after_server_stop')
+async def stop_solr_health_checks(app_, loop) -> None:  # pylint: disable-msg=unused-argument
+    solr_nodes.stop()
+
+
 @app.route("/info.json")
+@_lane(CHEAP)
 async def root(req) -> response.HTTPResponse:
     # NB: The Root function is the same for v2 and v3 requests.
     return _parse_request(req, None, create_root, create_root)
 
 
+def _large_manifest(manifest_id: str) -> bool:
+    """
+    :param manifest_id: The ID of an object
+    :return: True if the object's manifest is large enough to be subject to the admission limit.
+    """
+    return LargeManifestLimit.enabled and surface_count(manifest_id, config) >= LARGE_MANIFEST_SURFACES
+
+
 @app.route("/iiif/manifest/<manifest_id:uuid>.json")
+@_lane(EXPENSIVE, cached=lambda manifest_id: is_bundle_cached(manifest_id, config), large=_large_manifest)
 async def manifest(req, manifest_id: str) -> response.HTTPResponse:
     """
     Given a Digital Bodleian UUID, returns a IIIF Manifest.
@@ -181,56 +401,145 @@ async def manifest(req, manifest_id: str) -> response.HTTPResponse:
     :param manifest_id: A UUID to look up in Solr
     :return: An HTTP Response object
     """
-    return _parse_request(req, manifest_id, create_v2_manifest, create_v3_manifest)
+    bundle: Optional[ObjectBundle] = find_manifest_bundle(req, manifest_id, config)
+
+    if bundle is None:
+        return response.text(
+            f"An object of ID {manifest_id} was not found.",
+            status=404
+        )
+
+    iiif_version: int = _iiif_version(req)
+    headers: Dict = _iiif_headers(req, iiif_version)
+
+    # Large manifests may be serialized in the render pool; either way they come back already encoded.
+    body: bytes = await RenderPool.render_manifest(req, bundle, iiif_version, config, JSON_INDENT)
+
+    return response.raw(body, headers=headers, status=200, content_type=headers['Content-Type'])
 
 
 @app.route("/iiif/canvas/<canvas_id:uuid>.json")
+@_lane(CHEAP)
 async def canvas(req, canvas_id: str) -> response.HTTPResponse:
     return _parse_request(req, canvas_id, create_v2_canvas, create_v3_canvas)
 
 
 @app.route("/iiif/sequence/<sequence_id:uuid>_default.json")
+@_lane(EXPENSIVE)
 async def sequence(req, sequence_id: str) -> response.HTTPResponse:
     # Sequences are deprecated in v3.
     return _parse_request(req, sequence_id, create_v2_sequence, None)
 
 
 @app.route("/iiif/annotationlist/<annolist_id:uuid>.json")
+@_lane(CHEAP)
 async def annotation_list(req, annolist_id: str) -> response.HTTPResponse:
     return _parse_request(req, annolist_id, create_v2_annotation_list, None)
 
 
 @app.route("/iiif/annotationpage/<annopage_id:uuid>.json")
+@_lane(CHEAP)
 async def annotation_page(req, annopage_id: str) -> response.HTTPResponse:
     return _parse_request(req, annopage_id, None, create_v3_annotation_page)
 
 
 @app.route("/iiif/annotation/<annotation_id:uuid>.json")
+@_lane(CHEAP)
 async def annotation(req, annotation_id: str) -> response.HTTPResponse:
     return _parse_request(req, annotation_id, create_v2_annotation, create_v3_annotation)
 
 
 @app.route(r"/iiif/collection/<collection_id:[^\s]+>")
+@_lane(EXPENSIVE)
 async def collection(req, collection_id: str) -> response.HTTPResponse:
     return _parse_request(req, collection_id, create_v2_collection, create_v3_collection)
 
 
 @app.route("/iiif/range/<object_id:uuid>/<range_id:string>")
+@_lane(CHEAP)
 async def iiif_range(req, object_id: str, range_id: str) -> response.HTTPResponse:
     return _parse_request(req, f'{object_id}/{range_id}', create_v2_range, create_v3_range)
 
 
 # NB: Declaring the route parameter as an integer will also cast the page_id parameter to an integer.
 @app.route("/iiif/activity/page-<page_id:int>")
+@_lane(EXPENSIVE)
 async def iiif_activity_page(req, page_id: int) -> response.HTTPResponse:
     return _parse_activity_stream_request(req, page_id, create_ordered_collection_page)
 
 
 @app.route("/iiif/activity/create/<manifest_id:uuid>")
+@_lane(CHEAP)
 async def iiif_create_activity(req, manifest_id: str) -> response.HTTPResponse:
     return _parse_activity_stream_request(req, manifest_id, create_activity)
 
 
 @app.route("/iiif/activity/all-changes")
+@_lane(EXPENSIVE)
 async def iiif_activity(req) -> response.HTTPResponse:
     return _parse_activity_stream_request(req, None, create_ordered_collection)
+
+
+@app.route("/metrics")
+async def metrics(req) -> response.HTTPResponse:  # pylint: disable-msg=unused-argument
+    """
+    The metrics of this worker, in the Prometheus text format.
+    """
+    return response.text(render_metrics(), content_type="text/plain; version=0.0.4")
+
+
+@app.route("/iiif/export/manifests.ndjson")
+async def export(req) -> response.StreamingHTTPResponse:
+    """
+    Streams every manifest as newline-delimited JSON, one manifest per line. The IIIF version is
+    negotiated with the 'Accept' header, as for individual manifests. The export can be restricted
+    with the arguments described in `export_filters`.
+
+    :param req: A request object
+    :return: A streaming HTTP response object, or a 400 (Bad Request) if the filter arguments were invalid.
+    """
+    fq: Optional[List] = export_filters(req.args)
+
+    if fq is None:
+        return response.text(
+            "The export filter arguments were not valid.",
+            status=400
+        )
+
+    throttled: Optional[response.HTTPResponse] = _throttled(req, "export")
+
+    if throttled is not None:
+        return throttled
+
+    if LoadShedder.should_shed(EXPENSIVE):
+        SHED.inc(route="export")
+        return _busy_response()
+
+    iiif_version: int = _iiif_version(req)
+
+    # The export is streamed after this handler returns, so it holds its place in the
+    # expensive lane until the stream has been written.
+    try:
+        await RequestLanes.acquire(EXPENSIVE)
+    except AdmissionRejected:
+        return _busy_response()
+
+    async def stream_manifests(resp: response.StreamingHTTPResponse) -> None:
+        loop = asyncio.get_event_loop()
+        batches: Iterator[List[Dict]] = export_manifests(req, config, iiif_version, fq)
+
+        try:
+            # Each batch is fetched from Solr and serialized in a thread, so that the export
+            # doesn't hold up the other requests the worker is handling.
+            while True:
+                manifests: Optional[List[Dict]] = await loop.run_in_executor(None, next, batches, None)
+
+                if manifests is None:
+                    break
+
+                for manifest_obj in manifests:
+                    await resp.write(ujson.dumps(manifest_obj, escape_forward_slashes=False) + "\n")
+        finally:
+            RequestLanes.release(EXPENSIVE)
+
+    return response.stream(stream_manifests, content_type="application/x-ndjson")
@@ -1,8 +1,35 @@
+import sys
+import time
+import asyncio
+import threading
+
 import pysolr
+import pytest
+import requests
+import serpy
 
-from manifest_server.helpers.solr import SolrManager
-from manifest_server.helpers.serializers import ContextDictSerializer
-from manifest_server.helpers.metadata import get_links
+from manifest_server.helpers.solr import SolrManager, SolrDecoder, DeadlineSolr, BalancedSolr, get_documents
+from manifest_server.helpers.solr_nodes import SolrNodes
+from manifest_server.helpers.hedging import HedgePolicy
+from manifest_server.helpers.circuit_breaker import CircuitBreaker, SolrUnavailable, CLOSED, OPEN
+from manifest_server.helpers.adaptive_limit import AdaptiveLimit
+from manifest_server.helpers.rate_limit import SharedTokenBuckets
+from manifest_server.helpers.load_shedding import WorkerLoad
+from manifest_server.helpers.deadline import DeadlineExceeded, set_deadline, reset_deadline, remaining
+from manifest_server.helpers.serializers import ContextDictSerializer, solr_fields
+from manifest_server.helpers.metadata import get_links, v2_metadata_block, v3_metadata_block
+from manifest_server.helpers.cache import ExpiringLRUCache
+from manifest_server.helpers.bloom import BloomFilter
+from manifest_server.helpers import id_index
+from manifest_server.helpers.records import SurfaceRecord
+from manifest_server.helpers.admission import AdmissionLimit, AdmissionRejected, PriorityLanes, CHEAP, EXPENSIVE
+from manifest_server.helpers.summaries import SUMMARY_FIELDS
+from manifest_server.iiif import export
+from manifest_server.iiif.export import export_filters
+from manifest_server.iiif.field_lists import annotation_page_fl, ANNOTATION_BODY_FIELDS
+from manifest_server.iiif import bundle
+from manifest_server.iiif.v3.collections.collection import CollectionManifest, manifest_entries
+from manifest_server.iiif.activity import stream_index
 
 
 def test_solr_manager_initial_state():
@@ -12,12 +39,347 @@ def test_solr_manager_initial_state():
     assert m.hits == 0
 
 
+def test_get_documents_without_ids():
+    # No IDs should not send a request
+    conn = pysolr.Solr("http://digital1-qa-solr1.bodleian.ox.ac.uk:8983/solr/digital_bodleian_ingest")
+    assert get_documents(conn, []) == []
+
+
+def test_solr_decoder():
+    assert SolrDecoder.from_config("json").decode('{"response": {"numFound": 0}}') == {"response": {"numFound": 0}}
+    # Falls back to the standard library if the one asked for is not installed
+    assert SolrDecoder.from_config("nonexistent_json").name == "json"
+
+
+def test_deadline_solr():
+    class PartialSolr(DeadlineSolr):
+        def _select(self, params, handler=None):
+            self.params = params
+            return '{"responseHeader": {"partialResults": true}, "response": {"numFound": 0, "docs": []}}'
+
+    conn = PartialSolr("http://localhost/solr/core")
+    token = set_deadline(5.0)
+
+    # Partial results are not returned as if they were complete
+    try:
+        conn.search("*:*")
+        assert False
+    except DeadlineExceeded:
+        assert 0 < conn.params['timeAllowed'] <= 5000
+    finally:
+        reset_deadline(token)
+
+
+def test_deadline_solr_cursor():
+    class CursorSolr(DeadlineSolr):
+        def _send_as(self, url, timeout, method, path, *args):
+            self.path, self.sent_timeout = path, timeout
+            return '{"response": {"numFound": 0, "docs": []}, "nextCursorMark": "*"}'
+
+    conn = CursorSolr("http://localhost/solr/core", timeout=10)
+    token = set_deadline(5.0)
+
+    # Solr refuses cursor queries with a timeAllowed, so only the wait for the response is bounded
+    try:
+        SolrManager(conn).search("*:*", fq=["type:object"])
+        assert "cursorMark" in conn.path
+        assert "timeAllowed" not in conn.path
+        assert 0 < conn.sent_timeout <= 5.0
+    finally:
+        reset_deadline(token)
+
+
+def test_activity_index_outlives_deadline(monkeypatch):
+    class SlowSolr:
+        def search(self, q, **kwargs):
+            # Each page of the walk takes a while, and checks the deadline as DeadlineSolr would
+            time.sleep(0.02)
+            remaining()
+            page = int(kwargs['cursorMark'].lstrip("c") or 0) if kwargs['cursorMark'] != "*" else 0
+            return pysolr.Results({"response": {"numFound": 500, "docs": []}, "nextCursorMark": f"c{page + 1}"})
+
+    monkeypatch.setattr(stream_index, "SolrConnection", SlowSolr())
+    index = stream_index.ActivityStreamIndex()
+    monkeypatch.setattr(index._watermark, "current", lambda interval: (500, "2020-01-01T00:00:00Z"))
+    config = {"activity": {"refresh_interval": 60}, "solr": {"pagesize": 100}}
+    token = set_deadline(0.05)
+
+    try:
+        # The walk takes longer than the request's budget, but the index is still built
+        assert index.page_cursor(5, config) == "c5"
+        assert index.total(config) == 500
+    finally:
+        reset_deadline(token)
+
+
+def test_activity_index_refresh(monkeypatch):
+    state = {"hits": 200, "ready": threading.Event()}
+
+    class ChangingSolr:
+        def search(self, q, **kwargs):
+            # The rebuild waits until the test lets it finish
+            if state["hits"] > 200:
+                state["ready"].wait(5)
+            page = int(kwargs['cursorMark'][1:]) if kwargs['cursorMark'] != "*" else 0
+            return pysolr.Results({"response": {"numFound": state["hits"], "docs": []},
+                                   "nextCursorMark": f"c{page + 1}"})
+
+    monkeypatch.setattr(stream_index, "SolrConnection", ChangingSolr())
+    index = stream_index.ActivityStreamIndex()
+    monkeypatch.setattr(index._watermark, "current", lambda interval: (state["hits"], None))
+    config = {"activity": {"refresh_interval": 60}, "solr": {"pagesize": 100}}
+    assert index.last_page(config) == 2
+
+    # Once the stream has changed, the old index is served while the new one is built
+    state["hits"] = 400
+    assert index.last_page(config) == 2
+    assert index.page_cursor(4, config) is None
+    state["ready"].set()
+
+    for _ in range(100):
+        if index.last_page(config) == 4:
+            break
+        time.sleep(0.01)
+
+    assert index.page_cursor(4, config) == "c4"
+
+
+def test_solr_nodes():
+    nodes = SolrNodes(["http://solr1/solr/core", "http://solr2/solr/core/"], max_failures=2)
+    solr1, solr2 = nodes.nodes
+    assert solr2.url == "http://solr2/solr/core"
+
+    nodes.failed(solr1)
+    assert solr1.healthy
+    nodes.failed(solr1)
+    # Ejected nodes are not chosen while there are others
+    assert not solr1.healthy
+    assert all(nodes.choose() is solr2 for _ in range(20))
+
+
+def test_hedge_policy():
+    policy = HedgePolicy(max_ratio=0.5, min_samples=20, min_delay=0.05)
+    # Call sites without enough samples are not hedged
+    assert policy.delay("site") is None
+
+    for i in range(100):
+        policy.record("site", 0.01 if i % 50 else 2.0)
+
+    # The 95th percentile is below the minimum delay here
+    assert policy.delay("site") == 0.05
+    # Two queries have earned one hedge
+    assert policy.allow()
+    assert not policy.allow()
+
+
+def test_hedge_policy_threads():
+    policy = HedgePolicy(max_ratio=0.5, burst=5.0)
+    allowed = []
+
+    def send():
+        for _ in range(2000):
+            policy.delay("site")
+            if policy.allow():
+                allowed.append(1)
+
+    # Switch threads as often as possible, to give them every chance to interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    threads = [threading.Thread(target=send) for _ in range(4)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    # However the threads interleave, no more hedges are sent than the queries earned
+    assert len(allowed) == 4000
+    assert policy._credit == 0
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failures=2, cooldown=0)
+    breaker.failed()
+    breaker.before()
+    breaker.failed()
+    assert breaker.state == OPEN
+
+    # Once the cool-down is over, one query probes Solr, and the rest fail fast until it is answered
+    breaker.before()
+    try:
+        breaker.before()
+        assert False
+    except SolrUnavailable:
+        pass
+    breaker.succeeded()
+    assert breaker.state == CLOSED
+
+
+def test_deadline_timeouts_are_not_failures():
+    class TimingOutSolr(BalancedSolr):
+        def _send_as(self, url, timeout, *args):
+            try:
+                raise requests.Timeout()
+            except requests.Timeout:
+                raise pysolr.SolrError("Connection to server timed out")
+
+    breaker = CircuitBreaker(failures=1, cooldown=60)
+    conn = TimingOutSolr(SolrNodes(["http://localhost/solr/core"]), breaker=breaker, timeout=10)
+    token = set_deadline(1.0)
+
+    # A query given less than the full timeout by its deadline says nothing about Solr
+    try:
+        with pytest.raises(DeadlineExceeded):
+            conn.search("*:*")
+    finally:
+        reset_deadline(token)
+    assert breaker.state == CLOSED
+    assert conn.nodes.nodes[0].failures == 0
+
+    with pytest.raises(pysolr.SolrError):
+        conn.search("*:*")
+    assert breaker.state == OPEN
+    assert conn.nodes.nodes[0].failures == 1
+
+
+def test_adaptive_limit():
+    limit = AdaptiveLimit(initial=3, maximum=4, tolerance=2.0, backoff=0.5)
+    first = limit.try_acquire(priority=0)
+    assert first
+    # The last place under the limit is kept for queries of higher priority
+    assert limit.try_acquire(priority=2) is None
+    second = limit.try_acquire(priority=1)
+    assert second
+    assert limit.try_acquire(priority=0)
+    # The limit is full, so another query fails straight away
+    assert limit.try_acquire(priority=0) is None
+
+    # Quick answers let the limit grow; a slow one cuts it
+    limit.release(first, "site", 0.01, ok=True)
+    assert limit.limit == 3 + 1 / 3
+    limit.release(second, "site", 0.5, ok=True)
+    assert limit.limit == (3 + 1 / 3) / 2
+    assert limit.in_flight == 1
+
+
+def test_adaptive_limit_mixed_latencies():
+    limit = AdaptiveLimit(initial=4, maximum=16, tolerance=2.0, backoff=0.5)
+
+    # Lookups by ID and pages of surfaces are each as quick as usual, so the limit only grows
+    for i in range(200):
+        place = limit.try_acquire(priority=1)
+        assert place
+        if i % 2:
+            limit.release(place, "lookup", 0.003, ok=True)
+        else:
+            limit.release(place, "page", 0.04, ok=True)
+
+    assert limit.limit == 16
+
+
+def test_adaptive_limit_floor():
+    limit = AdaptiveLimit(initial=1, minimum=1, maximum=4)
+    background = limit.acquire(priority=1, timeout=1.0)
+    assert background
+    assert limit.try_acquire(priority=2, background=True) is None
+
+    # Background work can't keep a request's query from the floor of the limit
+    request = limit.try_acquire(priority=1)
+    assert request
+    assert limit.try_acquire(priority=0) is None
+
+    # Background work waits in line for a place, up to its timeout
+    assert limit.acquire(priority=1, timeout=0.01) is None
+    places = []
+
+    def wait_for_place(priority):
+        place = limit.acquire(priority=priority, timeout=5.0)
+        places.append((priority, place))
+        limit.release(place, "site", 0.01, ok=True)
+
+    waiters = [threading.Thread(target=wait_for_place, args=(p,)) for p in (1, 0)]
+    for t in waiters:
+        t.start()
+        time.sleep(0.02)
+
+    limit.release(background, "site", 0.01, ok=True)
+    limit.release(request, "site", 0.01, ok=True)
+    for t in waiters:
+        t.join()
+
+    # The waiter with the higher priority is given a place first
+    assert [p for p, place in places] == [0, 1]
+    assert all(place for p, place in places)
+
+
+def test_adaptive_limit_demote():
+    limit = AdaptiveLimit(initial=1, minimum=1, maximum=4)
+    left_over = limit.try_acquire(priority=0)
+    assert limit.try_acquire(priority=0) is None
+
+    # A query no request is waiting on any more no longer holds the floor
+    limit.demote(left_over)
+    request = limit.try_acquire(priority=0)
+    assert request
+    limit.release(left_over, "site", 0.01, ok=True)
+    limit.release(request, "site", 0.01, ok=True)
+    assert limit.in_flight == 0
+    assert limit.foreground == 0
+
+
+def test_shared_token_buckets(tmp_path):
+    buckets = SharedTokenBuckets(str(tmp_path / "buckets"), slots=16)
+    assert buckets.take("default:10.0.0.1", cost=3, rate=1, burst=5) is None
+    # Two tokens are left, so this one has to wait for the third
+    assert 0.9 < buckets.take("default:10.0.0.1", cost=3, rate=1, burst=5) <= 1
+    # Other clients, and other workers opening the same file, see the same buckets
+    assert buckets.take("default:10.0.0.2", cost=3, rate=1, burst=5) is None
+    other = SharedTokenBuckets(str(tmp_path / "buckets"), slots=16)
+    assert other.take("default:10.0.0.1", cost=3, rate=1, burst=5) is not None
+
+
+def test_worker_load():
+    load = WorkerLoad()
+    load.configure({"enabled": True, "max_lag": 0.5, "max_in_flight": 1})
+    assert not load.should_shed(EXPENSIVE)
+
+    with load.tracking():
+        # Only expensive requests are shed
+        assert load.should_shed(EXPENSIVE)
+        assert not load.should_shed(CHEAP)
+
+    load.lag = 1.0
+    assert load.should_shed(EXPENSIVE)
+
+
 def test_context_serializer_without_context():
     # Trigger the 'no context in kwargs' branch
     m = ContextDictSerializer({})
     assert True
 
 
+def test_solr_fields():
+    class Example(ContextDictSerializer):
+        label = serpy.StrField(attr="label_s")
+        width = serpy.MethodField()
+        extra_solr_fields = ["title_s"]
+
+        def get_width(self, obj):
+            return obj.get('width_i') or obj["_childDocuments_"][0]['width_i']
+
+    assert solr_fields(Example) == ["id", "label_s", "title_s", "width_i"]
+
+
+def test_annotation_page_fl():
+    *fields, child = annotation_page_fl()
+    # Parent records don't bring back every stored field, but do have what the object summaries need
+    assert "*" not in fields
+    assert set(SUMMARY_FIELDS) <= set(fields)
+    assert all(f in child for f in ANNOTATION_BODY_FIELDS)
+
+
 def test_get_links():
     link_obj = {
         "id": "6172cfa3-9f7c-4120-9a3a-8751b7913961",
@@ -31,3 +393,215 @@ def test_get_links():
 
     v3_response_value = v3_response[0]['value']['en'][0]
     assert v3_response_value == "<a href=\"http://medieval-qa.bodleian.ox.ac.uk/catalog/manuscript_100\">Catalogue of Western Medieval Manuscripts in Oxford Libraries</a>"
+
+
+def test_metadata_blocks():
+    field_config = {"title_s": "Title", "author_sm": "Author", "date_s": "Date", "note_s": "Note"}
+    # Fields out of the config's order, a multi-valued field, an empty field, and a field not in the config
+    record = SurfaceRecord({"id": "s1", "note_s": "Damaged", "author_sm": ["Ibn al-Haytham", "Anon."],
+                            "title_s": "", "other_s": "Not metadata"})
+
+    assert v2_metadata_block(record, field_config) == [
+        {"label": "Author", "value": "Ibn al-Haytham"},
+        {"label": "Author", "value": "Anon."},
+        {"label": "Note", "value": "Damaged"}
+    ]
+    assert v3_metadata_block(record, field_config) == [
+        {"label": {"en": ["Author"]}, "value": {"en": ["Ibn al-Haytham", "Anon."]}},
+        {"label": {"en": ["Note"]}, "value": {"en": ["Damaged"]}}
+    ]
+    # A record with none of the fields has no block
+    assert v2_metadata_block({"id": "s2", "date_s": None}, field_config) is None
+    assert v3_metadata_block({"id": "s2"}, field_config) is None
+
+
+def test_export_filters():
+    fq = export_filters({"collection": "Maps", "accessioned_from": "2019-01-01", "indexed_to": "2019-07-11T00:00:00Z"})
+    assert fq == ['all_collections_id_sm:"maps"',
+                  'accessioned_dt:[2019-01-01T00:00:00Z TO *]',
+                  'indexed:[* TO 2019-07-11T00:00:00Z]']
+    # A date on its own as the end of a range includes that whole day
+    assert export_filters({"accessioned_from": "2019-01-01", "accessioned_to": "2019-01-31"}) == \
+        ['accessioned_dt:[2019-01-01T00:00:00Z TO 2019-01-31T23:59:59.999Z]']
+
+    assert export_filters({}) == []
+    assert export_filters({"collection": "maps\" OR type:link"}) is None
+    assert export_filters({"accessioned_to": "NOW"}) is None
+    # Dates of the right form that don't exist
+    assert export_filters({"accessioned_to": "2020-02-30"}) is None
+    assert export_filters({"indexed_from": "2020-01-01T25:00:00Z"}) is None
+
+
+def test_export_annotation_pages(monkeypatch):
+    class Objects:
+        hits = 2
+
+        def __init__(self, conn):
+            self.results = iter([{"id": "abc"}, {"id": "def"}])
+
+        def search(self, q, **kwargs):
+            pass
+
+    class Captured:
+        def __init__(self, obj, context):
+            self.data = {"id": obj["id"], "annotation_pages": context["annotation_pages"]}
+
+    children = {"type:annotationpage": {"abc": [{"id": "p1", "surface_id": "s1", "object_id": "abc"},
+                                                {"id": "p2", "surface_id": "s1", "object_id": "abc"}]}}
+    queried = []
+
+    def children_by_object(object_ids, type_fq, record_type=None, **kwargs):
+        queried.append(type_fq)
+        return children.get(type_fq, {})
+
+    monkeypatch.setattr(export, "SolrManager", Objects)
+    monkeypatch.setattr(export, "_children_by_object", children_by_object)
+    monkeypatch.setattr(export, "V3Manifest", Captured)
+    config = {"export": {"batchsize": 10}, "solr": {"pagesize": 100}}
+
+    # The annotation pages of a batch are fetched together and given to the canvases by surface
+    assert list(export.export_manifests(None, config, 3)) == [[{"id": "abc", "annotation_pages": {"s1": ["p1", "p2"]}},
+                                                              {"id": "def", "annotation_pages": {}}]]
+    assert queried.count("type:annotationpage") == 1
+
+
+def test_expiring_lru_cache():
+    cache = ExpiringLRUCache(maxsize=2, ttl=300)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Using 'a' makes 'b' the least recently used entry
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    expired = ExpiringLRUCache(maxsize=2, ttl=-1)
+    expired.set("a", 1)
+    assert expired.get("a") is None
+    # Expired entries can still be had when there is nothing better
+    assert expired.get_stale("a") == 1
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    added = [f"{i}_surface" for i in range(1000)]
+
+    for key in added:
+        bloom.add(key)
+
+    assert all(key in bloom for key in added)
+    assert bloom.is_full
+
+    false_positives = sum(1 for i in range(1000) if f"{i}_image" in bloom)
+    assert false_positives < 50
+
+
+def test_id_index_without_solr(monkeypatch):
+    state = {"down": True}
+
+    class IdSolr:
+        def search(self, q, **kwargs):
+            if state["down"]:
+                raise pysolr.SolrError("Failed to connect to server")
+            return pysolr.Results({"response": {"numFound": 1, "docs": [{"id": "abc", "indexed": "2020"}]},
+                                   "nextCursorMark": "*"})
+
+    monkeypatch.setattr(id_index, "SolrConnection", IdSolr())
+    monkeypatch.setattr(id_index, "index_state", lambda fq: (1, "2020"))
+    index = id_index.IdentifierIndex()
+    config = {"id_index": {"enabled": True, "refresh_interval": 60, "capacity": 100, "error_rate": 0.01,
+                           "batchsize": 100}}
+
+    # Without an index, every ID may be in Solr
+    assert index.might_contain(["def"], config)
+
+    state["down"] = False
+    assert index.might_contain(["abc"], config)
+    assert not index.might_contain(["def"], config)
+
+
+def test_surface_record():
+    doc = {
+        "id": "abc_surface",
+        "label_s": "fol. 1r",
+        "description_sm": ["A note"],
+        "_childDocuments_": [{"id": "abc_image", "width_i": 100, "height_i": 200}]
+    }
+    rec = SurfaceRecord(doc)
+
+    assert rec.label_s == rec["label_s"] == rec.get("label_s") == "fol. 1r"
+    assert rec.get("description_sm") == ["A note"]
+    assert rec.get("sort_i") is None
+    assert "sort_i" not in rec
+    assert rec["_childDocuments_"][0]["width_i"] == 100
+    assert dict(rec) == doc
+
+
+def test_surface_count(monkeypatch):
+    class CountingSolr:
+        def search(self, q, **kwargs):
+            # Only the number of hits is asked for
+            assert kwargs['rows'] == 0
+            return pysolr.Results({"response": {"numFound": 1500, "docs": []}})
+
+    cache = ExpiringLRUCache(maxsize=2, ttl=300)
+    monkeypatch.setattr(bundle, "SolrConnection", CountingSolr())
+    monkeypatch.setattr(bundle, "configured_cache", lambda name, config: cache)
+    assert bundle.surface_count("object-1", {}) == 1500
+
+    # A cached bundle is counted without a query
+    cache.set("object-2", bundle.ObjectBundle({"id": "object-2"}, [SurfaceRecord({"id": "s1"})], [], [], False))
+    monkeypatch.setattr(bundle, "SolrConnection", None)
+    assert bundle.surface_count("object-2", {}) == 1
+
+
+def test_admission_limit():
+    limit = AdmissionLimit("test", max_concurrent=1, max_queue=1, timeout=0.05)
+
+    async def run():
+        await limit.acquire()
+        # The second request waits, and times out
+        with pytest.raises(AdmissionRejected) as e:
+            await limit.acquire()
+        assert e.value.reason == "timeout"
+        # Once the first is done, the next one is admitted straight away
+        limit.release()
+        async with limit.admit():
+            assert limit.active == 1
+        assert limit.active == 0
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_priority_lanes():
+    lanes = PriorityLanes("test", max_concurrent=2, reserved=1, max_queue=1, timeout=0.05)
+
+    async def run():
+        await lanes.acquire(EXPENSIVE)
+        # The other place is kept for cheap requests
+        with pytest.raises(AdmissionRejected) as e:
+            await lanes.acquire(EXPENSIVE)
+        assert e.value.reason == "timeout"
+        async with lanes.admit(CHEAP):
+            assert lanes.active == {CHEAP: 1, EXPENSIVE: 1}
+        lanes.release(EXPENSIVE)
+        assert lanes.active == {CHEAP: 0, EXPENSIVE: 0}
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+
+def test_v3_collection_manifest_entries():
+    class Request:
+        headers = {}
+        scheme = "https"
+        host = "iiif.example.org"
+
+    class Page:
+        docs = [{"id": "abc", "full_shelfmark_s": "MS. Abc", "thumbnail_id": "def",
+                 "all_collections_id_sm": ["all"]}]
+
+    cfg = {"templates": {"manifest_id_tmpl": "{scheme}://{host}/{identifier}.json"}}
+    entries = CollectionManifest(manifest_entries(Page()), many=True, context={"request": Request(), "config": cfg}).data
+
+    # v3 collections list manifests without thumbnails, although the summaries have them.
+    assert entries == [{"id": "https://iiif.example.org/abc.json", "label": "MS. Abc", "type": "Manifest"}]
@@ -35,11 +35,35 @@ def test_structures_in_v3_response():
 
 def test_v2_collection_all():
     request, response = app.test_client.get("/iiif/collection/all")
-    manifests = response.json.get('manifests', None)
     collections = response.json.get('collections', None)
-    assert len(manifests) > 0
     assert collections is None
 
+    # Large collections only link to their first page of manifests
+    if 'first' in response.json:
+        assert response.json.get('total') > 0
+        request, response = app.test_client.get(response.json['first'].split(request.host, 1)[1])
+        assert response.json.get('within') is not None
+
+    manifests = response.json.get('manifests', None)
+    assert len(manifests) > 0
+
+
+def test_v2_collection_page():
+    request, response = app.test_client.get("/iiif/collection/all?page=*")
+    assert response.status == 200
+    assert response.json.get('within').endswith("/iiif/collection/all")
+    assert response.json.get('collections') is None
+    assert len(response.json.get('manifests')) > 0
+
+
+def test_v3_collection_page():
+    accept_hdr = "application/ld+json;profile=http://iiif.io/api/presentation/3/context.json"
+    request, response = app.test_client.get("/iiif/collection/all?page=*", headers={"Accept": accept_hdr})
+    assert response.status == 200
+    assert response.json.get('partOf')[0]['id'].endswith("/iiif/collection/all")
+    assert response.json.get('items')[0]['type'] == "Manifest"
+    assert response.json.get('items')[0].get('thumbnail') is None
+
 
 def test_v2_collection_top():
     request, response = app.test_client.get('/iiif/collection/top')
@@ -1,3 +1,4 @@
+import json
 from manifest_server.server import app
 
 # @pytest.fixture
@@ -315,6 +316,13 @@ def test_activity_streams_collection_last_page():
     assert resp2.status == 200
 
 
+def test_activity_streams_collection_page_beyond_last():
+    request, response = app.test_client.get("/iiif/activity/all-changes")
+    last_page = int(response.json.get("last")['id'].rsplit("page-", 1)[1])
+    req2, resp2 = app.test_client.get(f"/iiif/activity/page-{last_page + 1}")
+    assert resp2.status == 404
+
+
 def test_activity_streams_activity_page():
     request, response = app.test_client.get("/iiif/activity/create/5c7b2cfa-b8cb-469d-8895-1463513f28d0")
     assert response.status == 200
@@ -400,6 +408,17 @@ def test_invalid_collection_id_quotes():
     assert response.status == 404
 
 
+def test_invalid_collection_page_token():
+    request, response = app.test_client.get("/iiif/collection/all?page=foo%20bar")
+    assert response.status == 404
+
+
+def test_unknown_collection_page_token():
+    # Well-formed, but not a cursor mark that Solr issued
+    request, response = app.test_client.get("/iiif/collection/all?page=AAAA")
+    assert response.status == 404
+
+
 def test_invalid_collection_id_s_in_word():
     request, response = app.test_client.get("/iiif/collection/maps")
     assert response.status == 200
@@ -423,3 +442,30 @@ def test_invalid_range_quotes():
 def test_valid_range():
     request, response = app.test_client.get("/iiif/range/748a9d50-5a3a-440e-ab9d-567dd68b6abb/LOG_0000")
     assert response.status == 200
+
+
+def test_v2_manifest_export():
+    request, response = app.test_client.get("/iiif/export/manifests.ndjson?collection=maps")
+    assert response.status == 200
+    lines = [json.loads(l) for l in response.text.splitlines() if l]
+    assert len(lines) > 0
+    assert lines[0].get('@context') == "http://iiif.io/api/presentation/2/context.json"
+
+
+def test_v3_manifest_export():
+    accept_hdr = "application/ld+json;profile=http://iiif.io/api/presentation/3/context.json"
+    request, response = app.test_client.get("/iiif/export/manifests.ndjson?accessioned_from=2019-01-01",
+                                            headers={"Accept": accept_hdr})
+    assert response.status == 200
+    for line in response.text.splitlines():
+        assert "http://iiif.io/api/presentation/3/context.json" in json.loads(line).get('@context')
+
+
+def test_invalid_manifest_export_filter():
+    request, response = app.test_client.get("/iiif/export/manifests.ndjson?indexed_to=yesterday")
+    assert response.status == 400
+
+
+def test_nonexistent_date_manifest_export_filter():
+    request, response = app.test_client.get("/iiif/export/manifests.ndjson?accessioned_to=2020-02-30")
+    assert response.status == 400